@@ -0,0 +1,102 @@
+"""Latency of templated field answers against the LLM prompt path they replace.
+
+Plain lookups ("price of 1510", "what is the margin of 1510") are answered by
+render_field_answer; --llm also sends the same questions through generate_ai_response
+with the template disabled, which needs OPENAI_API_KEY and makes real API calls.
+
+    python benchmarks/bench_answer_paths.py --runs 2000
+    python benchmarks/bench_answer_paths.py --runs 5 --llm
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    ("price of 1510", ["price"]),
+    ("what is the margin of 1510", ["margin"]),
+    ("cost and inventory of 1510", ["cost", "inventory"]),
+    ("weight of 1510", ["weight"]),
+    ("part number of 1510", ["part_number"]),
+]
+
+PRODUCT_NODE = {
+    "id": "gid://shopify/Product/1",
+    "title": "Pelican 1510 Carry-On Case",
+    "images": {"edges": [{"node": {"url": "https://cdn.example.invalid/1510.jpg"}}]},
+    "metafields": {"edges": []},
+    "variants": {"edges": [{"node": {
+        "id": "gid://shopify/ProductVariant/11",
+        "title": "Black / With Foam",
+        "sku": "1510-000-110",
+        "price": "289.95",
+        "inventoryQuantity": 14,
+        "inventoryItem": {
+            "id": "gid://shopify/InventoryItem/21",
+            "unitCost": {"amount": "174.50", "currencyCode": "USD"},
+            "measurement": {"weight": {"value": 13.6, "unit": "POUNDS"}}
+        }
+    }}]}
+}
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000, help="repetitions of each question")
+    parser.add_argument("--llm", action="store_true", help="also time the LLM path (real OpenAI calls)")
+    args = parser.parse_args()
+
+    if not args.llm:
+        # The templated path never calls OpenAI, but the client is created at import time
+        os.environ.setdefault("OPENAI_API_KEY", "unused")
+    import shopify_bot
+    from product_records import Product
+
+    record = Product.from_node(PRODUCT_NODE)
+    variant = record.variants[0]
+    product_data = {
+        "title": record.title,
+        "product": record,
+        "variant": variant,
+        **variant.answer_fields(),
+        "image_url": record.image_url
+    }
+
+    template = []
+    for _ in range(args.runs):
+        for query, requested_info in QUERIES:
+            started = time.perf_counter()
+            answer = shopify_bot.render_field_answer(query, product_data, requested_info)
+            template.append((time.perf_counter() - started) * 1000)
+            assert answer is not None, query
+    results = {"template": percentiles(template)}
+
+    if args.llm:
+        render_field_answer = shopify_bot.render_field_answer
+        shopify_bot.render_field_answer = lambda *args: None
+        llm = []
+        try:
+            for _ in range(args.runs):
+                for query, requested_info in QUERIES:
+                    started = time.perf_counter()
+                    shopify_bot.generate_ai_response(query, product_data, requested_info)
+                    llm.append((time.perf_counter() - started) * 1000)
+        finally:
+            shopify_bot.render_field_answer = render_field_answer
+        results["LLM"] = percentiles(llm)
+
+    print(f"{'path':<10}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, (p50, p95) in results.items():
+        print(f"{name:<10}{p50:>12.3f}{p95:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
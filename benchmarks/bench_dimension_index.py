@@ -0,0 +1,92 @@
+"""Latency of DimensionIndex.nearest against a linear scan over every case of the brand.
+
+Both return the k closest cases by interior-dimension distance; the script checks that they
+agree before timing them.
+
+    python benchmarks/bench_dimension_index.py --products 50000 --queries 2000
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_records(count, brands, seed):
+    rng = random.Random(seed)
+    records = []
+    for number in range(count):
+        dims = sorted((round(rng.uniform(4, 60), 2) for _ in range(3)), reverse=True)
+        records.append({
+            "id": f"gid://shopify/Product/{number}",
+            "title": f"Case {number}",
+            "vendor": rng.choice(brands),
+            "sku": f"CASE-{number}",
+            "interior_dimensions": " x ".join(f"{value:g}" for value in dims)
+        })
+    return records
+
+
+def linear_nearest(records_by_brand, brand, target, k):
+    """Score every case of the brand and keep the k closest"""
+    scored = sorted(
+        (math.dist(target, dims), record["id"]) for record, dims in records_by_brand.get(brand.lower(), [])
+    )
+    return [gid for _, gid in scored[:k]]
+
+
+def measure(search, queries):
+    latencies = []
+    for brand, target in queries:
+        started = time.perf_counter()
+        search(brand, target)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    from dimension_index import EQUIVALENCE_BRANDS, DimensionIndex, interior_dimensions_from_record
+
+    records = synthetic_records(args.products, EQUIVALENCE_BRANDS, args.seed)
+    index = DimensionIndex(records)
+    records_by_brand = {}
+    for record in records:
+        records_by_brand.setdefault(record["vendor"].lower(), []).append(
+            (record, interior_dimensions_from_record(record))
+        )
+
+    rng = random.Random(args.seed + 1)
+    queries = [
+        (rng.choice(EQUIVALENCE_BRANDS), tuple(sorted((round(rng.uniform(4, 60), 2) for _ in range(3)), reverse=True)))
+        for _ in range(args.queries)
+    ]
+
+    mismatches = sum(
+        [match["id"] for match in index.nearest(brand, target, k=args.k)]
+        != linear_nearest(records_by_brand, brand, target, args.k)
+        for brand, target in queries
+    )
+    print(f"{len(queries)} queries over {index.size} cases, {mismatches} top-{args.k} mismatches")
+
+    results = {
+        "DimensionIndex": measure(lambda brand, target: index.nearest(brand, target, k=args.k), queries),
+        "linear scan": measure(lambda brand, target: linear_nearest(records_by_brand, brand, target, args.k), queries),
+    }
+    print(f"{'search':<16}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, (p50, p95) in results.items():
+        print(f"{name:<16}{p50:>10.3f}{p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
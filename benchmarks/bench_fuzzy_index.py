@@ -0,0 +1,135 @@
+"""Recall and latency of the trigram index against the old wildcard LIKE fallback.
+
+Builds a synthetic catalog, then searches it with typo'd titles and partial part numbers.
+recall@k is the share of queries whose source product is among the first k hits.
+
+    python benchmarks/bench_fuzzy_index.py --products 50000 --queries 1000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANDS = ["Pelican", "Nanuk", "SKB", "Storm", "Apache", "Seahorse", "Peak", "Vault"]
+SERIES = ["Protector", "Air", "iSeries", "Ranger", "Carry-On", "Transport", "Rack", "Hardcase"]
+COLORS = ["Black", "Yellow", "Orange", "OD Green", "Desert Tan", "Silver", "Blue"]
+INTERIORS = ["No Foam", "With Foam", "TrekPak Dividers", "Padded Dividers"]
+
+LIKE_FALLBACK_LIMIT = 20
+
+
+def synthetic_catalog(count, seed):
+    rng = random.Random(seed)
+    products = []
+    for number in range(count):
+        model = f"{rng.randint(1, 99)}{number:05d}"
+        color, interior = rng.randrange(len(COLORS)), rng.randrange(len(INTERIORS))
+        products.append({
+            "id": f"gid://shopify/Product/{number}",
+            "title": f"{rng.choice(BRANDS)} {rng.choice(SERIES)} {model} Case {COLORS[color]} {INTERIORS[interior]}",
+            "skus": [f"{model}-{interior:03d}-{color:03d}"],
+            "tags": [rng.choice(["hard case", "waterproof", "rolling", "carry"])]
+        })
+    return products
+
+
+def typo(word, rng):
+    if len(word) < 4:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(["drop", "swap", "double"])
+    if edit == "drop":
+        return word[:position] + word[position + 1:]
+    if edit == "swap":
+        return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+    return word[:position] + word[position] + word[position:]
+
+
+def synthetic_queries(products, count, seed):
+    """(query, expected product id): half typo'd titles, half partial part numbers"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for product in rng.sample(products, count):
+        if rng.random() < 0.5:
+            words = product["title"].split()[:4]
+            position = rng.randrange(len(words))
+            words[position] = typo(words[position], rng)
+            queries.append((" ".join(words), product["id"]))
+        else:
+            queries.append(("-".join(product["skus"][0].split("-")[:2]), product["id"]))
+    return queries
+
+
+def like_fallback_db(products):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (id TEXT PRIMARY KEY, title TEXT)")
+    conn.execute("CREATE TABLE variants (product_id TEXT, sku TEXT)")
+    conn.executemany("INSERT INTO products VALUES (?, ?)", [(p["id"], p["title"]) for p in products])
+    conn.executemany("INSERT INTO variants VALUES (?, ?)", [(p["id"], sku) for p in products for sku in p["skus"]])
+    conn.execute("CREATE INDEX idx_variants_product ON variants (product_id)")
+    return conn
+
+
+def like_fallback_search(conn, query_string):
+    """The removed CatalogStore.search_products_fuzzy: any query word in the title or a SKU"""
+    terms = [word for word in query_string.split() if len(word) >= 2] + [query_string]
+    conditions = []
+    params = []
+    for term in terms:
+        conditions.append("title LIKE ?")
+        conditions.append("id IN (SELECT product_id FROM variants WHERE sku LIKE ?)")
+        params.extend([f"%{term}%", f"%{term}%"])
+    sql = f"SELECT id FROM products WHERE {' OR '.join(conditions)} ORDER BY title LIMIT ?"
+    return [row[0] for row in conn.execute(sql, (*params, LIKE_FALLBACK_LIMIT))]
+
+
+def measure(search, queries, k):
+    latencies = []
+    hits = 0
+    for query, expected in queries:
+        started = time.perf_counter()
+        ids = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += expected in ids[:k]
+    latencies.sort()
+    return {
+        "recall": hits / len(queries),
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    from fuzzy_index import TrigramIndex
+
+    products = synthetic_catalog(args.products, args.seed)
+    queries = synthetic_queries(products, min(args.queries, len(products)), args.seed)
+
+    started = time.perf_counter()
+    index = TrigramIndex(products)
+    print(f"trigram index over {len(index)} products built in {time.perf_counter() - started:.1f} s")
+    conn = like_fallback_db(products)
+
+    results = {
+        "trigram index": measure(lambda query: [record["id"] for record, _ in index.search(query, limit=args.k)],
+                                 queries, args.k),
+        "LIKE fallback": measure(lambda query: like_fallback_search(conn, query), queries, args.k),
+    }
+    print(f"{'search':<16}{f'recall@{args.k}':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['recall']:>10.3f}{result['p50']:>10.2f}{result['p95']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Memory of Product.from_node records against the raw GraphQL product dicts they replace.
+
+Each product is decoded from the same JSON response body; tracemalloc reports what a list
+of N decoded dicts keeps alive versus a list of N Product records (the dicts are dropped).
+
+    python benchmarks/bench_product_records.py --products 2000 --variants 8
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLORS = ["Black", "Yellow", "Orange", "OD Green", "Desert Tan", "Silver"]
+INTERIORS = ["No Foam", "With Foam", "TrekPak Dividers", "Padded Dividers"]
+
+
+def product_json(number, variant_count):
+    """One product in the PRODUCT_DETAIL_FIELDS response shape, as JSON text"""
+    variants = []
+    for n in range(variant_count):
+        color, interior = COLORS[n % len(COLORS)], INTERIORS[n % len(INTERIORS)]
+        variants.append({"node": {
+            "id": f"gid://shopify/ProductVariant/{number}{n:03d}",
+            "title": f"{color} / {interior}",
+            "sku": f"{number}-{n:03d}",
+            "selectedOptions": [{"name": "Color", "value": color}, {"name": "Interior", "value": interior}],
+            "price": f"{100 + n * 12.5:.2f}",
+            "inventoryQuantity": n * 3,
+            "inventoryItem": {
+                "id": f"gid://shopify/InventoryItem/{number}{n:03d}",
+                "tracked": True,
+                "unitCost": {"amount": f"{60 + n * 7.25:.2f}", "currencyCode": "USD"},
+                "measurement": {"weight": {"value": 4.2 + n, "unit": "POUNDS"}}
+            }
+        }})
+    return json.dumps({
+        "id": f"gid://shopify/Product/{number}",
+        "title": f"Protector Case {number}",
+        "vendor": "Pelican",
+        "status": "ACTIVE",
+        "productType": "Hard Case",
+        "tags": ["waterproof", "carry-on"],
+        "updatedAt": "2025-01-02T00:00:00Z",
+        "images": {"edges": [{"node": {"url": f"https://cdn.example.invalid/{number}.jpg"}}]},
+        "metafields": {"edges": [
+            {"node": {"key": "interior_dimensions", "value": '19.00" x 11.00" x 7.60"'}},
+            {"node": {"key": "warranty", "value": "Lifetime guarantee of excellence"}},
+            {"node": {"key": "description_html", "value": "<p>Watertight, crushproof and dust proof.</p>" * 4}}
+        ]},
+        "variants": {"edges": variants, "pageInfo": {"hasNextPage": False, "endCursor": None}}
+    })
+
+
+def traced_bytes(build):
+    """Bytes still allocated by the list build() returns"""
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(kept)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--variants", type=int, default=8)
+    args = parser.parse_args()
+    from product_records import Product
+
+    bodies = [product_json(number, args.variants) for number in range(args.products)]
+
+    raw, _ = traced_bytes(lambda: [json.loads(body) for body in bodies])
+    records, _ = traced_bytes(lambda: [Product.from_node(json.loads(body)) for body in bodies])
+
+    print(f"{args.products} products x {args.variants} variants")
+    print(f"{'form':<16}{'MB':>10}{'bytes/product':>16}")
+    for name, size in (("raw dicts", raw), ("Product records", records)):
+        print(f"{name:<16}{size / 1024 / 1024:>10.1f}{size // args.products:>16}")
+    print(f"records keep {records / raw:.0%} of the raw dict memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,876 @@
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+
+from shopify_client import (
+    ShopifyClient, PRODUCT_DETAIL_FIELDS, VARIANT_DETAIL_FIELDS, SINGLE_QUERY_COST_LIMIT, estimate_query_cost
+)
+from dimension_index import (
+    EQUIVALENCE_BRANDS, compute_equivalents_chunk, dims_key, init_equivalence_worker,
+    interior_dimensions_from_record
+)
+
+DEFAULT_CATALOG_DB_PATH = "catalog.db"
+
+# Rows are flushed to SQLite in batches of this size so a sync never holds the whole catalog in memory
+BATCH_SIZE = 500
+
+# Products handed to each equivalence worker task
+EQUIVALENCE_CHUNK_SIZE = 200
+
+# How often an incremental sync also reconciles the full id set to catch deleted products
+RECONCILE_INTERVAL_HOURS = 24
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    handle TEXT,
+    status TEXT,
+    product_type TEXT,
+    vendor TEXT,
+    tags TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    image_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_status ON products (status);
+CREATE INDEX IF NOT EXISTS idx_products_type ON products (product_type COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_products_created ON products (created_at);
+CREATE INDEX IF NOT EXISTS idx_products_title ON products (title COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS product_tags (
+    product_id TEXT,
+    tag TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON product_tags (tag COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tags_product ON product_tags (product_id);
+
+CREATE TABLE IF NOT EXISTS variants (
+    id TEXT PRIMARY KEY,
+    product_id TEXT,
+    sku TEXT,
+    title TEXT,
+    price TEXT,
+    inventory_quantity INTEGER,
+    inventory_item_id TEXT,
+    unit_cost TEXT,
+    cost_currency TEXT,
+    tracked INTEGER,
+    weight_value REAL,
+    weight_unit TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_variants_product ON variants (product_id);
+CREATE INDEX IF NOT EXISTS idx_variants_sku ON variants (sku COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS metafields (
+    product_id TEXT,
+    namespace TEXT,
+    key TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_metafields_product ON metafields (product_id);
+
+CREATE TABLE IF NOT EXISTS equivalents (
+    product_id TEXT,
+    brand TEXT,
+    rank INTEGER,
+    equivalent_id TEXT,
+    title TEXT,
+    sku TEXT,
+    dimensions TEXT,
+    distance REAL,
+    tolerance TEXT,
+    fits INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_equivalents_product ON equivalents (product_id);
+
+CREATE TABLE IF NOT EXISTS equivalence_sources (
+    product_id TEXT PRIMARY KEY,
+    vendor TEXT,
+    dims TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Bulk operations flatten nested connections into JSONL lines linked by __parentId
+BULK_PRODUCTS_QUERY = """
+{
+  products {
+    edges {
+      node {
+        id
+        title
+        handle
+        status
+        productType
+        vendor
+        tags
+        createdAt
+        updatedAt
+        featuredImage {
+          url
+        }
+        metafields {
+          edges {
+            node {
+              namespace
+              key
+              value
+            }
+          }
+        }
+        variants {
+          edges {
+            node {
+              id
+              sku
+              title
+              price
+              inventoryQuantity
+              inventoryItem {
+                id
+                unitCost {
+                  amount
+                  currencyCode
+                }
+                tracked
+                measurement {
+                  weight {
+                    value
+                    unit
+                  }
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation runBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation {
+      id
+      status
+    }
+    userErrors {
+      field
+      message
+    }
+  }
+}
+"""
+
+CURRENT_BULK_OPERATION_QUERY = """
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    objectCount
+    url
+  }
+}
+"""
+
+INCREMENTAL_PRODUCTS_QUERY = f"""
+query changedProducts($query: String!, $first: Int!, $after: String) {{
+  products(first: $first, after: $after, query: $query, sortKey: UPDATED_AT) {{
+    edges {{
+      node {{
+{PRODUCT_DETAIL_FIELDS}
+      }}
+    }}
+    pageInfo {{
+      hasNextPage
+      endCursor
+    }}
+  }}
+}}
+"""
+
+# Each incremental page carries full product details, so it is sized from the estimated cost of one product
+INCREMENTAL_PAGE_SIZE = max(1, int(SINGLE_QUERY_COST_LIMIT // estimate_query_cost(INCREMENTAL_PRODUCTS_QUERY, {"first": 1})))
+
+# Variants beyond the first page of PRODUCT_DETAIL_FIELDS, fetched for products that have more
+PRODUCT_VARIANTS_QUERY = f"""
+query productVariants($id: ID!, $after: String) {{
+  product(id: $id) {{
+    variants(first: 100, after: $after) {{
+      edges {{
+        node {{
+{VARIANT_DETAIL_FIELDS}
+        }}
+      }}
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+    }}
+  }}
+}}
+"""
+
+PRODUCT_IDS_QUERY = """
+query productIds($after: String) {
+  products(first: 250, after: $after) {
+    edges {
+      node {
+        id
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+"""
+
+SKU_PREFIX_PATTERN = re.compile(r"^\s*(?:p/?n|part\s*(?:number|no\.?)|sku|model)(?:\s*[:#]\s*|\s+)", re.IGNORECASE)
+
+
+def normalize_sku(text):
+    """Canonical SKU key: prefixes like "P/N" dropped, case folded, dashes, dots and spaces removed"""
+    if not text:
+        return ""
+    return re.sub(r"[^0-9a-z]", "", SKU_PREFIX_PATTERN.sub("", str(text)).lower())
+
+
+PRODUCT_NODE_COLUMNS = "id, title, handle, status, product_type, vendor, tags, created_at, updated_at"
+
+
+def product_row_to_node(row):
+    """Convert a products row into the node shape the GraphQL search queries return"""
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "handle": row["handle"],
+        "status": row["status"],
+        "productType": row["product_type"] or "",
+        "tags": json.loads(row["tags"]) if row["tags"] else [],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+        "vendor": row["vendor"] or ""
+    }
+
+
+def products_connection(nodes):
+    """Wrap product nodes in the same response shape as a `products` GraphQL query"""
+    return {"data": {"products": {"edges": [{"node": node} for node in nodes]}}}
+
+
+class CatalogStore:
+    """Local SQLite mirror of the Shopify product catalog"""
+
+    def __init__(self, db_path=DEFAULT_CATALOG_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    # ---- sync state ----
+
+    def get_state(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_state(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def mirror_signature(self):
+        """Changes whenever a sync adds, updates or deletes products, so derived indexes know to rebuild"""
+        return (self.get_state("last_full_sync"), self.get_state("updated_at_watermark"),
+                self.get_state("deletion_generation"))
+
+    def is_populated(self):
+        """The mirror is only used once at least one full sync has completed"""
+        return self.get_state("last_full_sync") is not None
+
+    # ---- writes ----
+
+    def load_bulk_jsonl(self, lines):
+        """Replace the mirror with the contents of a bulk operation JSONL stream"""
+        product_rows, tag_rows, variant_rows, metafield_rows = [], [], [], []
+        product_count = 0
+        watermark = ""
+
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            for table in ("products", "product_tags", "variants", "metafields"):
+                cur.execute(f"DELETE FROM {table}")
+
+            for line in lines:
+                if not line or not line.strip():
+                    continue
+                record = json.loads(line)
+                parent_id = record.get("__parentId")
+
+                if parent_id is None:
+                    product_rows.append(_product_row(record))
+                    tag_rows.extend((record["id"], tag) for tag in record.get("tags") or [])
+                    product_count += 1
+                    watermark = max(watermark, record.get("updatedAt") or "")
+                elif record.get("id", "").startswith("gid://shopify/ProductVariant/"):
+                    variant_rows.append(_variant_row(record, parent_id))
+                elif "namespace" in record:
+                    metafield_rows.append((parent_id, record.get("namespace"), record.get("key"), record.get("value")))
+
+                if len(product_rows) + len(variant_rows) + len(metafield_rows) >= BATCH_SIZE:
+                    _flush_rows(cur, product_rows, tag_rows, variant_rows, metafield_rows)
+
+            _flush_rows(cur, product_rows, tag_rows, variant_rows, metafield_rows)
+            now = datetime.now(timezone.utc).isoformat()
+            cur.executemany(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                [("last_full_sync", now), ("last_reconcile", now), ("updated_at_watermark", watermark or now)]
+            )
+
+        return product_count
+
+    def upsert_products(self, nodes):
+        """Insert or replace products returned in the PRODUCT_DETAIL_FIELDS shape, with their children"""
+        product_rows, tag_rows, variant_rows, metafield_rows = [], [], [], []
+
+        for node in nodes:
+            product_id = node["id"]
+            product_rows.append(_product_row(node))
+            tag_rows.extend((product_id, tag) for tag in node.get("tags") or [])
+            for edge in node.get("variants", {}).get("edges", []):
+                variant_rows.append(_variant_row(edge["node"], product_id))
+            for edge in node.get("metafields", {}).get("edges", []):
+                metafield = edge["node"]
+                metafield_rows.append((product_id, metafield.get("namespace"), metafield.get("key"), metafield.get("value")))
+
+        # Variants are only replaced wholesale when the node carries all of them (see fetch_remaining_variants);
+        # otherwise the returned ones are upserted by id and the rest are kept
+        complete_ids = [
+            (node["id"],) for node in nodes
+            if not (node.get("variants", {}).get("pageInfo") or {}).get("hasNextPage")
+        ]
+
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            ids = [(row[0],) for row in product_rows]
+            # Children are replaced wholesale so removed variants/metafields do not linger
+            cur.executemany("DELETE FROM product_tags WHERE product_id = ?", ids)
+            cur.executemany("DELETE FROM variants WHERE product_id = ?", complete_ids)
+            cur.executemany("DELETE FROM metafields WHERE product_id = ?", ids)
+            _flush_rows(cur, product_rows, tag_rows, variant_rows, metafield_rows)
+
+    def delete_products_not_in(self, live_ids):
+        """Remove products (and their children) that no longer exist in Shopify"""
+        with self.lock:
+            local_ids = [row["id"] for row in self.conn.execute("SELECT id FROM products")]
+        stale_ids = [(product_id,) for product_id in local_ids if product_id not in live_ids]
+
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            cur.executemany("DELETE FROM products WHERE id = ?", stale_ids)
+            cur.executemany("DELETE FROM product_tags WHERE product_id = ?", stale_ids)
+            cur.executemany("DELETE FROM variants WHERE product_id = ?", stale_ids)
+            cur.executemany("DELETE FROM metafields WHERE product_id = ?", stale_ids)
+            if stale_ids:
+                # Deletions leave the watermark alone, so bump a counter that mirror_signature() includes
+                cur.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('deletion_generation', "
+                    "CAST(COALESCE((SELECT value FROM sync_state WHERE key = 'deletion_generation'), 0) + 1 AS TEXT))"
+                )
+
+        return len(stale_ids)
+
+    # ---- reads ----
+
+    def search_products(self, query_string, limit=10):
+        """Exact search across title, SKU and tag (mirrors the `title:X OR sku:X OR tag:X` query)"""
+        sql = f"""
+            SELECT {PRODUCT_NODE_COLUMNS} FROM products
+            WHERE title LIKE ?
+               OR id IN (SELECT product_id FROM variants WHERE sku = ? COLLATE NOCASE)
+               OR id IN (SELECT product_id FROM product_tags WHERE tag = ? COLLATE NOCASE)
+            ORDER BY title
+            LIMIT ?
+        """
+        with self.lock:
+            rows = self.conn.execute(sql, (f"%{query_string}%", query_string, query_string, limit)).fetchall()
+        return [product_row_to_node(row) for row in rows]
+
+    def fuzzy_records(self):
+        """Product nodes with their SKUs and tags, for the in-memory trigram index"""
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {PRODUCT_NODE_COLUMNS} FROM products").fetchall()
+            sku_rows = self.conn.execute(
+                "SELECT product_id, sku FROM variants WHERE sku IS NOT NULL AND sku != ''"
+            ).fetchall()
+        skus = {}
+        for row in sku_rows:
+            skus.setdefault(row["product_id"], []).append(row["sku"])
+        records = []
+        for row in rows:
+            node = product_row_to_node(row)
+            records.append({
+                "id": node["id"],
+                "title": node["title"],
+                "skus": skus.get(node["id"], []),
+                "tags": node["tags"],
+                "node": node
+            })
+        return records
+
+    def search_products_by_criteria(self, status=None, category=None):
+        """All products with the given status and/or category (productType or tag)"""
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status.upper())
+        if category:
+            conditions.append(
+                "(product_type = ? COLLATE NOCASE OR id IN "
+                "(SELECT product_id FROM product_tags WHERE tag = ? COLLATE NOCASE))"
+            )
+            params.extend([category, category])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {PRODUCT_NODE_COLUMNS} FROM products {where} ORDER BY title", params
+            ).fetchall()
+        return [product_row_to_node(row) for row in rows]
+
+    def count_products(self, status=None, category=None, date_condition=None, date_value=None):
+        """Count products matching the optional status, category (productType or tag) and creation date filters"""
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status.upper())
+        if category:
+            conditions.append(
+                "(product_type = ? COLLATE NOCASE OR id IN "
+                "(SELECT product_id FROM product_tags WHERE tag = ? COLLATE NOCASE))"
+            )
+            params.extend([category, category])
+        if date_condition == "after":
+            conditions.append("created_at > ?")
+            params.append(date_value)
+        elif date_condition == "before":
+            conditions.append("created_at < ?")
+            params.append(date_value)
+        elif date_condition == "on":
+            conditions.append("substr(created_at, 1, 10) = ?")
+            params.append(date_value)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            row = self.conn.execute(f"SELECT COUNT(*) AS total FROM products {where}", params).fetchone()
+        return row["total"]
+
+    def sku_index(self):
+        """{normalized sku: (product gid, variant gid)}; SKUs shared by several variants are left out"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT sku, product_id, id FROM variants WHERE sku IS NOT NULL AND sku != ''"
+            ).fetchall()
+        index = {}
+        ambiguous = set()
+        for row in rows:
+            key = normalize_sku(row["sku"])
+            if not key:
+                continue
+            if key in index and index[key] != (row["product_id"], row["id"]):
+                ambiguous.add(key)
+            index[key] = (row["product_id"], row["id"])
+        for key in ambiguous:
+            del index[key]
+        return index
+
+    def dimension_records(self):
+        """Per-product title, vendor, first SKU, variant titles and interior dimension metafield"""
+        sql = """
+            SELECT p.id, p.title, p.vendor,
+                (SELECT sku FROM variants v WHERE v.product_id = p.id AND sku IS NOT NULL AND sku != ''
+                 ORDER BY v.id LIMIT 1) AS sku,
+                (SELECT group_concat(title, ' | ') FROM variants v WHERE v.product_id = p.id) AS variant_titles,
+                (SELECT value FROM metafields m WHERE m.product_id = p.id
+                 AND lower(m.key) LIKE '%interior%' AND lower(m.key) LIKE '%dimension%' LIMIT 1) AS interior_dimensions
+            FROM products p
+        """
+        with self.lock:
+            rows = self.conn.execute(sql).fetchall()
+        return [dict(row) for row in rows]
+
+    # ---- equivalence table ----
+
+    def get_equivalents(self, product_id, brands=None):
+        """Precomputed equivalents of a product as {brand: [match, ...]} ranked by distance"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM equivalents WHERE product_id = ? ORDER BY brand, rank", (product_id,)
+            ).fetchall()
+        wanted = {brand.lower() for brand in brands} if brands else None
+        results = {}
+        for row in rows:
+            if wanted is not None and row["brand"].lower() not in wanted:
+                continue
+            results.setdefault(row["brand"], []).append({
+                "id": row["equivalent_id"],
+                "title": row["title"],
+                "sku": row["sku"],
+                "dimensions": row["dimensions"],
+                "distance": row["distance"],
+                "tolerance": row["tolerance"],
+                "fits": bool(row["fits"])
+            })
+        return results
+
+    def has_equivalents(self, product_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM equivalence_sources WHERE product_id = ?", (product_id,)
+            ).fetchone()
+        return row is not None
+
+    def equivalence_sources(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT product_id, vendor, dims FROM equivalence_sources").fetchall()
+        return {row["product_id"]: (row["vendor"], row["dims"]) for row in rows}
+
+    def stored_equivalents(self):
+        """{product_id: {brand: [(equivalent_id, distance), ...]}} for incremental runs"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT product_id, brand, equivalent_id, distance FROM equivalents ORDER BY product_id, brand, rank"
+            ).fetchall()
+        stored = {}
+        for row in rows:
+            stored.setdefault(row["product_id"], {}).setdefault(row["brand"], []).append(
+                (row["equivalent_id"], row["distance"])
+            )
+        return stored
+
+    def replace_equivalents(self, product_ids, rows, sources):
+        """Swap the equivalents of product_ids for rows, and record the dimensions they were computed from"""
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            for start in range(0, len(product_ids), BATCH_SIZE):
+                chunk = product_ids[start:start + BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cur.execute(f"DELETE FROM equivalents WHERE product_id IN ({placeholders})", chunk)
+                cur.execute(f"DELETE FROM equivalence_sources WHERE product_id IN ({placeholders})", chunk)
+            cur.executemany(
+                "INSERT INTO equivalents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (product_id, brand, rank, match["id"], match["title"], match["sku"], match["dimensions"],
+                     match["distance"], match["tolerance"], int(match["fits"]))
+                    for product_id, brand, rank, match in rows
+                ]
+            )
+            cur.executemany(
+                "INSERT INTO equivalence_sources (product_id, vendor, dims) VALUES (?, ?, ?)", sources
+            )
+
+    def search_products_by_date(self, date_condition, date_value):
+        """All products created after, before or on a YYYY-MM-DD date"""
+        if date_condition == "after":
+            where, params = "created_at > ?", (date_value,)
+        elif date_condition == "before":
+            where, params = "created_at < ?", (date_value,)
+        elif date_condition == "on":
+            where, params = "substr(created_at, 1, 10) = ?", (date_value,)
+        else:
+            return []
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {PRODUCT_NODE_COLUMNS} FROM products WHERE {where} ORDER BY created_at", params
+            ).fetchall()
+        return [product_row_to_node(row) for row in rows]
+
+
+def _product_row(node):
+    # Bulk output carries featuredImage, the detail query carries images(first: 1)
+    image = node.get("featuredImage") or {}
+    if not image:
+        images = node.get("images", {}).get("edges", [])
+        image = images[0]["node"] if images else {}
+    return (
+        node["id"],
+        node.get("title"),
+        node.get("handle"),
+        node.get("status"),
+        node.get("productType"),
+        node.get("vendor"),
+        json.dumps(node.get("tags") or []),
+        node.get("createdAt"),
+        node.get("updatedAt"),
+        image.get("url")
+    )
+
+
+def _variant_row(node, product_id):
+    inventory_item = node.get("inventoryItem") or {}
+    unit_cost = inventory_item.get("unitCost") or {}
+    weight = (inventory_item.get("measurement") or {}).get("weight") or {}
+    return (
+        node["id"],
+        product_id,
+        node.get("sku"),
+        node.get("title"),
+        node.get("price"),
+        node.get("inventoryQuantity"),
+        inventory_item.get("id"),
+        unit_cost.get("amount"),
+        unit_cost.get("currencyCode"),
+        1 if inventory_item.get("tracked") else 0,
+        weight.get("value"),
+        weight.get("unit")
+    )
+
+
+def _flush_rows(cur, product_rows, tag_rows, variant_rows, metafield_rows):
+    """Write buffered rows and empty the buffers in place"""
+    if product_rows:
+        cur.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", product_rows)
+    if tag_rows:
+        cur.executemany("INSERT INTO product_tags VALUES (?, ?)", tag_rows)
+    if variant_rows:
+        cur.executemany("INSERT OR REPLACE INTO variants VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", variant_rows)
+    if metafield_rows:
+        cur.executemany("INSERT INTO metafields VALUES (?, ?, ?, ?)", metafield_rows)
+    for rows in (product_rows, tag_rows, variant_rows, metafield_rows):
+        rows.clear()
+
+
+def run_bulk_sync(client, store, poll_interval=5.0):
+    """Run a bulk operation over the whole catalog and stream its JSONL output into the mirror"""
+    result = client.graphql(BULK_RUN_MUTATION, {"query": BULK_PRODUCTS_QUERY})
+    payload = result.get("data", {}).get("bulkOperationRunQuery") or {}
+    if payload.get("userErrors"):
+        raise RuntimeError(f"Bulk operation rejected: {payload['userErrors']}")
+
+    while True:
+        time.sleep(poll_interval)
+        result = client.graphql(CURRENT_BULK_OPERATION_QUERY)
+        operation = result.get("data", {}).get("currentBulkOperation") or {}
+        status = operation.get("status")
+        if status == "COMPLETED":
+            break
+        if status in ("FAILED", "CANCELED", "EXPIRED"):
+            raise RuntimeError(f"Bulk operation {status}: {operation.get('errorCode')}")
+
+    # An empty catalog completes without a result file
+    if not operation.get("url"):
+        return store.load_bulk_jsonl([])
+
+    # The result URL is a signed storage link, so it is fetched without the Shopify token
+    with requests.get(operation["url"], stream=True, timeout=(client.timeout[0], 300)) as response:
+        response.raise_for_status()
+        return store.load_bulk_jsonl(response.iter_lines(decode_unicode=True))
+
+
+def run_incremental_sync(client, store, page_size=INCREMENTAL_PAGE_SIZE, reconcile=None):
+    """Upsert only products updated since the stored watermark, reconciling deletions periodically"""
+    watermark = store.get_state("updated_at_watermark")
+    if not watermark:
+        raise RuntimeError("No sync watermark found - run a full sync first")
+
+    # >= rather than > so products updated within the same second as the watermark are not missed
+    variables = {"query": f"updated_at:>='{watermark}'", "first": page_size}
+    changed = 0
+
+    for page in client.paginate(INCREMENTAL_PRODUCTS_QUERY, variables, raise_on_errors=True):
+        nodes = [edge["node"] for edge in page.get("edges", [])]
+        if not nodes:
+            continue
+        for node in nodes:
+            fetch_remaining_variants(client, node)
+        store.upsert_products(nodes)
+        changed += len(nodes)
+
+        # Pages are sorted by updatedAt, so the watermark can advance page by page
+        watermark = max(watermark, max(node.get("updatedAt") or "" for node in nodes))
+        store.set_state("updated_at_watermark", watermark)
+
+    if reconcile is None:
+        reconcile = _reconcile_due(store)
+    deleted = reconcile_deleted_products(client, store) if reconcile else 0
+
+    return changed, deleted
+
+
+def fetch_remaining_variants(client, node):
+    """Append the variants beyond the first page to a product node, so upserts see every variant"""
+    variants = node.setdefault("variants", {"edges": []})
+    page_info = variants.get("pageInfo") or {}
+    while page_info.get("hasNextPage"):
+        result = client.graphql(PRODUCT_VARIANTS_QUERY, {"id": node["id"], "after": page_info.get("endCursor")})
+        if result.get("errors"):
+            raise RuntimeError(f"Shopify query failed: {result['errors']}")
+        page = ((result.get("data") or {}).get("product") or {}).get("variants") or {}
+        variants["edges"].extend(page.get("edges", []))
+        page_info = page.get("pageInfo") or {}
+    variants["pageInfo"] = {"hasNextPage": False}
+
+
+def reconcile_deleted_products(client, store):
+    """Compare the full Shopify id set with the mirror and drop products deleted upstream"""
+    live_ids = set()
+    # A failed page must not look like an empty catalog, or every product would be deleted
+    for page in client.paginate(PRODUCT_IDS_QUERY, raise_on_errors=True):
+        live_ids.update(edge["node"]["id"] for edge in page.get("edges", []))
+
+    deleted = store.delete_products_not_in(live_ids)
+    store.set_state("last_reconcile", datetime.now(timezone.utc).isoformat())
+    return deleted
+
+
+def _reconcile_due(store):
+    last_reconcile = store.get_state("last_reconcile")
+    if not last_reconcile:
+        return True
+    elapsed = datetime.now(timezone.utc) - datetime.fromisoformat(last_reconcile)
+    return elapsed.total_seconds() >= RECONCILE_INTERVAL_HOURS * 3600
+
+
+def run_equivalence_job(store, brands=EQUIVALENCE_BRANDS, workers=None, full=False, k=3):
+    """Compute cross-brand equivalents for every product with interior dimensions.
+
+    Incremental runs only recompute products whose own dimensions changed, whose stored
+    equivalents changed or disappeared, or that a changed product now lands closer to than
+    their current k-th equivalent. Returns the number of products recomputed.
+    """
+    records = store.dimension_records()
+    current = {}
+    for record in records:
+        dims = interior_dimensions_from_record(record)
+        if dims:
+            current[record["id"]] = (record.get("vendor"), dims)
+
+    previous = {} if full else store.equivalence_sources()
+    changed = {
+        product_id for product_id, (vendor, dims) in current.items()
+        if previous.get(product_id) != (vendor, dims_key(dims))
+    }
+    removed = set(previous) - set(current)
+
+    if full or not previous:
+        affected = set(current)
+    else:
+        affected = set(changed)
+        brand_names = {brand.lower(): brand for brand in brands}
+        for product_id, by_brand in store.stored_equivalents().items():
+            if product_id not in current or product_id in affected:
+                continue
+            if any(equivalent_id in changed or equivalent_id in removed
+                   for matches in by_brand.values() for equivalent_id, _ in matches):
+                affected.add(product_id)
+                continue
+            dims = current[product_id][1]
+            for other_id in changed:
+                brand = brand_names.get((current[other_id][0] or "").strip().lower())
+                if not brand or other_id == product_id:
+                    continue
+                matches = by_brand.get(brand, [])
+                kth_distance = matches[-1][1] if len(matches) >= k else math.inf
+                if math.dist(dims, current[other_id][1]) < kth_distance:
+                    affected.add(product_id)
+                    break
+
+    stale = sorted(affected | removed)
+    if not stale:
+        return 0
+
+    tasks = [(product_id, *current[product_id]) for product_id in sorted(affected)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_equivalence_worker,
+                             initargs=(records,)) as pool:
+        futures = [
+            pool.submit(compute_equivalents_chunk, tasks[start:start + EQUIVALENCE_CHUNK_SIZE], brands, k)
+            for start in range(0, len(tasks), EQUIVALENCE_CHUNK_SIZE)
+        ]
+        for future in futures:
+            rows.extend(future.result())
+
+    sources = [(product_id, vendor, dims_key(dims)) for product_id, vendor, dims in tasks]
+    store.replace_equivalents(stale, rows, sources)
+    store.set_state("last_equivalence_run", datetime.now(timezone.utc).isoformat())
+    return len(affected)
+
+
+def sync_from_fixture(store, path):
+    """Load a bulk-operation style JSONL file in place of Shopify (used for local testing)"""
+    with open(path, encoding="utf-8") as fixture:
+        return store.load_bulk_jsonl(fixture)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the local Shopify catalog mirror")
+    parser.add_argument("command", choices=["sync", "equivalents"])
+    load_dotenv()
+
+    parser.add_argument("--db", default=os.getenv("CATALOG_DB_PATH", DEFAULT_CATALOG_DB_PATH),
+                        help="path of the SQLite mirror")
+    parser.add_argument("--fixture", help="load a local bulk JSONL file instead of calling Shopify")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only pull products updated since the last sync")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="force a deleted-product reconciliation during an incremental sync")
+    parser.add_argument("--endpoint", default=os.getenv("SHOPIFY_GRAPHQL_ENDPOINT"),
+                        help="GraphQL endpoint override, e.g. a local fake server")
+    parser.add_argument("--workers", type=int, help="equivalence job worker processes (default: CPU count)")
+    parser.add_argument("--full", action="store_true",
+                        help="recompute every product's equivalents instead of only changed ones")
+    args = parser.parse_args()
+
+    store = CatalogStore(args.db)
+
+    started = time.time()
+    if args.command == "equivalents":
+        count = run_equivalence_job(store, workers=args.workers, full=args.full)
+        print(f"Recomputed equivalents for {count} products in {time.time() - started:.1f}s")
+        return
+
+    if args.fixture:
+        count = sync_from_fixture(store, args.fixture)
+        print(f"Synced {count} products into {args.db} in {time.time() - started:.1f}s")
+        return
+
+    client = ShopifyClient(
+        os.getenv("SHOPIFY_STORE_URL"), os.getenv("SHOPIFY_ADMIN_API_TOKEN"), endpoint=args.endpoint
+    )
+    if args.incremental:
+        changed, deleted = run_incremental_sync(client, store, reconcile=args.reconcile or None)
+        print(f"Updated {changed} products, removed {deleted} deleted products in {time.time() - started:.1f}s")
+    else:
+        count = run_bulk_sync(client, store)
+        print(f"Synced {count} products into {args.db} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import bisect
+import math
+import re
+
+# "12.1 x 8.4 x 6.2", '12.1" x 8.4" x 6.2"', "30.7 × 21.3 × 15.7 cm"
+DIMENSION_PATTERN = re.compile(
+    r'(\d+\.?\d*)\s*(?:"|in\b|inches\b)?\s*[x×]\s*(\d+\.?\d*)\s*(?:"|in\b|inches\b)?\s*[x×]\s*(\d+\.?\d*)\s*(cm|mm|"|in\b|inches\b)?',
+    re.IGNORECASE
+)
+
+UNIT_TO_INCHES = {"cm": 1 / 2.54, "mm": 1 / 25.4}
+
+# Brands the offline equivalence table is computed for
+EQUIVALENCE_BRANDS = ["Nanuk", "SKB", "Pelican", "Storm", "Apache", "Seahorse"]
+
+# Largest per-axis difference (inches) for each tolerance label
+TOLERANCE_LEVELS = [(0.25, "exact"), (0.75, "close"), (1.5, "near")]
+
+
+def parse_dimensions(text):
+    """Interior L x W x H in inches, sorted largest first so orientation doesn't matter; None if absent"""
+    if not text:
+        return None
+    match = DIMENSION_PATTERN.search(str(text))
+    if not match:
+        return None
+    values = [float(match.group(i)) for i in (1, 2, 3)]
+    unit = (match.group(4) or "").lower()
+    factor = UNIT_TO_INCHES.get(unit, 1.0)
+    return tuple(sorted((round(value * factor, 3) for value in values), reverse=True))
+
+
+def format_dimensions(dims):
+    return " x ".join(f"{value:g}" for value in dims) + " in"
+
+
+def tolerance_label(target, dims):
+    """Label a candidate by its worst per-axis difference from the target"""
+    worst = max(abs(a - b) for a, b in zip(target, dims))
+    for limit, label in TOLERANCE_LEVELS:
+        if worst <= limit:
+            return label
+    return "approximate"
+
+
+def interior_dimensions_from_record(record):
+    """Interior dimensions from a product record's metafield, title or variant titles"""
+    for text in (record.get("interior_dimensions"), record.get("title"), record.get("variant_titles")):
+        dims = parse_dimensions(text)
+        if dims:
+            return dims
+    return None
+
+
+def records_from_product_nodes(nodes):
+    """Index records from GraphQL product nodes (metafields and variants as connections)"""
+    records = []
+    for node in nodes:
+        interior = None
+        for edge in node.get("metafields", {}).get("edges", []):
+            key = (edge.get("node", {}).get("key") or "").lower()
+            if "interior" in key and "dimension" in key:
+                interior = edge["node"].get("value")
+                break
+        variants = [edge["node"] for edge in node.get("variants", {}).get("edges", [])]
+        records.append({
+            "id": node.get("id"),
+            "title": node.get("title"),
+            "vendor": node.get("vendor"),
+            "sku": next((variant.get("sku") for variant in variants if variant.get("sku")), "N/A"),
+            "variant_titles": " | ".join(variant.get("title") or "" for variant in variants),
+            "interior_dimensions": interior
+        })
+    return records
+
+
+class DimensionIndex:
+    """Per-brand nearest-neighbour index over interior dimensions.
+
+    Each brand keeps its entries sorted by the longest side. A query walks outwards from the
+    bisect position and stops once the longest-side gap alone exceeds the k-th best distance,
+    so only a narrow slice of the brand is ever scored.
+    """
+
+    def __init__(self, records=()):
+        self.brands = {}  # brand (lowercase) -> (sorted longest sides, entries)
+        self.size = 0
+        entries_by_brand = {}
+        for record in records:
+            dims = interior_dimensions_from_record(record)
+            brand = (record.get("vendor") or "").strip().lower()
+            if not dims or not brand:
+                continue
+            entry = {
+                "id": record.get("id"),
+                "title": record.get("title"),
+                "sku": record.get("sku") or "N/A",
+                "dims": dims
+            }
+            entries_by_brand.setdefault(brand, []).append(entry)
+            self.size += 1
+
+        for brand, entries in entries_by_brand.items():
+            entries.sort(key=lambda entry: entry["dims"][0])
+            self.brands[brand] = ([entry["dims"][0] for entry in entries], entries)
+
+    def has_brand(self, brand):
+        return brand.strip().lower() in self.brands
+
+    def nearest(self, brand, target, k=3, exclude_id=None):
+        """Top-k entries of a brand closest to target (L, W, H), with distance and tolerance label"""
+        keys, entries = self.brands.get(brand.strip().lower(), ([], []))
+        if not entries:
+            return []
+
+        best = []  # (distance, position) kept sorted, at most k long
+        left = bisect.bisect_left(keys, target[0]) - 1
+        right = left + 1
+        while left >= 0 or right < len(entries):
+            bound = best[-1][0] if len(best) == k else math.inf
+            left_gap = target[0] - keys[left] if left >= 0 else math.inf
+            right_gap = keys[right] - target[0] if right < len(entries) else math.inf
+            if min(left_gap, right_gap) > bound:
+                break
+            if left_gap <= right_gap:
+                position, left = left, left - 1
+            else:
+                position, right = right, right + 1
+
+            entry = entries[position]
+            if exclude_id and entry["id"] == exclude_id:
+                continue
+            distance = math.dist(target, entry["dims"])
+            if distance < bound:
+                bisect.insort(best, (distance, position))
+                del best[k:]
+
+        return [
+            {
+                "id": entries[position]["id"],
+                "title": entries[position]["title"],
+                "sku": entries[position]["sku"],
+                "dimensions": format_dimensions(entries[position]["dims"]),
+                "distance": round(distance, 2),
+                "tolerance": tolerance_label(target, entries[position]["dims"]),
+                "fits": all(have >= need for have, need in zip(entries[position]["dims"], target))
+            }
+            for distance, position in best
+        ]
+
+
+def dims_key(dims):
+    """Stable text form of parsed dimensions, used to detect dimension changes between runs"""
+    return ",".join(f"{value:g}" for value in dims)
+
+
+# ---- offline equivalence job (process pool workers) ----
+
+_worker_index = None
+
+
+def init_equivalence_worker(records):
+    """Process pool initializer: each worker builds its own copy of the index once"""
+    global _worker_index
+    _worker_index = DimensionIndex(records)
+
+
+def compute_equivalents_chunk(products, brands, k=3):
+    """Top-k equivalents in every other brand for (product_id, vendor, dims) tuples.
+
+    Returns (product_id, brand, rank, match) rows.
+    """
+    rows = []
+    for product_id, vendor, dims in products:
+        for brand in brands:
+            if brand.lower() == (vendor or "").strip().lower():
+                continue
+            for rank, match in enumerate(_worker_index.nearest(brand, dims, k=k, exclude_id=product_id), 1):
+                rows.append((product_id, brand, rank, match))
+    return rows
@@ -0,0 +1,104 @@
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+
+# Trigrams found in more than this share of documents are only used for scoring, not for candidate lookup
+COMMON_TRIGRAM_SHARE = 0.02
+MIN_CANDIDATE_GRAMS = 3
+# Only the documents sharing the most lookup trigrams get a full score
+MAX_SCORED_CANDIDATES = 200
+
+
+def normalize_text(text):
+    return re.sub(r"[^0-9a-z]+", " ", (text or "").lower()).strip()
+
+
+def text_trigrams(text):
+    """Padded character trigrams of every word, plus the word-joined form of tokens containing digits
+    (so "1510-000" also matches the compact "1510000110")"""
+    words = normalize_text(text).split()
+    if any(ch.isdigit() for ch in "".join(words)) and len(words) > 1:
+        words.append("".join(words))
+    grams = set()
+    for word in words:
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Character-trigram index over product titles, SKUs and tags with IDF-weighted ranking.
+
+    Candidates come from the posting lists of the query's rarer trigrams; the ones sharing the
+    most of them are then scored by the IDF-weighted share of query trigrams they contain, with
+    a small bonus for documents that are not much longer than the query.
+    """
+
+    def __init__(self, records):
+        self.records = []
+        self.doc_grams = []
+        self.doc_by_id = {}
+        postings = defaultdict(list)
+        for record in records:
+            text = " ".join([record.get("title") or ""] + list(record.get("skus") or []) + list(record.get("tags") or []))
+            grams = text_trigrams(text)
+            doc = len(self.records)
+            self.records.append(record)
+            self.doc_by_id[record.get("id")] = doc
+            self.doc_grams.append(frozenset(grams))
+            for gram in grams:
+                postings[gram].append(doc)
+
+        self.postings = {gram: array("I", docs) for gram, docs in postings.items()}
+        total = max(len(self.records), 1)
+        self.idf = {gram: math.log(1 + total / len(docs)) for gram, docs in self.postings.items()}
+        self.max_idf = math.log(1 + total)
+        self.common_limit = max(50, int(total * COMMON_TRIGRAM_SHARE))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _score(self, query_grams, query_weight, doc):
+        grams = self.doc_grams[doc]
+        shared = query_grams & grams
+        if not shared:
+            return 0.0
+        coverage = sum(self.idf.get(gram, self.max_idf) for gram in shared) / query_weight
+        compactness = len(shared) / len(grams)
+        return 0.9 * coverage + 0.1 * compactness
+
+    def search(self, query, limit=20, min_score=0.35):
+        """[(record, score)] best first"""
+        query_grams = text_trigrams(query)
+        if not query_grams:
+            return []
+        query_weight = sum(self.idf.get(gram, self.max_idf) for gram in query_grams)
+
+        known = sorted((gram for gram in query_grams if gram in self.postings), key=lambda gram: len(self.postings[gram]))
+        lookup = [gram for gram in known if len(self.postings[gram]) <= self.common_limit]
+        if len(lookup) < MIN_CANDIDATE_GRAMS:
+            lookup = known[:MIN_CANDIDATE_GRAMS]
+
+        counts = Counter()
+        for gram in lookup:
+            counts.update(self.postings[gram])
+
+        scored = []
+        for doc, _ in counts.most_common(MAX_SCORED_CANDIDATES):
+            score = self._score(query_grams, query_weight, doc)
+            if score >= min_score:
+                scored.append((score, doc))
+        scored.sort(key=lambda item: (-item[0], self.records[item[1]].get("title") or ""))
+        return [(self.records[doc], round(score, 3)) for score, doc in scored[:limit]]
+
+    def rank(self, query, ids):
+        """{id: score} for specific records, e.g. to order exact-match hits"""
+        query_grams = text_trigrams(query)
+        if not query_grams:
+            return {}
+        query_weight = sum(self.idf.get(gram, self.max_idf) for gram in query_grams)
+        return {
+            gid: round(self._score(query_grams, query_weight, self.doc_by_id[gid]), 3)
+            for gid in ids if gid in self.doc_by_id
+        }
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_LLM_CACHE_DB_PATH = "llm_cache.db"
+
+# Bump when prompts or the response handling change so stale completions are never served
+LLM_CACHE_VERSION = "1"
+
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    model TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_version ON llm_cache (version);
+"""
+
+
+class LLMCache:
+    """Disk-backed cache of deterministic (temperature=0) chat completions.
+
+    Entries are keyed on a hash of the version tag and the full request (model, messages,
+    tools, limits). Expired entries are treated as misses, entries from other versions are
+    dropped on startup, and the least recently used rows are pruned above max_entries.
+    """
+
+    def __init__(self, db_path=DEFAULT_LLM_CACHE_DB_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl=DEFAULT_TTL, version=LLM_CACHE_VERSION):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM llm_cache WHERE version != ?", (version,))
+
+    def make_key(self, request):
+        """Hash of the version tag and the JSON-serializable request kwargs"""
+        payload = json.dumps([self.version, request], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Cached response text, or None on a miss or an expired entry"""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row["created_at"] > self.ttl:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                self.expired += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row["response"]
+
+    def set(self, key, response, model=None):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, version, model, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.version, model, response, now, now)
+            )
+            overflow = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
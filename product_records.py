@@ -0,0 +1,147 @@
+def to_float(value):
+    """float of a Shopify decimal string, or None when missing/unparseable"""
+    if value in (None, "", "N/A"):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def amount_text(value, suffix=""):
+    return f"{value:.2f}{suffix}" if value is not None else "N/A"
+
+
+class Variant:
+    """One product variant with numeric price/cost/weight and profit, margin and markup worked out once"""
+
+    __slots__ = ("id", "title", "sku", "options", "price", "cost", "currency", "inventory",
+                 "inventory_item_id", "tracked", "weight", "weight_unit", "profit", "margin", "markup")
+
+    def __init__(self, id, title=None, sku=None, options=(), price=None, cost=None, currency=None, inventory=None,
+                 inventory_item_id=None, tracked=None, weight=None, weight_unit=None):
+        self.id = id
+        self.title = title
+        self.sku = sku
+        self.options = tuple(options)
+        self.price = price
+        self.cost = cost
+        self.currency = currency
+        self.inventory = inventory
+        self.inventory_item_id = inventory_item_id
+        self.tracked = tracked
+        self.weight = weight
+        self.weight_unit = weight_unit
+
+        # A zero or missing cost (or price) leaves profit and margin as N/A; markup needs a cost
+        if cost and price:
+            self.profit = price - cost
+            self.margin = self.profit / price * 100
+        else:
+            self.profit = self.margin = None
+        self.markup = price / cost if cost and price is not None else None
+
+    @classmethod
+    def from_node(cls, node):
+        inventory_item = node.get("inventoryItem") or {}
+        unit_cost = inventory_item.get("unitCost") or {}
+        weight = (inventory_item.get("measurement") or {}).get("weight") or {}
+        return cls(
+            node.get("id"),
+            title=node.get("title"),
+            sku=node.get("sku"),
+            options=((option.get("name"), option.get("value")) for option in node.get("selectedOptions") or []),
+            price=to_float(node.get("price")),
+            cost=to_float(unit_cost.get("amount")),
+            currency=unit_cost.get("currencyCode"),
+            inventory=node.get("inventoryQuantity"),
+            inventory_item_id=inventory_item.get("id"),
+            tracked=inventory_item.get("tracked"),
+            weight=to_float(weight.get("value")),
+            weight_unit=weight.get("unit")
+        )
+
+    def to_node(self):
+        """GraphQL-shaped variant node for the helpers that walk the API response format"""
+        inventory_item = {"id": self.inventory_item_id, "tracked": self.tracked}
+        if self.cost is not None:
+            inventory_item["unitCost"] = {"amount": amount_text(self.cost), "currencyCode": self.currency}
+        if self.weight is not None:
+            inventory_item["measurement"] = {"weight": {"value": self.weight, "unit": self.weight_unit}}
+        return {
+            "id": self.id,
+            "title": self.title,
+            "sku": self.sku,
+            "selectedOptions": [{"name": name, "value": value} for name, value in self.options],
+            "price": amount_text(self.price),
+            "inventoryQuantity": self.inventory,
+            "inventoryItem": inventory_item
+        }
+
+    def answer_fields(self):
+        """cost/profit/margin/markup as the text the answer and prompt builders expect"""
+        return {
+            "cost": amount_text(self.cost),
+            "profit": amount_text(self.profit),
+            "margin": amount_text(self.margin, "%"),
+            "markup": amount_text(self.markup)
+        }
+
+
+class Product:
+    """Compact product record: the fields answers and follow-ups read, with its variants as Variant records"""
+
+    __slots__ = ("id", "title", "vendor", "status", "product_type", "tags", "updated_at", "image_url",
+                 "dimensions", "variants")
+
+    def __init__(self, id, title=None, vendor=None, status=None, product_type=None, tags=(), updated_at=None,
+                 image_url=None, dimensions=(), variants=()):
+        self.id = id
+        self.title = title
+        self.vendor = vendor
+        self.status = status
+        self.product_type = product_type
+        self.tags = tuple(tags)
+        self.updated_at = updated_at
+        self.image_url = image_url
+        self.dimensions = tuple(dimensions)  # (metafield key, value) of the dimension metafields
+        self.variants = tuple(variants)
+
+    @classmethod
+    def from_node(cls, node):
+        images = node.get("images", {}).get("edges", [])
+        return cls(
+            node.get("id"),
+            title=node.get("title"),
+            vendor=node.get("vendor"),
+            status=node.get("status"),
+            product_type=node.get("productType"),
+            tags=node.get("tags") or (),
+            updated_at=node.get("updatedAt"),
+            image_url=images[0]["node"].get("url") if images else None,
+            # Only dimension metafields are read after a lookup (answers and equivalent searches)
+            dimensions=(
+                (edge["node"].get("key"), edge["node"].get("value"))
+                for edge in node.get("metafields", {}).get("edges", [])
+                if "dimension" in (edge["node"].get("key") or "").lower()
+            ),
+            variants=(Variant.from_node(edge["node"]) for edge in node.get("variants", {}).get("edges", []))
+        )
+
+    def to_node(self):
+        """GraphQL-shaped product details, as returned by fetch_product_details_by_gid"""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "vendor": self.vendor,
+            "status": self.status,
+            "productType": self.product_type,
+            "tags": list(self.tags),
+            "updatedAt": self.updated_at,
+            "images": {"edges": [{"node": {"url": self.image_url}}] if self.image_url else []},
+            "metafields": {"edges": [{"node": {"key": key, "value": value}} for key, value in self.dimensions]},
+            "variants": {"edges": [{"node": variant.to_node()} for variant in self.variants]}
+        }
+
+    def variant(self, gid):
+        return next((variant for variant in self.variants if variant.id == gid), None)
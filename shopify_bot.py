@@ -1,11 +1,29 @@
 #Currently working OK - Deployed on 25th August 2025
 
 import os
+import sys
+import json
+import logging
 import streamlit as st
-import requests
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from openai import OpenAI
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
 import re
+from datetime import datetime, timedelta
+
+from shopify_client import (
+    ShopifyClient, StaleWhileRevalidateCache, ResponseCache, SingleFlight, FanOut, estimate_query_cost,
+    PRODUCT_DETAIL_FIELDS, SINGLE_QUERY_COST_LIMIT
+)
+from catalog_store import CatalogStore, DEFAULT_CATALOG_DB_PATH, products_connection, normalize_sku
+from fuzzy_index import TrigramIndex
+from variant_matcher import match_option
+from product_records import Product, Variant, amount_text
+from dimension_index import DimensionIndex, parse_dimensions, records_from_product_nodes
+from llm_cache import LLMCache, DEFAULT_LLM_CACHE_DB_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -16,24 +34,181 @@ SHOPIFY_STORE_URL = os.getenv("SHOPIFY_STORE_URL")
 # Initialize OpenAI client
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-# Shopify headers
-headers = {
-    "X-Shopify-Access-Token": SHOPIFY_ADMIN_API_TOKEN,
-    "Content-Type": "application/json"
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", DEFAULT_LLM_CACHE_DB_PATH)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES)))
+
+
+# NEW: Identical concurrent deterministic prompts share a single OpenAI call across sessions
+@st.cache_resource
+def get_llm_single_flight():
+    return SingleFlight()
+
+
+# NEW: Deterministic completions persist across sessions and restarts
+@st.cache_resource
+def get_llm_cache():
+    return LLMCache(LLM_CACHE_DB_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL)
+
+
+def create_chat_completion(**kwargs):
+    """chat.completions.create; temperature=0 requests are served from the persistent cache
+    and identical in-flight misses are coalesced into one OpenAI call"""
+    label = sys._getframe(1).f_code.co_name
+    if kwargs.get("temperature") != 0 or kwargs.get("stream"):
+        log_prompt_size(label, kwargs.get("messages", []))
+        return openai_client.chat.completions.create(**kwargs)
+
+    cache = get_llm_cache()
+    cache_key = cache.make_key(kwargs)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return ChatCompletion.model_validate_json(cached)
+
+    def fetch():
+        log_prompt_size(label, kwargs.get("messages", []))
+        response = openai_client.chat.completions.create(**kwargs)
+        cache.set(cache_key, response.model_dump_json(), model=kwargs.get("model"))
+        return response
+
+    response, _ = get_llm_single_flight().do(cache_key, fetch)
+    return response
+
+SHOPIFY_CONNECT_TIMEOUT = float(os.getenv("SHOPIFY_CONNECT_TIMEOUT", "5"))
+SHOPIFY_READ_TIMEOUT = float(os.getenv("SHOPIFY_READ_TIMEOUT", "30"))
+SHOPIFY_GRAPHQL_ENDPOINT = os.getenv("SHOPIFY_GRAPHQL_ENDPOINT")  # optional override, e.g. a local fake server
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", DEFAULT_CATALOG_DB_PATH)
+PRODUCT_COUNT_MAX_AGE = float(os.getenv("PRODUCT_COUNT_MAX_AGE", "300"))  # seconds before a live count is refreshed
+PRODUCT_COUNT_MAX_PAGES = int(os.getenv("PRODUCT_COUNT_MAX_PAGES", "40"))  # 250 ids per page; larger counts read "N+"
+
+# NEW: Response cache TTLs in seconds - inventory and cost move quickly, titles and handles rarely do
+RESPONSE_CACHE_TTLS = {
+    "search": 600,
+    "product_details": 60,
+    "inventory_item": 30
 }
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "32")) * 1024 * 1024
+
+EQUIVALENT_TOP_K = 3  # ranked equivalents listed per brand
+
+FAN_OUT_WORKERS = int(os.getenv("FAN_OUT_WORKERS", "8"))
+FAN_OUT_TIMEOUT = float(os.getenv("FAN_OUT_TIMEOUT", "45"))  # seconds for each concurrent leg
+
+
+# NEW: One pooled Shopify client per process, shared by every session
+@st.cache_resource
+def get_shopify_client():
+    """Create the shared keep-alive Shopify GraphQL client"""
+    return ShopifyClient(
+        SHOPIFY_STORE_URL,
+        SHOPIFY_ADMIN_API_TOKEN,
+        connect_timeout=SHOPIFY_CONNECT_TIMEOUT,
+        read_timeout=SHOPIFY_READ_TIMEOUT,
+        endpoint=SHOPIFY_GRAPHQL_ENDPOINT
+    )
+
+
+# NEW: Process-wide TTL + LRU cache of Shopify lookups, shared by every session
+@st.cache_resource
+def get_response_cache():
+    """Create the shared Shopify response cache"""
+    return ResponseCache(RESPONSE_CACHE_TTLS, max_bytes=RESPONSE_CACHE_MAX_BYTES)
+
+
+def normalize_cache_key(query_string):
+    return " ".join(str(query_string).lower().split())
+
+
+def invalidate_product_cache(gid=None):
+    """Drop cached details for one product, or every cached lookup when no gid is given"""
+    cache = get_response_cache()
+    if gid:
+        cache.invalidate("product_details", gid)
+    else:
+        cache.invalidate()
+
+
+# NEW: Local SQLite catalog mirror, populated by `python catalog_store.py sync`
+@st.cache_resource
+def get_catalog_store():
+    """Open the shared local catalog mirror"""
+    return CatalogStore(CATALOG_DB_PATH)
+
+
+# NEW: In-memory indexes derived from the catalog mirror, rebuilt whenever a sync changes the mirror
+@st.cache_resource
+def get_mirror_indexes():
+    return {}  # name -> (sync signature, index)
+
+
+def get_mirror_index(name, build):
+    """Index built by build(store) from the catalog mirror, or None until the mirror has been synced"""
+    store = get_catalog_store()
+    if not store.is_populated():
+        return None
+    indexes = get_mirror_indexes()
+    signature = store.mirror_signature()
+    cached = indexes.get(name)
+    if cached is None or cached[0] != signature:
+        cached = (signature, build(store))
+        indexes[name] = cached
+    return cached[1]
+
+
+def get_dimension_index():
+    return get_mirror_index("dimensions", lambda store: DimensionIndex(store.dimension_records()))
+
+
+def get_sku_index():
+    return get_mirror_index("sku", lambda store: store.sku_index())
+
+
+def get_fuzzy_index():
+    return get_mirror_index("fuzzy", lambda store: TrigramIndex(store.fuzzy_records()))
+
+
+def lookup_sku(text):
+    """(product gid, variant gid) for an exact SKU / part number, resolved without any network call"""
+    index = get_sku_index()
+    if not index:
+        return None
+    return index.get(normalize_sku(text))
+
+
+# NEW: Shared bounded pool for the independent Shopify/OpenAI legs of a single message
+@st.cache_resource
+def get_fan_out():
+    return FanOut(max_workers=FAN_OUT_WORKERS)
+
+
+def run_concurrently(calls, timeout=FAN_OUT_TIMEOUT):
+    """Run independent calls on the shared pool; returns (result, error) pairs in call order"""
+    ctx = get_script_run_ctx()
+
+    def with_script_context(fn):
+        def run():
+            # Worker threads need the session's script context for st.* calls
+            add_script_run_ctx(ctx=ctx)
+            return fn()
+        return run
+
+    return get_fan_out().run([with_script_context(fn) for fn in calls], timeout)
 
 # Session state setup
 for key in [
     "conversation", "awaiting_clarification", "clarification_type",
-    "clarification_data", "original_query", "original_product", "clarified_variant", "original_requested_info","current_product_memory", "current_product_data"
+    "clarification_data", "original_query", "original_product", "clarified_variant", "original_requested_info","current_product_memory", "current_product_data",
+    "clarification_details", "product_listing", "last_intent_path", "query_intent", "clarification_choice"
 ]:
      if key not in st.session_state:
         if "conversation" in key or "clarification_data" in key:
             st.session_state[key] = []
         elif "awaiting" in key:
             st.session_state[key] = False
-        elif key in ["current_product_memory", "current_product_data"]:  # NEW
+        elif key in ["current_product_memory", "current_product_data", "product_listing", "query_intent", "clarification_choice"]:  # NEW
             st.session_state[key] = None  # NEW: Initialize memory as None
+        elif key == "clarification_details":  # NEW: gid -> Product records fetched for the clarification
+            st.session_state[key] = {}
         else:
             st.session_state[key] = ""
 
@@ -280,7 +455,7 @@ Examples:
 """
     
     try:
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo", 
             messages=[{"role": "user", "content": prompt}], 
             temperature=0, 
@@ -295,24 +470,16 @@ Examples:
 def extract_interior_dimensions(product_data):
     """Extract interior dimensions from product data"""
     
-    # Check if dimensions are in the product data
-    if "dimensions" in product_data and product_data["dimensions"] != "N/A":
-        return product_data["dimensions"]
-    
-    # Try to extract from product info using metafields or description
-    full_product_info = product_data.get("full_product_info", {})
-    
-    # Check metafields for dimensions
-    metafields = full_product_info.get("metafields", {}).get("edges", [])
-    for metafield_edge in metafields:
-        metafield = metafield_edge.get("node", {})
-        key = metafield.get("key", "").lower()
-        if "interior" in key and "dimension" in key:
-            return metafield.get("value", "information unavailable")
+    # Check the dimension metafields kept on the product record
+    product = product_data.get("product")
+    for key, value in (product.dimensions if product else ()):
+        if "interior" in (key or "").lower():
+            return value or "information unavailable"
     
     # Try to extract from title or variant title
-    title = product_data.get("title", "")
-    variant_title = product_data.get("variant", {}).get("title", "")
+    title = product_data.get("title") or ""
+    variant = product_data.get("variant")
+    variant_title = (variant.title if variant else None) or ""
     all_text = f"{title} {variant_title}".lower()
     
     # Look for dimension patterns like "12x8x6" or similar
@@ -324,13 +491,39 @@ def extract_interior_dimensions(product_data):
     
     return "information unavailable"
 
-def search_products_by_brand_and_dimensions(brands, target_dimensions):
-    """Search for products from specific brands that match target dimensions"""
+def find_equivalents(product_id, brands, target_dimensions):
+    """{brand: ranked matches}, from the precomputed equivalence table where it has rows for the brand.
+
+    The offline job only covers EQUIVALENCE_BRANDS sources and targets, so any other brand (or a
+    source product it has not processed) falls back to the live/indexed dimension search.
+    """
+    equivalent_results = {brand: None for brand in brands}
+    store = get_catalog_store()
+    if product_id and store.has_equivalents(product_id):
+        stored = {name.lower(): matches for name, matches in store.get_equivalents(product_id, brands).items()}
+        equivalent_results.update((brand, stored.get(brand.lower())) for brand in brands)
+
+    missing = [brand for brand, matches in equivalent_results.items() if not matches]
+    if missing:
+        equivalent_results.update(search_products_by_brand_and_dimensions(missing, target_dimensions, exclude_id=product_id))
+    return equivalent_results
+
+
+def search_products_by_brand_and_dimensions(brands, target_dimensions, exclude_id=None):
+    """Rank each brand's products by interior-dimension distance to the target (no LLM involved)"""
     
-    results = {}
+    target = parse_dimensions(target_dimensions)
+    if not target:
+        return {brand: None for brand in brands}
     
-    for brand in brands:
-        # Search for products from this brand
+    index = get_dimension_index()
+    
+    def search_brand(brand):
+        # Brands covered by the catalog mirror are answered from the in-memory index
+        if index is not None and index.has_brand(brand):
+            return index.nearest(brand, target, k=EQUIVALENT_TOP_K, exclude_id=exclude_id)
+        
+        # Otherwise search this brand live and index just its results
         brand_query = f"""
         {{
           products(first: 50, query: "vendor:{brand} OR title:*{brand}* OR tag:{brand}") {{
@@ -365,103 +558,49 @@ def search_products_by_brand_and_dimensions(brands, target_dimensions):
         }}
         """
         
-        try:
-            response = requests.post(
-                f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-                headers=headers,
-                json={"query": brand_query}
-            )
-            result = response.json()
-            products = result.get("data", {}).get("products", {}).get("edges", [])
-            
-            # Find best match using OpenAI
-            if products:
-                best_match = find_best_dimensional_match(products, target_dimensions, brand)
-                if best_match:
-                    results[brand] = best_match
-            
-        except Exception as e:
-            print(f"Error searching {brand} products: {e}")
-            results[brand] = None
-    
-    return results
-
-def find_best_dimensional_match(products, target_dimensions, brand):
-    """Use OpenAI to find the best dimensional match"""
-    
-    # Prepare product list for comparison
-    product_info = []
-    for product_edge in products[:20]:  # Limit to first 20 for processing
-        product = product_edge["node"]
-        variants = product.get("variants", {}).get("edges", [])
-        sku = variants[0]["node"]["sku"] if variants else "N/A"
+        result = get_shopify_client().graphql(brand_query)
+        products = result.get("data", {}).get("products", {}).get("edges", [])
         
-        product_info.append({
-            "title": product["title"],
-            "sku": sku,
-            "vendor": product.get("vendor", ""),
-            "id": product["id"]
-        })
-    
-    product_list_str = "\n".join([
-        f"- {p['title']} (SKU: {p['sku']}, Vendor: {p['vendor']})" 
-        for p in product_info
-    ])
+        records = records_from_product_nodes(product["node"] for product in products)
+        for record in records:
+            record["vendor"] = brand
+        return DimensionIndex(records).nearest(brand, target, k=EQUIVALENT_TOP_K, exclude_id=exclude_id)
     
-    prompt = f"""
-You need to find the {brand} product that best matches these interior dimensions: {target_dimensions}
-
-Available {brand} products:
-{product_list_str}
-
-Rules:
-1. Look for products that likely have interior dimensions matching or closest to: {target_dimensions}
-2. Consider product titles, SKUs, and model numbers that might indicate size
-3. If dimensions are like "12.1 x 8.4 x 6.2", look for products with similar numbers in title/SKU
-4. Return the ONE best match, not multiple
-
-Return JSON:
-{{"best_match_title": "exact title from list", "confidence": "high/medium/low", "reason": "why this matches"}}
-
-If no reasonable match found:
-{{"best_match_title": null, "confidence": "low", "reason": "no dimensional match found"}}
-"""
+    # NEW: Each brand's search + match runs concurrently; results keep the order of brands
+    outcomes = run_concurrently([lambda brand=brand: search_brand(brand) for brand in brands])
     
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=300
-        )
-        result = eval(response.choices[0].message.content.strip())
-        
-        if result.get("best_match_title"):
-            # Find the matching product and return details
-            matched_product = next(
-                (p for p in product_info if p["title"] == result["best_match_title"]), 
-                None
-            )
-            if matched_product:
-                return {
-                    "title": matched_product["title"],
-                    "sku": matched_product["sku"],
-                    "confidence": result.get("confidence", "medium"),
-                    "reason": result.get("reason", "dimensional match")
-                }
-        
-        return None
-        
-    except Exception as e:
-        print(f"Error in dimensional matching: {e}")
-        return None
+    results = {}
+    for brand, (matches, error) in zip(brands, outcomes):
+        if error is not None:
+            print(f"Error searching {brand} products: {error}")
+            results[brand] = None
+        elif matches:
+            results[brand] = matches
+    
+    return results
 
 
 # NEW: Store product in memory
 def store_product_in_memory(product_title, product_data):
-    """Store the current product and its data in session memory"""
+    """Store the current product and its data in session memory, keeping only the selected variant"""
     st.session_state.current_product_memory = product_title
-    st.session_state.current_product_data = product_data
+    st.session_state.current_product_data = {**product_data, "product": remembered_product(product_data)}
+
+
+def remembered_product(product_data):
+    """Product record cut down to what follow-ups read: id, tags, status, type, interior dimensions and the variant"""
+    product, variant = product_data.get("product"), product_data.get("variant")
+    if product is None:
+        return None
+    return Product(
+        product.id,
+        title=product.title,
+        status=product.status,
+        product_type=product.product_type,
+        tags=product.tags,
+        dimensions=((key, value) for key, value in product.dimensions if "interior" in (key or "").lower()),
+        variants=(variant,) if variant else ()
+    )
 
 
 # NEW: Clear product memory
@@ -482,6 +621,17 @@ def is_new_product_request(query):
     current_product = st.session_state.current_product_memory.lower()
     query_lower = query.lower()
     
+    # NEW: Let the rule-based router answer before spending LLM calls
+    routed = route_confidently(query)
+    if routed:
+        if routed["intent"] == "current_product":
+            return False
+        if routed["intent"] == "comparison":
+            return True
+        if routed["intent"] == "product":
+            requested_product = routed["product_name_or_sku"].lower()
+            return requested_product not in current_product and current_product not in requested_product
+    
     # Extract potential product names/SKUs from the query
     intent = extract_product_intent(query)
     if intent and intent.get("product_name_or_sku"):
@@ -500,67 +650,103 @@ def is_new_product_request(query):
 
 
 
-# Extract product intent
-def extract_product_intent(query):
-    prompt = f"""
-From the query below, extract:
-1. product_name_or_sku (string) - can be SKU, part number, P/N, or product title keywords
-2. requested_info (list of fields like price, cost, inventory, dimensions, profit, margin, markup)
-
-Note: SKU can also be referred to as "part number" or "P/N"
+# NEW: One structured call classifies the query and extracts every field the handlers need
+QUERY_INTENT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "classify_query",
+        "description": "Classify a Shopify store assistant query and extract its parameters.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "intent": {
+                    "type": "string",
+                    "enum": ["date", "status_category", "comparison", "product", "cost_update", "other"],
+                    "description": "date: products created after/before/on a date. status_category: products by status "
+                                   "and/or category. comparison: two products compared. product: one product. "
+                                   "cost_update: when a product cost was last updated. other: greetings and anything else."
+                },
+                "product_name_or_sku": {
+                    "type": ["string", "null"],
+                    "description": "SKU, part number, P/N or product title keywords of the single product asked about"
+                },
+                "product1_name_or_sku": {"type": ["string", "null"]},
+                "product2_name_or_sku": {"type": ["string", "null"]},
+                "requested_info": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Fields like price, cost, inventory, dimensions, weight, profit, margin, markup"
+                },
+                "date_condition": {"type": ["string", "null"], "enum": ["after", "before", "on", None]},
+                "date_value": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+                "status_value": {"type": "string", "enum": ["DRAFT", "ACTIVE", "ARCHIVED", ""]},
+                "category_value": {"type": "string", "description": "Product category/type, or empty string"},
+                "query_type": {"type": "string", "enum": ["list", "count"]}
+            },
+            "required": ["intent", "requested_info", "query_type"]
+        }
+    }
+}
 
-IMPORTANT: Only extract if this is clearly a product-related query. If the query is a greeting, general question, or doesn't mention any specific product, return null.
 
-Respond as JSON:
-{{"product_name_or_sku": "...", "requested_info": ["...", "..."]}}
+def extract_query_intent(query):
+    """Extract date, status/category, comparison, product and cost update intent in one LLM call.
 
-If this is not a product query, respond with:
-{{"product_name_or_sku": null, "requested_info": []}}
+    The result is memoized per session for the latest query, so the extract_*_intent helpers below
+    (and is_new_product_request) share a single round trip.
+    """
+    memo = st.session_state.get("query_intent")
+    if memo and memo["query"] == query:
+        return memo["result"]
 
-Query: "{query}"
-"""
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "user", "content": prompt}], temperature=0, max_tokens=300
-    )
     try:
-        result = eval(response.choices[0].message.content.strip())
-        # Additional validation
-        if result.get("product_name_or_sku") is None or result.get("product_name_or_sku") == "":
-            return None
-        return result
-    except:
-        return None
+        response = create_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "Note: SKU can also be referred to as \"part number\" or \"P/N\". "
+                                              "Only extract a product if the query clearly mentions one."},
+                {"role": "user", "content": query}
+            ],
+            tools=[QUERY_INTENT_TOOL],
+            tool_choice={"type": "function", "function": {"name": "classify_query"}},
+            temperature=0,
+            max_tokens=300
+        )
+        result = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+    except Exception:
+        result = None
 
+    st.session_state.query_intent = {"query": query, "result": result}
+    return result
 
-# Extract comparison intent
-def extract_comparison_intent(query):
-    prompt = f"""
-From the query below, determine if this is a comparison query and extract:
-1. is_comparison (boolean)
-2. product1_name_or_sku (string)
-3. product2_name_or_sku (string)
-4. requested_info (list of fields like price, cost, inventory, dimensions, profit, margin)
 
-Look for keywords like "compare", "vs", "versus", "difference between", "and" connecting two products.
+# Extract product intent
+def extract_product_intent(query):
+    intent = extract_query_intent(query)
+    if not intent or not intent.get("product_name_or_sku"):
+        return None
+    return {
+        "product_name_or_sku": intent["product_name_or_sku"],
+        "requested_info": intent.get("requested_info") or []
+    }
 
-Respond as JSON:
-{{"is_comparison": true/false, "product1_name_or_sku": "...", "product2_name_or_sku": "...", "requested_info": ["...", "..."]}}
 
-Query: "{query}"
-"""
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "user", "content": prompt}], temperature=0, max_tokens=300
-    )
-    try:
-        result = eval(response.choices[0].message.content.strip())
-        return result
-    except Exception as e:
-        # print(f"Error parsing comparison intent: {e}")  # Debug print
+# Extract comparison intent
+def extract_comparison_intent(query):
+    intent = extract_query_intent(query)
+    if not intent:
         return None
+    return {
+        "is_comparison": bool(intent.get("intent") == "comparison" and
+                              intent.get("product1_name_or_sku") and intent.get("product2_name_or_sku")),
+        "product1_name_or_sku": intent.get("product1_name_or_sku"),
+        "product2_name_or_sku": intent.get("product2_name_or_sku"),
+        "requested_info": intent.get("requested_info") or []
+    }
 
 
 # ENHANCED: Extract status and category based queries
-def extract_status_and_category_intent(query):
+def extract_status_and_category_intent(query, use_llm=True):
     """Extract intent for status and category-based queries"""
     query_lower = query.lower()
     
@@ -622,39 +808,15 @@ def extract_status_and_category_intent(query):
     elif "list" in query_lower or "show" in query_lower or "which" in query_lower:
         query_type = "list"
     
-    # Use GPT as fallback for complex queries
-    if (is_status_query and not status_value) or (is_category_query and not category_value):
-        prompt = f"""
-From the query below, extract:
-1. status_value (one of: DRAFT, ACTIVE, ARCHIVED, or empty string if not mentioned)
-2. category_value (the product category/type mentioned, or empty string if not mentioned)
-
-Query: "{query}"
-
-Examples:
-- "Which products have status 'Draft' and are categorized as 'Uncategorized'?" 
-  -> status_value: "DRAFT", category_value: "Uncategorized"
-- "How many active products?"
-  -> status_value: "ACTIVE", category_value: "wine"
-- "List all draft products"
-  -> status_value: "DRAFT", category_value: ""
-
-Respond as JSON:
-{{"status_value": "...", "category_value": "..."}}
-"""
-        try:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo", messages=[{"role": "user", "content": prompt}], temperature=0, max_tokens=200
-            )
-            result = eval(response.choices[0].message.content.strip())
-            if result.get("status_value"):
-                status_value = result["status_value"]
-                is_status_query = True
-            if result.get("category_value"):
-                category_value = result["category_value"]
-                is_category_query = True
-        except:
-            pass
+    # Use the structured intent call as fallback for complex queries
+    if use_llm and ((is_status_query and not status_value) or (is_category_query and not category_value)):
+        result = extract_query_intent(query) or {}
+        if result.get("status_value"):
+            status_value = result["status_value"]
+            is_status_query = True
+        if result.get("category_value"):
+            category_value = result["category_value"]
+            is_category_query = True
     
     return {
         "is_status_query": is_status_query,
@@ -676,36 +838,16 @@ def extract_date_intent(query):
     if not is_date_query:
         return None
     
-    # Use GPT to extract date information
-    prompt = f"""
-From the query below, extract:
-1. date_condition (one of: "after", "before", "on")
-2. date_value (in YYYY-MM-DD format)
-3. query_type (one of: "list", "count")
-
-Examples:
-- "List products created after August 1, 2024" -> date_condition: "after", date_value: "2024-08-01", query_type: "list"
-- "How many products were created before January 15, 2024?" -> date_condition: "before", date_value: "2024-01-15", query_type: "count"
-- "Show products created on December 1, 2023" -> date_condition: "on", date_value: "2023-12-01", query_type: "list"
-
-Query: "{query}"
-
-Respond as JSON:
-{{"date_condition": "...", "date_value": "...", "query_type": "..."}}
-"""
-    
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo", 
-            messages=[{"role": "user", "content": prompt}], 
-            temperature=0, 
-            max_tokens=200
-        )
-        result = eval(response.choices[0].message.content.strip())
-        return result
-    except:
+    # Use the structured intent call to extract date information
+    result = extract_query_intent(query)
+    if not result or not result.get("date_condition") or not result.get("date_value"):
         return None
-    
+    return {
+        "date_condition": result["date_condition"],
+        "date_value": result["date_value"],
+        "query_type": result.get("query_type", "list")
+    }
+
 
 def extract_cost_update_intent(query):
     """Simple function to check if the query is asking about cost updates"""
@@ -771,68 +913,95 @@ def extract_cost_update_product_name(query):
 
 
 def extract_weight_from_variant(variant):
-    """Extract weight information from variant with correct GraphQL structure"""
-    try:
-        inventory_item = variant.get("inventoryItem", {})
-        measurement = inventory_item.get("measurement", {})
-        weight_data = measurement.get("weight", {})
-        
-        if weight_data:
-            weight_value = weight_data.get("value")
-            weight_unit = weight_data.get("unit", "")
-            
-            if weight_value is not None and weight_value != 0:
-                return f"{weight_value} {weight_unit}" if weight_unit else f"{weight_value}"
-            else:
-                return "information unavailable"
-        else:
-            return "information unavailable"
-            
-    except (KeyError, TypeError, AttributeError):
+    """Weight of a Variant record with its unit, or "information unavailable" when missing or zero"""
+    if variant is None or not variant.weight:
         return "information unavailable"
+    return f"{variant.weight} {variant.weight_unit}" if variant.weight_unit else f"{variant.weight}"
+
+
+
+# NEW: Live product count, only used until the local catalog mirror has been synced
+PRODUCT_COUNT_QUERY = """
+query productCountPage($query: String, $after: String) {
+  products(first: 250, after: $after, query: $query) {
+    edges {
+      node { id }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+"""
+
 
+def build_product_count_filter(status=None, category=None, date_condition=None, date_value=None):
+    """Build the Shopify search string for a filtered product count ("" counts the whole catalog)"""
+    conditions = []
+    if status or category:
+        conditions.append(build_criteria_search(status, category))
+    if date_condition:
+        date_filter = build_date_search(date_condition, date_value)
+        if date_filter:
+            conditions.append(date_filter)
+    return " AND ".join(conditions)
 
 
-def get_total_product_count():
-    """Get total count of products on the site with pagination"""
+def count_products_live(client, query_filter="", max_pages=PRODUCT_COUNT_MAX_PAGES):
+    """Count products by paging through ids only; returns (count, capped), stopping early after max_pages"""
     total_count = 0
-    has_next = True
-    cursor = None
+    for page_number, page in enumerate(client.paginate(PRODUCT_COUNT_QUERY, {"query": query_filter or None}), 1):
+        total_count += len(page.get("edges", []))
+        if page_number >= max_pages and page.get("pageInfo", {}).get("hasNextPage"):
+            return total_count, True
+    return total_count, False
 
-    while has_next:
-        query = f"""
-        {{
-          products(first: 250{', after: "' + cursor + '"' if cursor else ''}) {{
-            edges {{
-              cursor
-              node {{ id }}
-            }}
-            pageInfo {{
-              hasNextPage
-              endCursor
-            }}
-          }}
-        }}
-        """
-        response = requests.post(
-            f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-            headers=headers,
-            json={"query": query}
-        )
-        result = response.json()
-        products = result.get("data", {}).get("products", {}).get("edges", [])
-        total_count += len(products)
-        page_info = result.get("data", {}).get("products", {}).get("pageInfo", {})
-        has_next = page_info.get("hasNextPage", False)
-        cursor = page_info.get("endCursor")
-    
-    return f"{total_count} products"
+
+@st.cache_resource
+def get_product_count_cache():
+    """Process-wide stale-while-revalidate cache of live product counts"""
+    cache = StaleWhileRevalidateCache(max_age=PRODUCT_COUNT_MAX_AGE)
+
+    # Pre-warm the unfiltered total so the first "how many products" question does not wait on pagination
+    if not get_catalog_store().is_populated():
+        client = get_shopify_client()
+        cache.refresh_in_background("", lambda: count_products_live(client))
+    return cache
+
+
+def count_catalog_products(status=None, category=None, date_condition=None, date_value=None):
+    """(number of products matching the filters, whether the live count stopped at the page cap)"""
+    # Constant-time answer from the local catalog mirror when it is available
+    store = get_catalog_store()
+    if store.is_populated():
+        return store.count_products(status, category, date_condition, date_value), False
+
+    # Otherwise serve the last live count and refresh it in the background when stale
+    client = get_shopify_client()
+    query_filter = build_product_count_filter(status, category, date_condition, date_value)
+    return get_product_count_cache().get(query_filter, lambda: count_products_live(client, query_filter))
+
+
+def format_product_count(total, capped):
+    """Count as shown to the user: "N+" when the live count stopped at the page cap"""
+    return f"{total}+" if capped else str(total)
+
+
+def get_total_product_count(status=None, category=None, date_condition=None, date_value=None):
+    """Get total count of products on the site, optionally filtered by status/category/creation date"""
+    return f"{format_product_count(*count_catalog_products(status, category, date_condition, date_value))} products"
 
 
 
 # NEW: Fetch inventory item details for cost, profit, and margin
 def fetch_inventory_item_details(inventory_item_id):
     """Fetch cost, profit, and margin from inventory item"""
+    cache = get_response_cache()
+    inventory_item = cache.get("inventory_item", inventory_item_id)
+    if inventory_item is not None:
+        return inventory_item
+
     query = f"""
     {{
       inventoryItem(id: "{inventory_item_id}") {{
@@ -847,14 +1016,11 @@ def fetch_inventory_item_details(inventory_item_id):
     }}
     """
     
-    response = requests.post(
-        f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-        headers=headers,
-        json={"query": query}
-    )
-    
-    result = response.json()
-    return result.get("data", {}).get("inventoryItem", {})
+    result = get_shopify_client().graphql(query)
+    inventory_item = result.get("data", {}).get("inventoryItem", {})
+    if inventory_item:
+        cache.set("inventory_item", inventory_item_id, inventory_item)
+    return inventory_item
 
 def get_inventory_item_cost_update_time(inventory_item_id):
     """
@@ -877,13 +1043,7 @@ def get_inventory_item_cost_update_time(inventory_item_id):
     """
     
     try:
-        response = requests.post(
-            f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-            headers=headers,
-            json={"query": query}
-        )
-        
-        result = response.json()
+        result = get_shopify_client().graphql(query)
         inventory_item = result.get("data", {}).get("inventoryItem", {})
         
         return {
@@ -896,54 +1056,14 @@ def get_inventory_item_cost_update_time(inventory_item_id):
         return {"updated_at": "N/A", "cost": "N/A", "currency": "USD"}
 
 
-# NEW: Calculate profit and margin
-def calculate_profit_and_margin(cost, price):
-    """Calculate profit and margin from cost and price"""
-    try:
-        cost_float = float(cost) if cost and cost != "N/A" else 0
-        price_float = float(price) if price and price != "N/A" else 0
-        
-        if cost_float == 0 or price_float == 0:
-            return {"profit": "N/A", "margin": "N/A"}
-        
-        profit = price_float - cost_float
-        margin = (profit / price_float) * 100
-        
-        return {
-            "profit": f"{profit:.2f}",
-            "margin": f"{margin:.2f}%"
-        }
-    except (ValueError, TypeError, ZeroDivisionError):
-        return {"profit": "N/A", "margin": "N/A"}
-
-
-def calculate_markup(cost, price):
-    """Calculate markup from cost and price (Price / Cost)"""
-    try:
-        cost_float = float(cost) if cost and cost != "N/A" else 0
-        price_float = float(price) if price and price != "N/A" else 0
-        
-        if cost_float == 0:
-            return {"markup": "N/A"}
-        
-        markup = price_float / cost_float
-        
-        return {"markup": f"{markup:.2f}"}
-    except (ValueError, TypeError, ZeroDivisionError):
-        return {"markup": "N/A"}
-
-
-def detect_wheels_in_product(product_info):
-    """Detect if product has wheels based on description and tags"""
-    
-    # Check product description
-    description = product_info.get("description", "").lower()
+def detect_wheels_in_product(product):
+    """Detect if a Product record has wheels based on its tags and title"""
     
     # Check product tags
-    tags = [tag.lower() for tag in product_info.get("tags", [])]
+    tags = [tag.lower() for tag in product.tags]
     
     # Check product title
-    title = product_info.get("title", "").lower()
+    title = (product.title or "").lower()
     
     # Wheel indicators
     wheel_keywords = [
@@ -952,7 +1072,7 @@ def detect_wheels_in_product(product_info):
     ]
     
     # Check in all text fields
-    all_text = f"{description} {' '.join(tags)} {title}"
+    all_text = f"{' '.join(tags)} {title}"
     
     has_wheels = any(keyword in all_text for keyword in wheel_keywords)
     
@@ -967,10 +1087,9 @@ def process_cost_update_query(query, product_name_or_sku=None):
         # User is asking about current product
         current_data = st.session_state.current_product_data
         if current_data and 'title' in current_data:
-            # Get the variant data to access inventory item ID
-            variant_data = current_data.get('variant', {})
-            inventory_item = variant_data.get('inventoryItem', {})
-            inventory_item_id = inventory_item.get('id')
+            # Get the variant record to access inventory item ID
+            variant = current_data.get('variant')
+            inventory_item_id = variant.inventory_item_id if variant else None
             
             if inventory_item_id:
                 # Get cost update information from inventory item
@@ -1013,7 +1132,7 @@ def process_cost_update_query(query, product_name_or_sku=None):
             # Multiple products found - ask for clarification
             st.session_state.awaiting_clarification = True
             st.session_state.clarification_type = "cost_update_product_selection"
-            st.session_state.clarification_data = products
+            remember_clarification_candidates(products)
             st.session_state.original_query = query
             
             product_list = []
@@ -1081,7 +1200,14 @@ def process_cost_update_query(query, product_name_or_sku=None):
 
 # Clarify which variant and what info
 def extract_variant_intent(user_input, variants):
-    variant_titles = [v["node"]["title"] for v in variants]
+    # NEW: Resolve the variant locally and only ask the LLM to break ties
+    match = match_option(user_input, [v["node"] for v in variants])
+    if not match["tied"]:
+        record_intent_path("rules", "variant")
+        matched_title = match["title"] if match["confidence"] == "high" else None
+        return {"matched_variant_title": matched_title, "requested_info": extract_current_product_info_request(user_input)}
+    record_intent_path("llm", "variant")
+    variant_titles = match["tied"]
     variant_list_str = "\n".join(f"- {title}" for title in variant_titles)
     prompt = f"""
 You are helping identify which variant the user means and what info they want.
@@ -1097,7 +1223,7 @@ Return JSON like:
 If uncertain, return:
 {{"matched_variant_title": null, "requested_info": []}}
 """
-    response = openai_client.chat.completions.create(
+    response = create_chat_completion(
         model="gpt-3.5-turbo", messages=[{"role": "user", "content": prompt}], temperature=0, max_tokens=300
     )
     try:
@@ -1106,11 +1232,8 @@ If uncertain, return:
         return {"matched_variant_title": None, "requested_info": []}
 
 
-# ENHANCED: Search products by status and/or category
-def search_products_by_criteria(status=None, category=None):
-    """Search for products with specific status and/or category"""
-    
-    # Build query conditions
+# NEW: Shopify search strings for status/category and creation date filters
+def build_criteria_search(status=None, category=None):
     query_conditions = []
     
     if status:
@@ -1121,267 +1244,395 @@ def search_products_by_criteria(status=None, category=None):
         query_conditions.append(f"(product_type:{category} OR tag:{category})")
     
     # Combine conditions with AND
-    query_string = " AND ".join(query_conditions) if query_conditions else "*"
-    
-    query = f"""
-    {{
-      products(first: 100, query: "{query_string}") {{
-        edges {{
-          node {{
-            id
-            title
-            handle
-            status
-            productType
-            tags
-            createdAt
-            updatedAt
-            vendor
-          }}
-        }}
-      }}
-    }}
-    """
-    
-    # print(f"GraphQL Query: {query}")  # Debug print
-    
-    response = requests.post(
-        f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-        headers=headers,
-        json={"query": query}
-    )
-    
-    result = response.json()
-    # print(f"API Response: {result}")  # Debug print
-    
-    return result
+    return " AND ".join(query_conditions) if query_conditions else "*"
 
-def search_products_by_date(date_condition, date_value):
-    """Search for products based on creation date"""
-    
-    # Convert date condition to GraphQL format
+
+def build_date_search(date_condition, date_value):
     if date_condition == "after":
-        date_filter = f"created_at:>{date_value}"
+        return f"created_at:>{date_value}"
     elif date_condition == "before":
-        date_filter = f"created_at:<{date_value}"
+        return f"created_at:<{date_value}"
     elif date_condition == "on":
-        date_filter = f"created_at:{date_value}"
-    else:
-        return {"data": {"products": {"edges": []}}}
-    
-    query = f"""
-    {{
-      products(first: 100, query: "{date_filter}") {{
-        edges {{
-          node {{
-            id
-            title
-            handle
-            status
-            productType
-            tags
-            createdAt
-            updatedAt
-            vendor
-          }}
-        }}
-      }}
-    }}
-    """
-    
-    # print(f"Date GraphQL Query: {query}")  # Debug print
-    
-    response = requests.post(
-        f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-        headers=headers,
-        json={"query": query}
-    )
-    
-    result = response.json()
-    # print(f"Date API Response: {result}")  # Debug print
+        return f"created_at:{date_value}"
+    return None
+
+
+# NEW: Lazy cursor paginator over products searches
+LIST_PAGE_SIZE = 15
+
+PRODUCT_LIST_QUERY = """
+query productListPage($query: String, $first: Int!, $after: String) {
+  products(first: $first, after: $after, query: $query) {
+    edges {
+      node {
+        id
+        title
+        handle
+        status
+        productType
+        tags
+        createdAt
+        updatedAt
+        vendor
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+"""
+
+
+def iter_product_pages(search_query, page_size=LIST_PAGE_SIZE, after=None):
+    """Yield (nodes, pageInfo) one page at a time"""
+    query, variables = PRODUCT_LIST_QUERY, {"query": search_query or None, "first": page_size}
+
+    for page in get_shopify_client().paginate(query, variables, after=after):
+        yield [edge["node"] for edge in page.get("edges", [])], page.get("pageInfo", {})
+
+
+# ENHANCED: Search products by status and/or category
+def search_products_by_criteria(status=None, category=None):
+    """Search for products with specific status and/or category"""
     
-    return result
+    # NEW: Serve from the local catalog mirror once it has been synced (no 100 product cap)
+    store = get_catalog_store()
+    if store.is_populated():
+        return products_connection(store.search_products_by_criteria(status=status, category=category))
+    
+    # NEW: Follow the cursor through every page instead of stopping at the first 100
+    query_string = build_criteria_search(status, category)
+    nodes = [node for page, _ in iter_product_pages(query_string, page_size=100) for node in page]
+    return products_connection(nodes)
 
-# Search Shopify products with fuzzy matching
-def search_products(query_string):
-    query = f"""
-    {{
-      products(first: 10, query: "title:{query_string} OR sku:{query_string} OR tag:{query_string}") {{
-        edges {{
-          node {{
-            id
-            title
-            handle
-          }}
-        }}
+def search_products_by_date(date_condition, date_value):
+    """Search for products based on creation date"""
+    
+    # Convert date condition to GraphQL format
+    date_filter = build_date_search(date_condition, date_value)
+    if not date_filter:
+        return {"data": {"products": {"edges": []}}}
+    
+    # NEW: Serve from the local catalog mirror once it has been synced (no 100 product cap)
+    store = get_catalog_store()
+    if store.is_populated():
+        return products_connection(store.search_products_by_date(date_condition, date_value))
+    
+    # NEW: Follow the cursor through every page instead of stopping at the first 100
+    nodes = [node for page, _ in iter_product_pages(date_filter, page_size=100) for node in page]
+    return products_connection(nodes)
+
+# NEW: Shopify search strings for the exact attempt and the wildcard fallback
+def build_exact_search(query_string):
+    return f"title:{query_string} OR sku:{query_string} OR tag:{query_string}"
+
+
+def build_fuzzy_search(query_string):
+    words = query_string.split()
+    search_terms = []
+    for word in words:
+        if len(word) >= 2:
+            search_terms.append(f"title:*{word}*")
+            search_terms.append(f"sku:*{word}*")
+    search_terms.append(f"title:*{query_string}*")
+    search_terms.append(f"sku:*{query_string}*")
+    return " OR ".join(search_terms)
+
+
+# Exact and fuzzy attempts go out as one aliased document, so a miss no longer costs a second round trip
+SEARCH_PRODUCTS_QUERY = """
+query searchProducts($exact: String!, $fuzzy: String!) {
+  exact: products(first: 10, query: $exact) {
+    edges {
+      node {
+        id
+        title
+        handle
+      }
+    }
+  }
+  fuzzy: products(first: 20, query: $fuzzy) {
+    edges {
+      node {
+        id
+        title
+        handle
+      }
+    }
+  }
+}
+"""
+
+# Same search with full details inlined on the first few exact hits and on the top fuzzy hit
+# (kept small so the whole document stays well under the single query cost limit)
+SEARCH_PRODUCTS_WITH_DETAILS_QUERY = f"""
+query searchProductsWithDetails($exact: String!, $fuzzy: String!) {{
+  exact: products(first: 10, query: $exact) {{
+    edges {{
+      node {{
+        id
+        title
+        handle
       }}
     }}
-    """
-    response = requests.post(
-        f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-        headers=headers,
-        json={"query": query}
+  }}
+  exactTop: products(first: 1, query: $exact) {{
+    edges {{
+      node {{
+{PRODUCT_DETAIL_FIELDS}
+      }}
+    }}
+  }}
+  fuzzy: products(first: 20, query: $fuzzy) {{
+    edges {{
+      node {{
+        id
+        title
+        handle
+      }}
+    }}
+  }}
+  fuzzyTop: products(first: 1, query: $fuzzy) {{
+    edges {{
+      node {{
+{PRODUCT_DETAIL_FIELDS}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+# NEW: Hits are ranked best-first by trigram similarity; a clearly dominant top hit is used directly
+TOP_HIT_MIN_SCORE = 0.85
+TOP_HIT_MARGIN = 0.15
+
+
+def rank_search_hits(query_string, products):
+    """Sort product edges best-first, adding a "score" to each edge"""
+    index = get_fuzzy_index()
+    ids = [product["node"]["id"] for product in products]
+    if index is not None:
+        scores = index.rank(query_string, ids)
+    else:
+        scores = TrigramIndex(
+            [{"id": product["node"]["id"], "title": product["node"].get("title"), "tags": product["node"].get("tags")}
+             for product in products]
+        ).rank(query_string, ids)
+    ranked = [dict(product, score=scores.get(product["node"]["id"], 0.0)) for product in products]
+    ranked.sort(key=lambda product: -product["score"])
+    return ranked
+
+
+def search_catalog_mirror(store, query_string):
+    """Exact mirror hits ranked by score, else the trigram index's ranked fuzzy hits"""
+    products = [{"node": node} for node in store.search_products(query_string)]
+    if products:
+        return rank_search_hits(query_string, products)
+    return [{"node": record["node"], "score": score} for record, score in get_fuzzy_index().search(query_string)]
+
+
+def confident_top_hit(products):
+    """Just the top hit when it clearly outscores the rest, otherwise all hits"""
+    if (len(products) > 1 and products[0].get("score", 0) >= TOP_HIT_MIN_SCORE and
+            products[0]["score"] - products[1].get("score", 0) >= TOP_HIT_MARGIN):
+        return products[:1]
+    return products
+
+
+# Search Shopify products with fuzzy matching
+def search_products(query_string):
+    # NEW: Serve from the local catalog mirror once it has been synced
+    store = get_catalog_store()
+    if store.is_populated():
+        return {"data": {"products": {"edges": search_catalog_mirror(store, query_string)}}}
+
+    # NEW: Reuse hits cached by an earlier identical search
+    cache = get_response_cache()
+    cache_key = normalize_cache_key(query_string)
+    products = cache.get("search", cache_key)
+    if products is not None:
+        return {"data": {"products": {"edges": products}}}
+
+    result = get_shopify_client().graphql(SEARCH_PRODUCTS_QUERY, {
+        "exact": build_exact_search(query_string),
+        "fuzzy": build_fuzzy_search(query_string)
+    })
+    data = result.get("data") or {}
+    products = rank_search_hits(
+        query_string, data.get("exact", {}).get("edges", []) or data.get("fuzzy", {}).get("edges", [])
     )
-    result = response.json()
-    products = result.get("data", {}).get("products", {}).get("edges", [])
-    
-    if not products:
-        words = query_string.split()
-        search_terms = []
-        for word in words:
-            if len(word) >= 2:
-                search_terms.append(f"title:*{word}*")
-                search_terms.append(f"sku:*{word}*")
-        search_terms.append(f"title:*{query_string}*")
-        search_terms.append(f"sku:*{query_string}*")
-        
-        fuzzy_query = f"""
-        {{
-          products(first: 20, query: "{' OR '.join(search_terms)}") {{
-            edges {{
-              node {{
-                id
-                title
-                handle
-              }}
-            }}
-          }}
-        }}
-        """
-        
-        response = requests.post(
-            f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-            headers=headers,
-            json={"query": fuzzy_query}
-        )
-        result = response.json()
+    if data and not result.get("errors"):
+        cache.set("search", cache_key, products)
     
-    return result
+    return {"data": {"products": {"edges": products}}}
+
+
+# NEW: Search and fetch details in a single round trip for the single-product path
+def search_products_with_details(query_string):
+    """Return (product edges, {gid: product_info}).
+
+    The edges are narrowed by confident_top_hit, and details are only loaded when that leaves a
+    single product - clarification candidates are fetched once the user has picked one.
+    """
+    store = get_catalog_store()
+    if store.is_populated():
+        products = confident_top_hit(search_catalog_mirror(store, query_string))
+        return products, top_hit_details(products)
+
+    # NEW: A cached hit list (plus cached details) answers without a search call
+    cache = get_response_cache()
+    cache_key = normalize_cache_key(query_string)
+    products = cache.get("search", cache_key)
+    if products is not None:
+        products = confident_top_hit(products)
+        return products, top_hit_details(products)
+
+    result = get_shopify_client().graphql(SEARCH_PRODUCTS_WITH_DETAILS_QUERY, {
+        "exact": build_exact_search(query_string),
+        "fuzzy": build_fuzzy_search(query_string)
+    })
+    data = result.get("data") or {}
+    exact = data.get("exact", {}).get("edges", [])
+
+    if exact:
+        products = rank_search_hits(query_string, exact)
+        detailed = data.get("exactTop", {}).get("edges", [])
+    else:
+        products = rank_search_hits(query_string, data.get("fuzzy", {}).get("edges", []))
+        detailed = data.get("fuzzyTop", {}).get("edges", [])
+
+    inlined = {edge["node"]["id"]: edge["node"] for edge in detailed}
+
+    if data and not result.get("errors"):
+        cache.set("search", cache_key, products)
+        inlined = {gid: cache_product_details(product_info) for gid, product_info in inlined.items()}
+    products = confident_top_hit(products)
+    return products, top_hit_details(products, inlined)
+
+
+def top_hit_details(products, inlined=None):
+    """{gid: product_info} for a search that resolved to one product, from the inlined top hit when it is that one"""
+    if len(products) != 1:
+        return {}
+    gid = products[0]["node"]["id"]
+    if inlined and gid in inlined:
+        return {gid: inlined[gid]}
+    return fetch_products_details_batch([gid])
+
+
+# NEW: Product details are cached as compact Product records, built once per fetch
+def cache_product_details(product_info):
+    """Cache a fetched product as a Product record and return it in the trimmed GraphQL shape served on cache hits"""
+    record = Product.from_node(product_info)
+    get_response_cache().set("product_details", record.id, record)
+    return record.to_node()
 
 
 # UPDATED: Fetch product details by GID with inventory item information
 def fetch_product_details_by_gid(gid):
+    # NEW: Serve recently fetched details from the shared cache
+    cache = get_response_cache()
+    record = cache.get("product_details", gid)
+    if record is not None:
+        return {"data": {"product": record.to_node()}}
+
     query = f"""
     {{
       product(id: "{gid}") {{
-        title
-        handle
-        createdAt
-        status
-        vendor
-        productType
-        tags
-        onlineStoreUrl
-        metafields(first: 20) {{
-          edges {{
-            node {{
-              namespace
-              key
-              value
-            }}
-          }}
-        }}
-        variants(first: 10) {{
-          edges {{
-            node {{
-              id
-              sku
-              title
-              price
-              inventoryQuantity
-              inventoryItem {{
-                id
-                unitCost {{
-                  amount
-                  currencyCode
-                }}
-                tracked
-                measurement {{
-                  weight {{
-                    value
-                    unit
-                  }}
-                }}
-              }}
-            }}
-          }}
-        }}
-        images(first: 1) {{
-          edges {{
-            node {{
-              url
-              altText
-            }}
-          }}
-        }}
+{PRODUCT_DETAIL_FIELDS}
       }}
     }}
     """
     
-    response = requests.post(
-        f"https://{SHOPIFY_STORE_URL}/admin/api/2023-07/graphql.json",
-        headers=headers,
-        json={"query": query}
-    )
+    # The response may be shared with concurrent identical lookups, so it is read but never modified
+    result = get_shopify_client().graphql(query)
+    product_info = (result.get("data") or {}).get("product")
+    if product_info:
+        return {**result, "data": {**result["data"], "product": cache_product_details(product_info)}}
+    return result
 
-    return response.json()
 
-# UPDATED: Generate GPT response with inventory item data and new fields
-def generate_ai_response(user_query, product_data, requested_info=None):
-    info_str = ", ".join(requested_info) if requested_info else "all relevant fields"
-    
-    # Extract variant data
-    variant = product_data.get("variant", {})
-    
-    # Extract weight information
-    weight_display = extract_weight_from_variant(variant)
-    
-    # Extract wheels information from product data
-    wheels_info = "information unavailable"
-    if "full_product_info" in product_data:
-        wheels_info = detect_wheels_in_product(product_data["full_product_info"])
-    else:
-        title_text = f"{product_data.get('title', '')} {variant.get('title', '')}".lower()
-        wheel_keywords = ['wheel', 'wheels', 'wheeled', 'rolling', 'portable', 'mobility', 'mobile']
-        if any(keyword in title_text for keyword in wheel_keywords):
-            wheels_info = "Yes"
-        elif title_text.strip():
-            wheels_info = "No clear indication"
-    
-    # Extract part number (SKU)
-    part_number = variant.get('sku', 'information unavailable')
-    
-    # Check if user is asking specifically for margin
-    user_lower = user_query.lower()
-    
-    # NEW: Check if asking about margin specifically
-    is_margin_request = any(word in user_lower for word in ['margin', 'profit margin']) and requested_info and 'margin' in requested_info
-    
-    # Check if user is asking specifically for margin formula
-    margin_formula_patterns = [
-        r'margin.*formula',
-        r'how.*calculate.*margin',
-        r'margin.*calculation',
-        r'formula.*margin',
-        r'calculate.*margin'
+# NEW: Fetch details for several products in one nodes(ids:) round trip
+PRODUCTS_DETAILS_BATCH_QUERY = f"""
+query productDetailsBatch($ids: [ID!]!) {{
+  nodes(ids: $ids) {{
+    ... on Product {{
+{PRODUCT_DETAIL_FIELDS}
+    }}
+  }}
+}}
+"""
+
+# How many products fit in one batch without going over Shopify's single query cost limit
+PRODUCT_DETAILS_COST = estimate_query_cost(f"{{ product(id: \"\") {{ {PRODUCT_DETAIL_FIELDS} }} }}")
+PRODUCT_DETAILS_BATCH_SIZE = max(1, int(SINGLE_QUERY_COST_LIMIT // PRODUCT_DETAILS_COST))
+
+
+def fetch_products_details_batch(gids):
+    """Fetch product details for many gids, returning {gid: product_info} (same fields as fetch_product_details_by_gid)"""
+    cache = get_response_cache()
+    details = {}
+    missing = []
+    for gid in dict.fromkeys(gids):
+        record = cache.get("product_details", gid)
+        if record is not None:
+            details[gid] = record.to_node()
+        else:
+            missing.append(gid)
+
+    # Only products that are not cached go out to Shopify
+    for start in range(0, len(missing), PRODUCT_DETAILS_BATCH_SIZE):
+        batch = missing[start:start + PRODUCT_DETAILS_BATCH_SIZE]
+        result = get_shopify_client().graphql(PRODUCTS_DETAILS_BATCH_QUERY, {"ids": batch})
+        for node in (result.get("data") or {}).get("nodes") or []:
+            if node:
+                details[node["id"]] = cache_product_details(node)
+
+    return details
+
+
+# NEW: Clarification state keeps compact Product records instead of raw GraphQL payloads
+def remember_clarification_candidates(products, details=None):
+    """Store the candidates of a clarification question as id/title edges plus any compact records already fetched"""
+    st.session_state.clarification_data = [
+        {"node": {"id": p["node"]["id"], "title": p["node"]["title"]}} for p in products
     ]
-    
-    is_margin_formula_request = any(re.search(pattern, user_lower) for pattern in margin_formula_patterns)
+    st.session_state.clarification_details = {
+        gid: product_record(product_info) for gid, product_info in (details or {}).items() if product_info
+    }
 
-    prompt = f"""
-User asked: "{user_query}"
 
-Product Data:
-{product_data}
+def get_clarification_product_details(gid):
+    """Rebuild the details captured with the clarification question, fetching only if they are missing"""
+    record = (st.session_state.clarification_details or {}).get(gid)
+    if record is not None:
+        return record.to_node()
+    return fetch_products_details_batch([gid]).get(gid)
 
-Additional Information:
-- Weight: {weight_display}
-- Has Wheels: {wheels_info}
-- Part Number/SKU: {part_number}
 
-SPECIAL INSTRUCTIONS:
-{"1. MARGIN CALCULATION: The user is asking about margin. Provide the margin value AND show the calculation. Extract the actual price and cost values from the product data and show: 'Margin: X% (calculated as: (($Y - $Z) / $Y) × 100 = X%)' where Y is the price and Z is the cost. The formula should be explicitly included as part of the response if it's a margin request. For example, if the price is $Y and the cost is $Z, the margin should be calculated as follows: 'Margin: X% (calculated as: (($Y - $Z) / $Y) × 100 = X%)'." if is_margin_request else ""}
+def product_record(product_info):
+    """The Product record cached when these details were fetched, or a fresh one once it has expired"""
+    record = get_response_cache().get("product_details", product_info.get("id"))
+    return record or Product.from_node(product_info)
+
+
+def variant_answer_data(product_info, variant):
+    """Enhanced product data for one variant: its Product and Variant records plus cost, profit, margin and markup"""
+    record = (st.session_state.clarification_details or {}).get(product_info.get("id")) or product_record(product_info)
+    variant_record = record.variant(variant.get("id")) or Variant.from_node(variant)
+    return {
+        "title": product_info.get("title"),
+        "product": record,  # NEW: id, tags, status, type and dimension metafields for follow-ups
+        "variant": variant_record,
+        **variant_record.answer_fields(),
+        "image_url": record.image_url or "N/A"
+    }
 
+# NEW: Static answer rules are sent as an unchanging system prefix; only the per-query part varies
+ANSWER_INSTRUCTIONS = """
 RESPONSE FORMAT REQUIREMENTS:
 1. For numerical values: Provide exact figures with relevant units:
    - Price/Cost: Include currency symbol (e.g., $25.99)
@@ -1418,25 +1669,270 @@ Field definitions:
 - 'part_number' = SKU/part number/model number
 - 'image_url' = main product image URL
 
-Respond using only: {info_str}. 
-
 For missing fields, state "information unavailable" clearly.
 If 'image_url' is requested, return the direct image URL only once without markdown or formatting.
 If margin formula is requested, include the calculation formula.
 Use factual, precise language with exact values and appropriate units.
+"""
+
+COMPARISON_INSTRUCTIONS = """
+RESPONSE FORMAT REQUIREMENTS:
+1. For numerical values: Provide exact figures with relevant units (e.g., price in dollars, cost in dollars, dimensions in cm)
+2. For categorical data: Reference exact terms or values from the dataset
+3. Missing Data: If a value is absent, clearly state "unavailable" or "information unavailable"
+4. Error Handling: If data is missing, indicate this clearly without making assumptions
+5. Stick to what is explicitly provided in the data
+
+Field definitions:
+- 'price' = customer-facing selling price from variant (include $ symbol)
+- 'cost' = internal cost from inventory item (include $ symbol)
+- 'profit' = calculated profit (price - cost) (include $ symbol)
+- 'margin' = calculated margin percentage ((profit/price) * 100) (include % symbol)
+- 'inventory' = stock quantity (include "units" if applicable)
+
+For each field:
+- Provide exact values with appropriate units
+- If data is missing, state "unavailable" 
+- Do not make assumptions about missing data
+- Use clear, factual language
+
+Format: Use normal text without special characters, markdown, asterisks, underscores, or formatting symbols.
+"""
+
+
+def product_dimensions_text(product_data):
+    """Dimension metafields of the product record"""
+    product = product_data.get("product")
+    values = [f"{key}: {value}" for key, value in (product.dimensions if product else ())]
+    if values:
+        return "; ".join(values)
+    return None
+
+
+def variant_field(data, attribute):
+    variant = data.get("variant")
+    return getattr(variant, attribute) if variant else None
+
+
+def product_field(data, attribute):
+    product = data.get("product")
+    return getattr(product, attribute) if product else None
+
+
+# Field name -> value getter over enhanced product data (Product and Variant records)
+PROMPT_FIELD_GETTERS = {
+    "price": lambda data: amount_text(variant_field(data, "price")),
+    "cost": lambda data: data.get("cost"),
+    "profit": lambda data: data.get("profit"),
+    "margin": lambda data: data.get("margin"),
+    "markup": lambda data: data.get("markup"),
+    "inventory": lambda data: variant_field(data, "inventory"),
+    "dimensions": product_dimensions_text,
+    "weight": lambda data: extract_weight_from_variant(data.get("variant")),
+    "part_number": lambda data: variant_field(data, "sku"),
+    "image_url": lambda data: data.get("image_url"),
+    "status": lambda data: product_field(data, "status"),
+    "product_type": lambda data: product_field(data, "product_type"),
+    "tags": lambda data: ", ".join(product_field(data, "tags") or ()) or None,
+}
+
+
+def project_product_fields(product_data, requested_info=None):
+    """Compact "key: value" block of only the requested fields (all known fields when unspecified)"""
+    fields = [field for field in (requested_info or []) if field in PROMPT_FIELD_GETTERS]
+    if not fields:
+        fields = list(PROMPT_FIELD_GETTERS)
+
+    variant_title = variant_field(product_data, "title")
+    lines = [f"title: {product_data.get('title') or 'information unavailable'}"]
+    if variant_title and variant_title != "Default Title":
+        lines.append(f"variant: {variant_title}")
+    for field in fields:
+        value = PROMPT_FIELD_GETTERS[field](product_data)
+        if value in (None, "", "N/A"):
+            value = "information unavailable"
+        lines.append(f"{field}: {value}")
+    return "\n".join(lines)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+# NEW: Prompt size per call site, kept process-wide
+@st.cache_resource
+def get_prompt_token_stats():
+    return {}
+
+
+def log_prompt_size(label, messages):
+    """Count prompt tokens for one chat completion sent to OpenAI and log them"""
+    tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+    stats = get_prompt_token_stats().setdefault(label, {"calls": 0, "prompt_tokens": 0})
+    stats["calls"] += 1
+    stats["prompt_tokens"] += tokens
+    logger.debug("LLM prompt [%s]: ~%d tokens", label, tokens)
+    return tokens
+
+
+def stream_completion_text(response):
+    """Yield the text deltas of a streamed chat completion, without leading whitespace"""
+    started = False
+    for chunk in response:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        text = chunk.choices[0].delta.content
+        if not started:
+            text = text.lstrip()
+            started = bool(text)
+        if text:
+            yield text
+
+
+# NEW: Plain field lookups are answered from the product data without a model round trip
+TEMPLATE_FIELDS = {"price", "cost", "profit", "margin", "markup", "inventory", "weight", "part_number", "image_url"}
+
+MARGIN_FORMULA_LINE = "Profit margin is calculated using: Margin % = ((Selling Price - Cost) / Selling Price) × 100"
+
+MARGIN_FORMULA_PATTERNS = [
+    r'margin.*formula',
+    r'how.*calculate.*margin',
+    r'margin.*calculation',
+    r'formula.*margin',
+    r'calculate.*margin'
+]
+
+
+def format_money(value):
+    """$-prefixed amount with two decimals, or "information unavailable" """
+    try:
+        if value in (None, "", "N/A"):
+            return "information unavailable"
+        return f"${float(value):,.2f}"
+    except (ValueError, TypeError):
+        return "information unavailable"
+
+
+def render_field_answer(user_query, product_data, requested_info):
+    """Render a deterministic answer for plain field lookups.
+
+    Returns None when a requested field is not templated, or when the question is free-form
+    rather than one of the lookup shapes recognised by route_intent.
+    """
+    if not requested_info or not set(requested_info) <= TEMPLATE_FIELDS:
+        return None
+    routed = route_intent(user_query)
+    if not routed or routed["intent"] not in ("product", "current_product"):
+        return None
+
+    variant = product_data.get("variant")
+    price = variant_field(product_data, "price")
+    cost = product_data.get("cost", "N/A")
+    margin = product_data.get("margin", "N/A")
+
+    lines = [product_data.get("title") or "information unavailable"]
+    for field in requested_info:
+        if field == "price":
+            lines.append(f"Price: {format_money(price)}")
+        elif field == "cost":
+            lines.append(f"Cost: {format_money(cost)}")
+        elif field == "profit":
+            lines.append(f"Profit: {format_money(product_data.get('profit'))}")
+        elif field == "margin":
+            if margin in (None, "", "N/A"):
+                lines.append("Margin: information unavailable")
+            else:
+                lines.append(
+                    f"Margin: {margin} (calculated as: (({format_money(price)} - {format_money(cost)}) / "
+                    f"{format_money(price)}) × 100 = {margin})"
+                )
+        elif field == "markup":
+            markup = product_data.get("markup", "N/A")
+            lines.append(f"Markup: {markup if markup not in (None, '', 'N/A') else 'information unavailable'}")
+        elif field == "inventory":
+            quantity = variant_field(product_data, "inventory")
+            lines.append(f"Inventory: {quantity} units" if quantity is not None else "Inventory: information unavailable")
+        elif field == "weight":
+            lines.append(f"Weight: {extract_weight_from_variant(variant)}")
+        elif field == "part_number":
+            lines.append(f"Part Number/SKU: {variant_field(product_data, 'sku') or 'information unavailable'}")
+        elif field == "image_url":
+            image_url = product_data.get("image_url")
+            lines.append(image_url if image_url not in (None, "", "N/A") else "Image URL: information unavailable")
+
+    if any(re.search(pattern, user_query.lower()) for pattern in MARGIN_FORMULA_PATTERNS):
+        lines.append(MARGIN_FORMULA_LINE)
+    return "\n".join(lines)
+
+
+# UPDATED: Generate GPT response with inventory item data and new fields
+def generate_ai_response(user_query, product_data, requested_info=None, stream=False):
+    # NEW: Skip the model entirely when the answer is just a few known fields
+    templated = render_field_answer(user_query, product_data, requested_info)
+    if templated is not None:
+        return templated
+
+    info_str = ", ".join(requested_info) if requested_info else "all relevant fields"
+    
+    # Extract weight information
+    weight_display = extract_weight_from_variant(product_data.get("variant"))
+    
+    # Extract wheels information from product data
+    wheels_info = "information unavailable"
+    if product_data.get("product"):
+        wheels_info = detect_wheels_in_product(product_data["product"])
+    else:
+        title_text = f"{product_data.get('title') or ''} {variant_field(product_data, 'title') or ''}".lower()
+        wheel_keywords = ['wheel', 'wheels', 'wheeled', 'rolling', 'portable', 'mobility', 'mobile']
+        if any(keyword in title_text for keyword in wheel_keywords):
+            wheels_info = "Yes"
+        elif title_text.strip():
+            wheels_info = "No clear indication"
+    
+    # Extract part number (SKU)
+    part_number = variant_field(product_data, 'sku') or 'information unavailable'
+    
+    # Check if user is asking specifically for margin
+    user_lower = user_query.lower()
+    
+    # NEW: Check if asking about margin specifically
+    is_margin_request = any(word in user_lower for word in ['margin', 'profit margin']) and requested_info and 'margin' in requested_info
+    
+    # Check if user is asking specifically for margin formula
+    is_margin_formula_request = any(re.search(pattern, user_lower) for pattern in MARGIN_FORMULA_PATTERNS)
+
+    prompt = f"""
+User asked: "{user_query}"
+
+Product Data:
+{project_product_fields(product_data, requested_info)}
+
+Additional Information:
+- Weight: {weight_display}
+- Has Wheels: {wheels_info}
+- Part Number/SKU: {part_number}
+
+SPECIAL INSTRUCTIONS:
+{"1. MARGIN CALCULATION: The user is asking about margin. Provide the margin value AND show the calculation. Extract the actual price and cost values from the product data and show: 'Margin: X% (calculated as: (($Y - $Z) / $Y) × 100 = X%)' where Y is the price and Z is the cost. The formula should be explicitly included as part of the response if it's a margin request. For example, if the price is $Y and the cost is $Z, the margin should be calculated as follows: 'Margin: X% (calculated as: (($Y - $Z) / $Y) × 100 = X%)'." if is_margin_request else ""}
+
+Respond using only: {info_str}.
 """
     
-    response = openai_client.chat.completions.create(
+    response = create_chat_completion(
         model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
+        messages=[{"role": "system", "content": ANSWER_INSTRUCTIONS}, {"role": "user", "content": prompt}],
         temperature=0.1,  
-        max_tokens=600  
+        max_tokens=600,
+        stream=stream
     )
+    if stream:
+        return stream_completion_text(response)
     return response.choices[0].message.content.strip()
 
 
 # UPDATED: Generate comparison response with inventory item data
-def generate_comparison_response(user_query, product1_data, product2_data, requested_info=None):
+def generate_comparison_response(user_query, product1_data, product2_data, requested_info=None, stream=False):
     info_str = ", ".join(requested_info) if requested_info else "all relevant fields"
     
     # Check if user is asking for specific field comparison
@@ -1479,7 +1975,7 @@ def generate_comparison_response(user_query, product1_data, product2_data, reque
         # Get the actual values for comparison
         def get_field_value(product_data, field):
             if field == 'price':
-                return product_data.get('variant', {}).get('price', 'N/A')
+                return amount_text(variant_field(product_data, 'price'))
             elif field == 'cost':
                 return product_data.get('cost', 'N/A')
             elif field == 'profit':
@@ -1489,9 +1985,10 @@ def generate_comparison_response(user_query, product1_data, product2_data, reque
             elif field == 'markup':
                 return product_data.get('markup', 'N/A')
             elif field == 'inventory':
-                return product_data.get('variant', {}).get('inventoryQuantity', 'N/A')
+                inventory = variant_field(product_data, 'inventory')
+                return inventory if inventory is not None else 'N/A'
             elif field == 'dimensions': 
-                return product_data.get('dimensions', 'N/A')
+                return product_dimensions_text(product_data) or 'N/A'
             else:
                 return 'N/A'
         
@@ -1532,52 +2029,134 @@ def generate_comparison_response(user_query, product1_data, product2_data, reque
         DO NOT mention any other fields. Use only normal text without markdown formatting.
         """
     else:
-        # Original prompt for general comparisons with strict format requirements
+        # Original prompt for general comparisons; the static rules go in COMPARISON_INSTRUCTIONS
         prompt = f"""
-        User asked: "{user_query}"
-        
-        Product 1 Data:
-        {product1_data}
-        
-        Product 2 Data:
-        {product2_data}
-        
-        RESPONSE FORMAT REQUIREMENTS:
-        1. For numerical values: Provide exact figures with relevant units (e.g., price in dollars, cost in dollars, dimensions in cm)
-        2. For categorical data: Reference exact terms or values from the dataset
-        3. Missing Data: If a value is absent, clearly state "unavailable" or "information unavailable"
-        4. Error Handling: If data is missing, indicate this clearly without making assumptions
-        5. Stick to what is explicitly provided in the data
-        
-        Field definitions:
-        - 'price' = customer-facing selling price from variant (include $ symbol)
-        - 'cost' = internal cost from inventory item (include $ symbol)
-        - 'profit' = calculated profit (price - cost) (include $ symbol)
-        - 'margin' = calculated margin percentage ((profit/price) * 100) (include % symbol)
-        - 'inventory' = stock quantity (include "units" if applicable)
-        
-        Compare these two products focusing on: {info_str}. 
-        
-        For each field:
-        - Provide exact values with appropriate units
-        - If data is missing, state "unavailable" 
-        - Do not make assumptions about missing data
-        - Use clear, factual language
-        
-        Format: Use normal text without special characters, markdown, asterisks, underscores, or formatting symbols.
-        """
+User asked: "{user_query}"
+
+Product 1 Data:
+{project_product_fields(product1_data, requested_info)}
+
+Product 2 Data:
+{project_product_fields(product2_data, requested_info)}
+
+Compare these two products focusing on: {info_str}.
+"""
     
-    response = openai_client.chat.completions.create(
+    messages = [{"role": "user", "content": prompt}]
+    if not specific_field_requested:
+        messages.insert(0, {"role": "system", "content": COMPARISON_INSTRUCTIONS})
+    
+    response = create_chat_completion(
         model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         temperature=0.1,  # Lower temperature for more consistent formatting
-        max_tokens=500
+        max_tokens=500,
+        stream=stream
     )
     
+    if stream:
+        return stream_completion_text(response)
     return response.choices[0].message.content.strip()
 
 
 
+# NEW: List answers fetch one page at a time; "show more" resumes from the cursor kept in session state
+SHOW_MORE_PATTERN = r'^(show|list|load|see|give)?\s*(me\s+)?(the\s+)?(more|next)(\s+\d+)?(\s+products)?$'
+
+
+def matches_category(node, category_value):
+    """Client-side category check against productType and tags"""
+    category_lower = category_value.lower()
+    product_type = (node.get("productType") or "").lower()
+    tags = [tag.lower() for tag in node.get("tags", [])]
+    return (category_lower in product_type or
+            category_lower in tags or
+            any(category_lower in tag for tag in tags))
+
+
+def format_listing_line(node, kind):
+    if kind == "date":
+        created_date = (node.get("createdAt") or "N/A")[:10]  # Get just the date part
+        product_type = node.get("productType", "N/A")
+        return f"• {node['title']} (Created: {created_date}, Type: {product_type})"
+    product_type = node.get("productType", "unavailable")
+    status = node.get("status", "unavailable")
+    return f"• {node['title']} (Status: {status}, Type: {product_type})"
+
+
+def fetch_listing_page(listing):
+    """Fetch the next page of a listing, advancing its cursor (or mirror offset) in place"""
+    if listing["source"] == "mirror":
+        if listing["kind"] == "date":
+            results = search_products_by_date(listing["date_condition"], listing["date_value"])
+        else:
+            results = search_products_by_criteria(status=listing["status"], category=listing["category"])
+        nodes = [edge["node"] for edge in results.get("data", {}).get("products", {}).get("edges", [])]
+        if listing.get("category"):
+            nodes = [node for node in nodes if matches_category(node, listing["category"])]
+
+        start = listing["offset"]
+        page = nodes[start:start + LIST_PAGE_SIZE]
+        listing["offset"] = start + len(page)
+        listing["has_more"] = listing["offset"] < len(nodes)
+        listing["total"] = len(nodes)
+        return page
+
+    nodes = []
+    listing["has_more"] = False
+    # Keep pulling pages lazily only while client-side filtering leaves a page empty
+    for nodes, page_info in iter_product_pages(listing["search_query"], after=listing["cursor"]):
+        listing["cursor"] = page_info.get("endCursor")
+        listing["has_more"] = bool(page_info.get("hasNextPage"))
+        if listing.get("category"):
+            nodes = [node for node in nodes if matches_category(node, listing["category"])]
+        if nodes:
+            break
+    listing["offset"] += len(nodes)
+    return nodes
+
+
+def start_product_listing(listing):
+    """Render the first page of a listing and remember it for "show more" """
+    nodes = fetch_listing_page(listing)
+    if not nodes:
+        st.session_state.product_listing = None
+        return None
+
+    product_list = [format_listing_line(node, listing["kind"]) for node in nodes]
+    description = listing["description"]
+
+    if not listing["has_more"]:
+        st.session_state.product_listing = None
+        return f"Products {description}:\n" + "\n".join(product_list)
+
+    st.session_state.product_listing = listing
+    if listing.get("total"):
+        header = f"Showing first {len(nodes)} of {listing['total']} products {description}:"
+    else:
+        header = f"Showing first {len(nodes)} products {description}:"
+    return header + "\n" + "\n".join(product_list) + "\n\nSay 'show more' to see the next page."
+
+
+def continue_product_listing():
+    """Render the next page of the listing kept in session state"""
+    listing = st.session_state.product_listing
+    start = listing["offset"]
+    nodes = fetch_listing_page(listing)
+    if not nodes:
+        st.session_state.product_listing = None
+        return "There are no more products to show."
+
+    product_list = [format_listing_line(node, listing["kind"]) for node in nodes]
+    total_text = f" of {listing['total']}" if listing.get("total") else ""
+    header = f"Showing products {start + 1}-{start + len(nodes)}{total_text} {listing['description']}:"
+    if listing["has_more"]:
+        return header + "\n" + "\n".join(product_list) + "\n\nSay 'show more' to see the next page."
+
+    st.session_state.product_listing = None
+    return header + "\n" + "\n".join(product_list)
+
+
 # ENHANCED: Process status and category queries
 def process_status_and_category_query(intent, user_input):
     """Process queries about product status and/or category with strict response format"""
@@ -1586,94 +2165,38 @@ def process_status_and_category_query(intent, user_input):
     category_value = intent.get("category_value")
     query_type = intent.get("query_type", "list")
     
-    # print(f"Processing query with status: {status_value}, category: {category_value}")  # Debug print
-    
-    # Search products based on criteria
-    results = search_products_by_criteria(status=status_value, category=category_value)
-    products = results.get("data", {}).get("products", {}).get("edges", [])
+    criteria_text = []
+    if status_value:
+        criteria_text.append(f"status '{status_value}'")
+    if category_value:
+        criteria_text.append(f"category '{category_value}'")
     
-    # Additional client-side filtering for better category matching
-    if category_value and products:
-        filtered_products = []
-        for product in products:
-            node = product["node"]
-            product_type = node.get("productType", "").lower()
-            tags = [tag.lower() for tag in node.get("tags", [])]
-            
-            # Check if category matches productType or any tag
-            if (category_value.lower() in product_type or 
-                category_value.lower() in tags or
-                any(category_value.lower() in tag for tag in tags)):
-                filtered_products.append(product)
-        
-        products = filtered_products
-    
-    # Handle missing data according to strict format requirements
-    if not products:
-        criteria_text = []
-        if status_value:
-            criteria_text.append(f"status '{status_value}'")
-        if category_value:
-            criteria_text.append(f"category '{category_value}'")
-        
-        criteria_display = " and ".join(criteria_text) if criteria_text else "specified criteria"
-        return f"No products found with {criteria_display}. Please verify the criteria or try different search terms."
+    criteria_display = " and ".join(criteria_text) if criteria_text else "specified criteria"
+    no_products = f"No products found with {criteria_display}. Please verify the criteria or try different search terms."
     
     # Format response based on query type with exact values
     if query_type == "count":
-        criteria_text = []
-        if status_value:
-            criteria_text.append(f"status '{status_value}'")
-        if category_value:
-            criteria_text.append(f"category '{category_value}'")
-        
-        criteria_display = " and ".join(criteria_text) if criteria_text else "specified criteria"
-        return f"Found {len(products)} products with {criteria_display}."
-    
-    elif query_type == "list":
-        criteria_text = []
-        if status_value:
-            criteria_text.append(f"status '{status_value}'")
-        if category_value:
-            criteria_text.append(f"category '{category_value}'")
-        
-        criteria_display = " and ".join(criteria_text) if criteria_text else "specified criteria"
-        
-        if len(products) <= 15:
-            product_list = []
-            for product in products:
-                node = product["node"]
-                product_type = node.get("productType", "unavailable")
-                status = node.get("status", "unavailable")
-                product_list.append(f"• {node['title']} (Status: {status}, Type: {product_type})")
-            return f"Products with {criteria_display}:\n" + "\n".join(product_list)
-        else:
-            # Show first 15 and mention total count
-            product_list = []
-            for product in products[:15]:
-                node = product["node"]
-                product_type = node.get("productType", "unavailable")
-                status = node.get("status", "unavailable")
-                product_list.append(f"• {node['title']} (Status: {status}, Type: {product_type})")
-            return f"Showing first 15 of {len(products)} products with {criteria_display}:\n" + "\n".join(product_list)
-    
-    else:  # Default to list format
-        product_list = []
-        for product in products:
-            node = product["node"]
-            product_type = node.get("productType", "unavailable")
-            status = node.get("status", "unavailable")
-            product_list.append(f"• {node['title']} (Status: {status}, Type: {product_type})")
-        
-        criteria_text = []
-        if status_value:
-            criteria_text.append(f"status '{status_value}'")
-        if category_value:
-            criteria_text.append(f"category '{category_value}'")
-        
-        criteria_display = " and ".join(criteria_text) if criteria_text else "specified criteria"
-        
-        return f"Products with {criteria_display}:\n" + "\n".join(product_list)
+        # NEW: COUNT(*) on the mirror, else the cached live count - no rows are loaded
+        total, capped = count_catalog_products(status=status_value, category=category_value)
+        if not total:
+            return no_products
+        return f"Found {format_product_count(total, capped)} products with {criteria_display}."
+    
+    store_populated = get_catalog_store().is_populated()
+    
+    # List (default): only the rows that are displayed are fetched
+    listing = {
+        "kind": "status_category",
+        "source": "mirror" if store_populated else "shopify",
+        "status": status_value,
+        "category": category_value,
+        "search_query": build_criteria_search(status_value, category_value),
+        "description": f"with {criteria_display}",
+        "cursor": None,
+        "offset": 0
+    }
+    answer = start_product_listing(listing)
+    return answer if answer else no_products
 
 
 def process_date_query(intent, user_input):
@@ -1683,120 +2206,126 @@ def process_date_query(intent, user_input):
     date_value = intent.get("date_value")
     query_type = intent.get("query_type", "list")
     
-    # print(f"Processing date query with condition: {date_condition}, date: {date_value}")  # Debug print
-    
-    # Search products based on date criteria
-    results = search_products_by_date(date_condition, date_value)
-    products = results.get("data", {}).get("products", {}).get("edges", [])
-    
-    if not products:
-        return f"No products found created {date_condition} {date_value}."
+    date_filter = build_date_search(date_condition, date_value)
+    no_products = f"No products found created {date_condition} {date_value}."
+    if not date_filter:
+        return no_products
     
     # Format response based on query type
     if query_type == "count":
-        return f"Found {len(products)} products created {date_condition} {date_value}."
-    
-    elif query_type == "list":
-        if len(products) <= 15:
-            product_list = []
-            for product in products:
-                node = product["node"]
-                created_date = node.get("createdAt", "N/A")[:10]  # Get just the date part
-                product_type = node.get("productType", "N/A")
-                product_list.append(f"• {node['title']} (Created: {created_date}, Type: {product_type})")
-            return f"Products created {date_condition} {date_value}:\n" + "\n".join(product_list)
-        else:
-            # Show first 15 and mention total count
-            product_list = []
-            for product in products[:15]:
-                node = product["node"]
-                created_date = node.get("createdAt", "N/A")[:10]  # Get just the date part
-                product_type = node.get("productType", "N/A")
-                product_list.append(f"• {node['title']} (Created: {created_date}, Type: {product_type})")
-            return f"Showing first 15 of {len(products)} products created {date_condition} {date_value}:\n" + "\n".join(product_list)
-    
-    else:  # Default to list format
-        product_list = []
-        for product in products:
-            node = product["node"]
-            created_date = node.get("createdAt", "N/A")[:10]  # Get just the date part
-            product_type = node.get("productType", "N/A")
-            product_list.append(f"• {node['title']} (Created: {created_date}, Type: {product_type})")
-        
-        return f"Products created {date_condition} {date_value}:\n" + "\n".join(product_list)
+        # NEW: COUNT(*) on the mirror, else the cached live count - no rows are loaded
+        total, capped = count_catalog_products(date_condition=date_condition, date_value=date_value)
+        if not total:
+            return no_products
+        return f"Found {format_product_count(total, capped)} products created {date_condition} {date_value}."
+    
+    store_populated = get_catalog_store().is_populated()
+    
+    # List (default): only the rows that are displayed are fetched
+    listing = {
+        "kind": "date",
+        "source": "mirror" if store_populated else "shopify",
+        "date_condition": date_condition,
+        "date_value": date_value,
+        "search_query": date_filter,
+        "description": f"created {date_condition} {date_value}",
+        "cursor": None,
+        "offset": 0
+    }
+    answer = start_product_listing(listing)
+    return answer if answer else no_products
 
 
 # UPDATED: Process single product with memory storage
 def process_single_product(product_name_or_sku, requested_info, user_input):
-    results = search_products(product_name_or_sku)
-    products = results.get("data", {}).get("products", {}).get("edges", [])
+    # NEW: Exact SKUs / part numbers resolve straight to their variant - no search, no variant clarification
+    sku_hit = lookup_sku(product_name_or_sku)
+    if sku_hit:
+        product_gid, variant_gid = sku_hit
+        product_info = fetch_products_details_batch([product_gid]).get(product_gid)
+        variant = next(
+            (edge["node"] for edge in (product_info or {}).get("variants", {}).get("edges", [])
+             if edge["node"]["id"] == variant_gid),
+            None
+        )
+        if variant:
+            return answer_for_variant(product_info, variant, requested_info, user_input)
+
+    # NEW: One round trip returns the hits with their details inlined
+    products, details = search_products_with_details(product_name_or_sku)
 
     if not products:
         return "No product matched your query."
     elif len(products) > 1:
         # Multiple products found - ask for color/interior clarification
+        # The buttons only need titles; details are fetched for the product the user picks
         st.session_state.awaiting_clarification = True
         st.session_state.clarification_type = "color_interior_specs"
-        st.session_state.clarification_data = products
+        remember_clarification_candidates(products)
         st.session_state.original_query = user_input
         st.session_state.original_requested_info = requested_info
-        return "I found multiple products matching your search. Could you please specify the color and interior option you're looking for?"
+        return "I found multiple products matching your search. Could you please specify the color and interior option you're looking for, or pick one below?"
     else:
         # Single product found - check variants
         product = products[0]["node"]
         gid = product["id"]
-        details = fetch_product_details_by_gid(gid)
-        product_info = details["data"]["product"]
+        product_info = details.get(gid) or fetch_product_details_by_gid(gid)["data"]["product"]
+        return answer_for_product(product_info, requested_info, user_input)
 
-        variants = product_info.get("variants", {}).get("edges", [])
-        if len(variants) > 1:
-            # Multiple variants - ask for color/interior clarification at variant level
-            st.session_state.awaiting_clarification = True
-            st.session_state.clarification_type = "variant_color_interior"
-            st.session_state.clarification_data = variants
-            st.session_state.original_product = product_info
-            st.session_state.original_query = user_input
-            st.session_state.original_requested_info = requested_info
-            return "This product has multiple variants. Could you please specify the color and interior option you're looking for?"
-        else:
-            # Single variant - process directly
-            variant = variants[0]["node"] if variants else {}
-            
-            # Extract cost from inventory item
-            cost = "N/A"
-            if variant.get("inventoryItem") and variant["inventoryItem"].get("unitCost"):
-                cost = variant["inventoryItem"]["unitCost"]["amount"]
-            
-            # Calculate profit and margin
-            price = variant.get("price", "N/A")
-            profit_margin_data = calculate_profit_and_margin(cost, price)
-            markup_data = calculate_markup(cost, price)
-            
-            images = product_info.get("images", {}).get("edges", [])
-            image_url = images[0]["node"]["url"] if images else "N/A"
-
-            # Prepare enhanced product data
-            enhanced_product_data = {
-                "title": product_info.get("title"),
-                "variant": variant,
-                "cost": cost,
-                "profit": profit_margin_data["profit"],
-                "margin": profit_margin_data["margin"],
-                "markup": markup_data["markup"],
-                "image_url": image_url
-            }
 
-            # NEW: Store product in memory
-            store_product_in_memory(product_info.get("title"), enhanced_product_data)
+def answer_for_product(product_info, requested_info, user_input):
+    """Answer about a resolved product, or ask which variant when it has several"""
+    variants = product_info.get("variants", {}).get("edges", [])
+    if len(variants) > 1:
+        # Multiple variants - ask for color/interior clarification at variant level
+        gid = product_info["id"]
+        st.session_state.awaiting_clarification = True
+        st.session_state.clarification_type = "variant_color_interior"
+        st.session_state.clarification_details = {gid: product_record(product_info)}
+        st.session_state.original_product = get_clarification_product_details(gid)
+        st.session_state.clarification_data = st.session_state.original_product["variants"]["edges"]
+        st.session_state.original_query = user_input
+        st.session_state.original_requested_info = requested_info
+        return "This product has multiple variants. Could you please specify the color and interior option you're looking for, or pick one below?"
 
-            answer = generate_ai_response(user_input, enhanced_product_data, requested_info)
-            return answer
+    # Single variant - process directly
+    variant = variants[0]["node"] if variants else {}
+    return answer_for_variant(product_info, variant, requested_info, user_input)
+
+
+def answer_for_variant(product_info, variant, requested_info, user_input):
+    """Answer about one resolved variant and remember it as the current product"""
+    # Prepare enhanced product data - numbers come precomputed from the variant's record
+    enhanced_product_data = variant_answer_data(product_info, variant)
+
+    # NEW: Store product in memory
+    store_product_in_memory(product_info.get("title"), enhanced_product_data)
+
+    answer = generate_ai_response(user_input, enhanced_product_data, requested_info, stream=True)
+    return answer
+
+
+def match_clarification_locally(user_input, products):
+    """Match a color/interior reply against product or variant edges without the LLM.
+
+    Returns (result, tied_titles): result is the handler's usual answer dict when the local
+    match is decisive (None otherwise), and tied_titles are the candidates left for the LLM.
+    """
+    match = match_option(user_input, [p["node"] for p in products])
+    if match["tied"]:
+        record_intent_path("llm", "clarification")
+        return None, match["tied"]
+    record_intent_path("rules", "clarification")
+    return {"matched_product_title": match["title"], "confidence": match["confidence"]}, []
 
 
 def handle_color_interior_clarification(user_input, products):
     """Handle clarification for any products based on color and interior specifications"""
     
-    product_titles = [p["node"]["title"] for p in products]
+    # NEW: Abbreviations and synonyms are matched locally - the LLM only breaks ties
+    result, product_titles = match_clarification_locally(user_input, products)
+    if result:
+        return result
     product_list_str = "\n".join(f"- {title}" for title in product_titles)
     
     prompt = f"""
@@ -1821,7 +2350,7 @@ If no clear match, return:
 """
     
     try:
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo", 
             messages=[{"role": "user", "content": prompt}], 
             temperature=0, 
@@ -1837,8 +2366,10 @@ If no clear match, return:
 def handle_pelican_clarification(user_input, products):
     """Handle clarification for Pelican products based on color and interior specifications"""
     
-    # Use GPT to match user's color/interior specification to available products
-    product_titles = [p["node"]["title"] for p in products]
+    # NEW: Abbreviations and synonyms are matched locally - GPT only breaks ties between full matches
+    result, product_titles = match_clarification_locally(user_input, products)
+    if result:
+        return result
     product_list_str = "\n".join(f"- {title}" for title in product_titles)
     
     prompt = f"""
@@ -1889,7 +2420,7 @@ def handle_pelican_clarification(user_input, products):
         """
     
     try:
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo", 
             messages=[{"role": "user", "content": prompt}], 
             temperature=0, 
@@ -1907,13 +2438,18 @@ def process_comparison(product1_name, product2_name, requested_info, user_input)
     # print(f"Searching for product1: {product1_name}")  # Debug print
     # print(f"Searching for product2: {product2_name}")  # Debug print
     
-    # Search for first product
-    results1 = search_products(product1_name)
+    # Search for both products concurrently
+    (results1, error1), (results2, error2) = run_concurrently([
+        lambda: search_products(product1_name),
+        lambda: search_products(product2_name)
+    ])
+    for name, error in ((product1_name, error1), (product2_name, error2)):
+        if error is not None:
+            print(f"Error searching for {name}: {error}")
+            return f"The search for '{name}' failed or timed out. Please try again."
+    
     products1 = results1.get("data", {}).get("products", {}).get("edges", [])
     # print(f"Products1 found: {len(products1)}")  # Debug print
-    
-    # Search for second product
-    results2 = search_products(product2_name)
     products2 = results2.get("data", {}).get("products", {}).get("edges", [])
     # print(f"Products2 found: {len(products2)}")  # Debug print
 
@@ -1922,54 +2458,279 @@ def process_comparison(product1_name, product2_name, requested_info, user_input)
     if not products2:
         return f"No product found for '{product2_name}'. Please check the spelling or try a different search term."
 
-    # Get first product from each search (taking the first match)
+    # Take the top-ranked match from each search
     product1 = products1[0]["node"]
     product2 = products2[0]["node"]
     
-    # Fetch details for both products
-    details1 = fetch_product_details_by_gid(product1["id"])
-    details2 = fetch_product_details_by_gid(product2["id"])
+    # Fetch details for both products in a single round trip
+    details = fetch_products_details_batch([product1["id"], product2["id"]])
     
-    product1_info = details1["data"]["product"]
-    product2_info = details2["data"]["product"]
+    product1_info = details.get(product1["id"])
+    product2_info = details.get(product2["id"])
+    for product, product_info in ((product1, product1_info), (product2, product2_info)):
+        if not product_info:
+            return f"Could not load details for '{product.get('title') or product['id']}'. Please try again."
 
     # Helper function to extract cost, profit, and margin
     def extract_financial_data(product_info):
         variants = product_info.get("variants", {}).get("edges", [])
         variant = variants[0]["node"] if variants else {}
-        
-        # Extract cost from inventory item
-        cost = "N/A"
-        if variant.get("inventoryItem") and variant["inventoryItem"].get("unitCost"):
-            cost = variant["inventoryItem"]["unitCost"]["amount"]
-        
-        # Calculate profit and margin
-        price = variant.get("price", "N/A")
-        profit_margin_data = calculate_profit_and_margin(cost, price)
-        markup_data = calculate_markup(cost, price)
-        
-        return {
-            "title": product_info.get("title"),
-            "variant": variant,
-            "cost": cost,
-            "profit": profit_margin_data["profit"],
-            "margin": profit_margin_data["margin"],
-            "markup": markup_data["markup"]
-        }
+        return variant_answer_data(product_info, variant)
 
     # Get financial data for both products
     product1_data = extract_financial_data(product1_info)
     product2_data = extract_financial_data(product2_info)
 
     # Generate comparison response
-    answer = generate_comparison_response(user_input, product1_data, product2_data, requested_info)
+    answer = generate_comparison_response(user_input, product1_data, product2_data, requested_info, stream=True)
     return answer
 
 
+# NEW: Deterministic intent router - handles the common query shapes with zero LLM calls
+ROUTER_CONFIDENCE_THRESHOLD = 0.8
+
+INFO_WORDS = r"(?:map price|price|selling price|sale price|map|cost|unit cost|profit|margin|markup|inventory|stock|quantity|dimensions?|weight|sku|part number|image url|image|url)"
+INFO_LIST = rf"{INFO_WORDS}(?:\s*(?:,|and|&)\s*{INFO_WORDS})*"
+
+# "what is the price of ", "cost and margin for "
+INFO_PREFIX = rf"(?:(?:what(?:'s| is| are)|give me|show me|tell me|get|find)\s+)?(?:the\s+)?(?P<info>{INFO_LIST})\s+(?:of|for|on)\s+(?:the\s+)?"
+INFO_PREFIX_PATTERN = re.compile(rf"^{INFO_PREFIX}", re.IGNORECASE)
+INFO_WORD_PATTERN = re.compile(rf"\b{INFO_WORDS}\b", re.IGNORECASE)
+
+# "1510 and 1520", "1510 vs 1520" inside a single-product capture
+PRODUCT_SPLIT_PATTERN = re.compile(r"\s+(?:and|&|vs\.?|versus)\s+", re.IGNORECASE)
+
+PRODUCT_QUERY_PATTERNS = [
+    # "price of 1510", "what is the cost and margin for Pelican 1510"
+    re.compile(rf"^{INFO_PREFIX}(?P<product>.+)$", re.IGNORECASE),
+    # "how much is the 1510", "how much does 1510 cost" - before the generic "<product> <info>" shape
+    re.compile(r"^how much (?:is|does|do)\s+(?:the\s+)?(?P<product>.+?)(?:\s+cost)?$", re.IGNORECASE),
+    # "1510 price", "Pelican 1510 cost and inventory"
+    re.compile(rf"^(?P<product>.+?)(?:'s)?\s+(?P<info>{INFO_LIST})$", re.IGNORECASE),
+    # "p/n 3i-2011-7", "sku 1510-000-110"
+    re.compile(r"^(?:p/n|pn|part number|part no\.?|sku)\s*[:#]?\s*(?P<product>[\w./-]+)$", re.IGNORECASE),
+]
+
+COMPARISON_QUERY_PATTERNS = [
+    re.compile(rf"^compare\s+(?:the\s+)?(?:(?P<info>{INFO_LIST})\s+(?:of|for|between)\s+)?(?P<first>.+?)\s+(?:and|with|vs\.?|versus|to)\s+(?P<second>.+)$", re.IGNORECASE),
+    re.compile(rf"^(?:what(?:'s| is)\s+the\s+)?(?:(?P<info>{INFO_LIST})\s+)?difference between\s+(?P<first>.+?)\s+and\s+(?P<second>.+)$", re.IGNORECASE),
+    re.compile(r"^(?P<first>.+?)\s+(?:vs\.?|versus)\s+(?P<second>.+)$", re.IGNORECASE),
+]
+
+# Bare SKUs / part numbers such as "1510-000-110" or "3i-2011-7"
+SKU_QUERY_PATTERN = re.compile(r"^[a-z0-9]+(?:[-/.][a-z0-9]+)+$|^\d{3,}[a-z]*$", re.IGNORECASE)
+
+DATE_QUERY_PATTERN = re.compile(r"\b(?:created|added)\s+(?P<condition>after|before|on|since)\s+(?P<date>.+?)\s*$", re.IGNORECASE)
+RELATIVE_DATE_QUERY_PATTERN = re.compile(
+    r"\b(?:created|added)\s+(?:(?P<day>today|yesterday)|this\s+(?P<period>week|month|year)"
+    r"|in\s+the\s+(?:last|past)\s+(?P<days>\d+)\s+days?)\b",
+    re.IGNORECASE
+)
+DATE_FORMATS = ["%Y-%m-%d", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y", "%m/%d/%Y"]
+
+STATUS_QUERY_PATTERN = re.compile(
+    r"\b(?P<status>draft|active|archived)\s+products?\b"
+    r"|\bproducts?\s+(?:that are|which are|are|in)\s+(?P<status_after>draft|active|archived)\b",
+    re.IGNORECASE
+)
+
+PRONOUN_PRODUCTS = {"it", "this", "that", "this product", "that product", "the product", "its"}
+FILLER_WORDS = {"what", "whats", "what's", "is", "are", "the", "its", "it's", "it", "of", "for", "this", "that",
+                "product", "and", "me", "give", "show", "tell", "get", "about", "please", "how", "much", "does", "cost",
+                "i", "want", "to", "know", "in", "do", "we", "have", "you", "can", "could", "a", "an", "on", "hand",
+                "there", "any", "left", "still", "many"}
+
+
+def parse_query_date(date_text):
+    """Parse a natural language date into YYYY-MM-DD, or None if no known format matches"""
+    cleaned = re.sub(r"(\d+)(st|nd|rd|th)\b", r"\1", date_text.strip(" .?!,")).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def relative_query_date(match, today=None):
+    """(date_condition, YYYY-MM-DD) for a RELATIVE_DATE_QUERY_PATTERN match, e.g. "added this month" -> after the 1st"""
+    today = today or datetime.now().date()
+    if match.group("day"):
+        day = today if match.group("day").lower() == "today" else today - timedelta(days=1)
+        return "on", day.strftime("%Y-%m-%d")
+    if match.group("days"):
+        return "after", (today - timedelta(days=int(match.group("days")))).strftime("%Y-%m-%d")
+    period = match.group("period").lower()
+    if period == "week":
+        start = today - timedelta(days=today.weekday())
+    elif period == "month":
+        start = today.replace(day=1)
+    else:
+        start = today.replace(month=1, day=1)
+    return "after", start.strftime("%Y-%m-%d")
+
+
+def clean_product_reference(text):
+    """Trim articles, quotes and punctuation around a product name/SKU"""
+    text = text.strip(" ?!.,\"'")
+    text = re.sub(r"^(?:the|a|an)\s+", "", text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def route_intent(query):
+    """Classify a query with compiled rules.
+
+    Returns a dict with "intent" (date, status_category, comparison, product, current_product),
+    the fields the matching process_* handler expects, and a "confidence" score - or None.
+    """
+    text = query.strip().rstrip("?").strip()
+    lower = text.lower()
+    query_type = "count" if ("how many" in lower or "count" in lower) else "list"
+
+    # Date queries: "products created after August 1, 2024"
+    date_match = DATE_QUERY_PATTERN.search(text)
+    if date_match:
+        date_value = parse_query_date(date_match.group("date"))
+        if date_value:
+            condition = date_match.group("condition").lower()
+            return {
+                "intent": "date", "confidence": 0.95, "query_type": query_type,
+                "date_condition": "after" if condition == "since" else condition,
+                "date_value": date_value
+            }
+        return None
+
+    # Relative dates: "how many products were added this month"
+    relative_match = RELATIVE_DATE_QUERY_PATTERN.search(text)
+    if relative_match:
+        date_condition, date_value = relative_query_date(relative_match)
+        return {
+            "intent": "date", "confidence": 0.95, "query_type": query_type,
+            "date_condition": date_condition, "date_value": date_value
+        }
+
+    # Status / category queries: "draft products", "how many products with status 'active'"
+    status_category = extract_status_and_category_intent(text, use_llm=False)
+    status_match = STATUS_QUERY_PATTERN.search(text)
+    if status_match and not status_category["status_value"]:
+        status_category["status_value"] = (status_match.group("status") or status_match.group("status_after")).upper()
+        status_category["is_status_query"] = True
+    if status_category["is_status_query"] or status_category["is_category_query"]:
+        complete = ((not status_category["is_status_query"] or status_category["status_value"]) and
+                    (not status_category["is_category_query"] or status_category["category_value"]))
+        if complete:
+            return dict(status_category, intent="status_category", confidence=0.9)
+        return None
+
+    requested_info = extract_current_product_info_request(text)
+
+    # Comparisons: "compare 1510 and 1520", "1510 vs 1520"
+    for pattern in COMPARISON_QUERY_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            first = clean_product_reference(match.group("first"))
+            second = clean_product_reference(match.group("second"))
+            # "price of 1510 vs 1520": the info words belong to the comparison, not the first product
+            prefix = INFO_PREFIX_PATTERN.match(first)
+            if prefix:
+                first = clean_product_reference(first[prefix.end():])
+            if not first or not second:
+                return None
+            confidence = 0.9 if len(first.split()) <= 6 and len(second.split()) <= 6 else 0.5
+            has_info = match.groupdict().get("info") or prefix
+            compared_info = [info for info in requested_info if info != "equivalent"] if has_info else []
+            return {
+                "intent": "comparison", "confidence": confidence, "is_comparison": True,
+                "product1_name_or_sku": first, "product2_name_or_sku": second,
+                "requested_info": compared_info or ["price", "cost", "inventory"]
+            }
+
+    # Follow-ups with no product at all: "price?", "what is the margin"
+    remaining = [word for word in re.findall(r"[\w/'-]+", lower) if word not in FILLER_WORDS]
+    if remaining and re.fullmatch(rf"{INFO_LIST}", " ".join(remaining)):
+        return {"intent": "current_product", "confidence": 0.9, "requested_info": requested_info}
+
+    # Single product lookups: "price of 1510", "1510-000-110"
+    for pattern in PRODUCT_QUERY_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            product = clean_product_reference(match.group("product"))
+            if "info" not in pattern.groupindex and "how much" not in lower:
+                requested_info = extract_current_product_info_request(product)
+            product_words = [word for word in re.findall(r"[\w/'-]+", product.lower()) if word not in FILLER_WORDS]
+            if product.lower() in PRONOUN_PRODUCTS or not product_words:
+                return {"intent": "current_product", "confidence": 0.9, "requested_info": requested_info}
+
+            # "is the cost of it in stock": an info word left in the capture means the shape was misread
+            if INFO_WORD_PATTERN.search(product):
+                return {"intent": "product", "confidence": 0.5, "product_name_or_sku": product,
+                        "requested_info": requested_info}
+
+            # "price of 1510 and 1520" names two products - a comparison only when both look like models
+            parts = [clean_product_reference(part) for part in PRODUCT_SPLIT_PATTERN.split(product)]
+            if len(parts) > 1:
+                confident = len(parts) == 2 and all(re.search(r"\d", part) for part in parts)
+                compared_info = [info for info in requested_info if info != "equivalent"]
+                return {
+                    "intent": "comparison", "confidence": 0.9 if confident else 0.5, "is_comparison": True,
+                    "product1_name_or_sku": parts[0], "product2_name_or_sku": parts[-1],
+                    "requested_info": compared_info or ["price", "cost", "inventory"]
+                }
+
+            confidence = 0.9 if len(product.split()) <= 6 else 0.5
+            return {
+                "intent": "product", "confidence": confidence,
+                "product_name_or_sku": product, "requested_info": requested_info
+            }
+
+    if SKU_QUERY_PATTERN.match(text):
+        return {"intent": "product", "confidence": 0.85, "product_name_or_sku": text, "requested_info": requested_info}
+
+    return None
+
+
+@st.cache_resource
+def get_intent_path_stats():
+    """Process-wide counters of how intents were resolved (rules vs LLM)"""
+    return {}
+
+
+def record_intent_path(path, intent=None):
+    """Remember which path resolved the last message and count it"""
+    key = f"{path}:{intent}" if intent else path
+    stats = get_intent_path_stats()
+    stats[key] = stats.get(key, 0) + 1
+    st.session_state.last_intent_path = key
+
+
+def route_confidently(query):
+    """route_intent result when it clears the confidence threshold, else None"""
+    routed = route_intent(query)
+    if routed and routed["confidence"] >= ROUTER_CONFIDENCE_THRESHOLD:
+        return routed
+    return None
+
+
 # ENHANCED: Enhanced input handler with status and category query support
 def handle_user_input(user_input):
     """Enhanced input handler with date, status and category query support"""
     
+    # NEW: Rule-based fast path - only fall through to the LLM extractors when it is not confident
+    routed = route_confidently(user_input)
+    if routed and routed["intent"] != "current_product":
+        record_intent_path("rules", routed["intent"])
+        if routed["intent"] == "date":
+            return process_date_query(routed, user_input)
+        if routed["intent"] == "status_category":
+            return process_status_and_category_query(routed, user_input)
+        if routed["intent"] == "comparison":
+            return process_comparison(
+                routed["product1_name_or_sku"], routed["product2_name_or_sku"], routed["requested_info"], user_input
+            )
+        return process_single_product(routed["product_name_or_sku"], routed["requested_info"], user_input)
+    
+    record_intent_path("llm")
+    
     # Check for date-based queries first
     date_intent = extract_date_intent(user_input)
     if date_intent:
@@ -2039,6 +2800,10 @@ def handle_user_input_with_pelican_support(user_input):
     user_input = user_input.rstrip('?').strip()
     user_lower = user_input.lower()
     
+    # NEW: Continue the last product listing from its saved cursor
+    if st.session_state.product_listing and re.match(SHOW_MORE_PATTERN, user_lower):
+        return continue_product_listing()
+    
     count_patterns = [
         r'how many products',
         r'how many product',
@@ -2052,6 +2817,14 @@ def handle_user_input_with_pelican_support(user_input):
     ]
     
     if any(re.search(pattern, user_lower) for pattern in count_patterns):
+        # Filtered counts ("how many draft products", "how many products added this month") keep their filters
+        routed = route_confidently(user_input)
+        if routed and routed["intent"] == "date":
+            record_intent_path("rules", "date")
+            return process_date_query(routed, user_input)
+        if routed and routed["intent"] == "status_category":
+            record_intent_path("rules", "status_category")
+            return process_status_and_category_query(routed, user_input)
         count_result = get_total_product_count()
         return f"We have {count_result} on the site."
     
@@ -2108,16 +2881,21 @@ def handle_user_input_with_pelican_support(user_input):
             # Extract which brands user wants to compare with
             target_brands = extract_equivalent_product_brands(user_input)
             
-            # Search for equivalent products
-            equivalent_results = search_products_by_brand_and_dimensions(target_brands, current_dimensions)
+            current_id = product_field(current_data, "id")
+            equivalent_results = find_equivalents(current_id, target_brands, current_dimensions)
             
-            # Format response
+            # Format response - ranked by distance between interior dimensions (inches)
             response_parts = [f"Based on the interior dimensions ({current_dimensions}) of '{current_title}', here are the closest equivalents:"]
             
             for brand in target_brands:
                 if brand in equivalent_results and equivalent_results[brand]:
-                    match = equivalent_results[brand]
-                    response_parts.append(f"\n**{brand}**: {match['title']} (SKU: {match['sku']}) - {match['confidence']} confidence match")
+                    response_parts.append(f"\n**{brand}**:")
+                    for rank, match in enumerate(equivalent_results[brand], 1):
+                        fit_note = "" if match["fits"] else ", smaller on at least one side"
+                        response_parts.append(
+                            f"{rank}. {match['title']} (SKU: {match['sku']}) - interior {match['dimensions']}, "
+                            f"distance {match['distance']} in ({match['tolerance']} match{fit_note})"
+                        )
                 else:
                     response_parts.append(f"\n**{brand}**: No equivalent found or interior dimension data unavailable")
             
@@ -2129,7 +2907,7 @@ def handle_user_input_with_pelican_support(user_input):
             requested_info = extract_current_product_info_request(user_input)
             current_data = st.session_state.current_product_data
             
-            answer = generate_ai_response(user_input, current_data, requested_info)
+            answer = generate_ai_response(user_input, current_data, requested_info, stream=True)
             return answer
 
     if extract_cost_update_intent(user_input):
@@ -2159,21 +2937,20 @@ def handle_user_input_with_pelican_support(user_input):
                 st.session_state.awaiting_clarification = False
                 st.session_state.clarification_type = ""
                 st.session_state.clarification_data = []
+                st.session_state.clarification_details = {}
                 st.session_state.original_query = ""
                 st.session_state.original_requested_info = []
                 return "Product with the specified color and interior combination is unavailable."
 
-            # Fetch product details
+            # Only the matched product is fetched (the variant question may already hold its details)
             gid = matched_product["node"]["id"]
-            details = fetch_product_details_by_gid(gid)
-            product_info = details["data"]["product"]
+            product_info = get_clarification_product_details(gid)
 
             variants = product_info.get("variants", {}).get("edges", [])
             
             if len(variants) > 1:
-                # Check if the user's input can already specify a variant
-                variant_products = [{"node": {"title": v["node"]["title"]}} for v in variants]
-                variant_clarification = handle_color_interior_clarification(user_input, variant_products)
+                # Check if the user's input can already specify a variant (variant edges carry SKU and options too)
+                variant_clarification = handle_color_interior_clarification(user_input, variants)
                 
                 if variant_clarification.get("matched_product_title") and variant_clarification.get("confidence") == "high":
                     # Found a specific variant match - process it directly
@@ -2184,27 +2961,8 @@ def handle_user_input_with_pelican_support(user_input):
                     if matched_variant:
                         selected_variant = matched_variant["node"]
                         
-                        # Extract cost from inventory item
-                        cost = "N/A"
-                        if selected_variant.get("inventoryItem") and selected_variant["inventoryItem"].get("unitCost"):
-                            cost = selected_variant["inventoryItem"]["unitCost"]["amount"]
-
-                        price = selected_variant.get("price", "N/A")
-                        profit_margin_data = calculate_profit_and_margin(cost, price)
-                        markup_data = calculate_markup(cost, price)
-
-                        images = product_info.get("images", {}).get("edges", [])
-                        image_url = images[0]["node"]["url"] if images else "N/A"
-
-                        enhanced_product_data = {
-                            "title": product_info.get("title"),
-                            "variant": selected_variant,
-                            "cost": cost,
-                            "profit": profit_margin_data["profit"],
-                            "margin": profit_margin_data["margin"],
-                            "markup": markup_data["markup"],
-                            "image_url": image_url
-                        }
+                        # Prepare enhanced product data - numbers come precomputed from the variant's record
+                        enhanced_product_data = variant_answer_data(product_info, selected_variant)
 
                         # NEW: Store product in memory
                         store_product_in_memory(product_info.get("title"), enhanced_product_data)
@@ -2212,12 +2970,13 @@ def handle_user_input_with_pelican_support(user_input):
                         original_query = st.session_state.original_query
                         original_requested_info = st.session_state.original_requested_info
 
-                        answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info)
+                        answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info, stream=True)
 
                         # Reset state
                         st.session_state.awaiting_clarification = False
                         st.session_state.clarification_type = ""
                         st.session_state.clarification_data = []
+                        st.session_state.clarification_details = {}
                         st.session_state.original_query = ""
                         st.session_state.original_requested_info = []
 
@@ -2228,32 +2987,13 @@ def handle_user_input_with_pelican_support(user_input):
                 st.session_state.clarification_type = "variant_color_interior"
                 st.session_state.clarification_data = variants
                 st.session_state.original_product = product_info
-                return "This product has multiple variants. Could you please specify the color and interior option you're looking for?"
+                return "This product has multiple variants. Could you please specify the color and interior option you're looking for, or pick one below?"
             
             else:
                 variant = variants[0]["node"] if variants else {}
 
-                # Extract cost from inventory item
-                cost = "N/A"
-                if variant.get("inventoryItem") and variant["inventoryItem"].get("unitCost"):
-                    cost = variant["inventoryItem"]["unitCost"]["amount"]
-
-                price = variant.get("price", "N/A")
-                profit_margin_data = calculate_profit_and_margin(cost, price)
-                markup_data = calculate_markup(cost, price)
-
-                images = product_info.get("images", {}).get("edges", [])
-                image_url = images[0]["node"]["url"] if images else "N/A"
-
-                enhanced_product_data = {
-                    "title": product_info.get("title"),
-                    "variant": variant,
-                    "cost": cost,
-                    "profit": profit_margin_data["profit"],
-                    "margin": profit_margin_data["margin"],
-                    "markup": markup_data["markup"],
-                    "image_url": image_url
-                }
+                # Prepare enhanced product data - numbers come precomputed from the variant's record
+                enhanced_product_data = variant_answer_data(product_info, variant)
 
                 # NEW: Store product in memory
                 store_product_in_memory(product_info.get("title"), enhanced_product_data)
@@ -2261,12 +3001,13 @@ def handle_user_input_with_pelican_support(user_input):
                 original_query = st.session_state.original_query
                 original_requested_info = st.session_state.original_requested_info
 
-                answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info)
+                answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info, stream=True)
 
                 # Reset state
                 st.session_state.awaiting_clarification = False
                 st.session_state.clarification_type = ""
                 st.session_state.clarification_data = []
+                st.session_state.clarification_details = {}
                 st.session_state.original_query = ""
                 st.session_state.original_requested_info = []
 
@@ -2276,6 +3017,7 @@ def handle_user_input_with_pelican_support(user_input):
         st.session_state.awaiting_clarification = False
         st.session_state.clarification_type = ""
         st.session_state.clarification_data = []
+        st.session_state.clarification_details = {}
         st.session_state.original_query = ""
         st.session_state.original_requested_info = []
         return "Product with the specified color and interior combination is unavailable."
@@ -2286,11 +3028,8 @@ def handle_user_input_with_pelican_support(user_input):
 
         variants = st.session_state.clarification_data
         
-        # Convert variants to the same format as products for the existing function
-        variant_products = [{"node": {"title": v["node"]["title"]}} for v in variants]
-        
-        # Reuse the existing clarification function
-        clarification_result = handle_color_interior_clarification(user_input, variant_products)
+        # Variant edges have the same shape as product edges, so reuse the existing clarification function
+        clarification_result = handle_color_interior_clarification(user_input, variants)
 
         matched_title = clarification_result.get("matched_product_title", "")
         confidence = clarification_result.get("confidence", "")
@@ -2305,6 +3044,7 @@ def handle_user_input_with_pelican_support(user_input):
                 st.session_state.awaiting_clarification = False
                 st.session_state.clarification_type = ""
                 st.session_state.clarification_data = []
+                st.session_state.clarification_details = {}
                 st.session_state.original_query = ""
                 st.session_state.original_requested_info = []
                 st.session_state.original_product = None
@@ -2314,29 +3054,8 @@ def handle_user_input_with_pelican_support(user_input):
             selected_variant = matched_variant["node"]
             product = st.session_state.original_product
 
-            # Extract cost from inventory item
-            cost = "N/A"
-            if selected_variant.get("inventoryItem") and selected_variant["inventoryItem"].get("unitCost"):
-                cost = selected_variant["inventoryItem"]["unitCost"]["amount"]
-
-            # Calculate profit and margin
-            price = selected_variant.get("price", "N/A")
-            profit_margin_data = calculate_profit_and_margin(cost, price)
-            markup_data = calculate_markup(cost, price)
-
-            images = product.get("images", {}).get("edges", [])
-            image_url = images[0]["node"]["url"] if images else "N/A"
-
-            # Prepare enhanced product data
-            enhanced_product_data = {
-                "title": product.get("title"),
-                "variant": selected_variant,
-                "cost": cost,
-                "profit": profit_margin_data["profit"],
-                "margin": profit_margin_data["margin"],
-                "markup": markup_data["markup"],
-                "image_url": image_url
-            }
+            # Prepare enhanced product data - numbers come precomputed from the variant's record
+            enhanced_product_data = variant_answer_data(product, selected_variant)
 
             # NEW: Store product in memory
             store_product_in_memory(product.get("title"), enhanced_product_data)
@@ -2344,12 +3063,13 @@ def handle_user_input_with_pelican_support(user_input):
             original_query = st.session_state.original_query
             original_requested_info = st.session_state.original_requested_info
 
-            answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info)
+            answer = generate_ai_response(original_query, enhanced_product_data, original_requested_info, stream=True)
 
             # Reset state
             st.session_state.awaiting_clarification = False
             st.session_state.clarification_type = ""
             st.session_state.clarification_data = []
+            st.session_state.clarification_details = {}
             st.session_state.original_query = ""
             st.session_state.original_requested_info = []
             st.session_state.original_product = None
@@ -2360,6 +3080,7 @@ def handle_user_input_with_pelican_support(user_input):
         st.session_state.awaiting_clarification = False
         st.session_state.clarification_type = ""
         st.session_state.clarification_data = []
+        st.session_state.clarification_details = {}
         st.session_state.original_query = ""
         st.session_state.original_requested_info = []
         st.session_state.original_product = None
@@ -2380,8 +3101,7 @@ def handle_user_input_with_pelican_support(user_input):
             
             if matched_product:
                 gid = matched_product["node"]["id"]
-                details = fetch_product_details_by_gid(gid)
-                product_info = details["data"]["product"]
+                product_info = get_clarification_product_details(gid)
                 
                 updated_at = product_info.get("updatedAt", "N/A")
                 product_title = product_info.get("title", "Unknown Product")
@@ -2401,6 +3121,7 @@ def handle_user_input_with_pelican_support(user_input):
                 st.session_state.awaiting_clarification = False
                 st.session_state.clarification_type = ""
                 st.session_state.clarification_data = []
+                st.session_state.clarification_details = {}
                 st.session_state.original_query = ""
                 
                 return answer
@@ -2409,6 +3130,7 @@ def handle_user_input_with_pelican_support(user_input):
         st.session_state.awaiting_clarification = False
         st.session_state.clarification_type = ""
         st.session_state.clarification_data = []
+        st.session_state.clarification_details = {}
         st.session_state.original_query = ""
         return "Could not find the specified product to check cost update information."
 
@@ -2419,13 +3141,136 @@ def handle_user_input_with_pelican_support(user_input):
     return handle_user_input(user_input)
 
 
+def show_bot_answer(answer):
+    """Render a bot answer below the history - token by token when it is a stream - and store the final text"""
+    with st.chat_message("bot"):
+        if isinstance(answer, str):
+            st.text(answer)
+        else:
+            # st.write_stream renders markdown, which turns "$" prices into LaTeX; keep the plain .text() look
+            placeholder = st.empty()
+            text = ""
+            for chunk in answer:
+                text += chunk
+                placeholder.text(text)
+            answer = text.strip()
+    st.session_state.conversation.append(("bot", answer))
+
+
+# NEW: Clarification questions are answered with buttons - products by title, variants with price and stock
+CLARIFICATION_CHOICE_TYPES = {"color_interior_specs", "variant_color_interior"}
+MAX_CLARIFICATION_CHOICES = 12
+
+
+def clarification_choices():
+    """(label, product gid, variant gid) for the pending clarification; variant gid is None for product choices"""
+    if not st.session_state.awaiting_clarification or st.session_state.clarification_type not in CLARIFICATION_CHOICE_TYPES:
+        return []
+
+    if st.session_state.clarification_type == "color_interior_specs":
+        # Candidate products are offered by title; their details are fetched once one is clicked
+        return [
+            (edge["node"]["title"] or "Product", edge["node"]["id"], None)
+            for edge in st.session_state.clarification_data
+        ][:MAX_CLARIFICATION_CHOICES]
+
+    details = st.session_state.clarification_details or {}
+    product_gid = (st.session_state.original_product or {}).get("id")
+    record = details.get(product_gid)
+    if record is None:
+        return []
+
+    choices = []
+    for variant in record.variants:
+        label = record.title or "Product"
+        if len(record.variants) > 1 and variant.title and variant.title != "Default Title":
+            label += f" · {variant.title}"
+        label += f" — {format_money(variant.price)}"
+        label += f", {variant.inventory} in stock" if variant.inventory is not None else ", stock unavailable"
+        choices.append((label, record.id, variant.id))
+    return choices[:MAX_CLARIFICATION_CHOICES]
+
+
+def select_clarification_choice(label, product_gid, variant_gid):
+    """Button callback - the choice is answered on the rerun it triggers"""
+    st.session_state.clarification_choice = {"label": label, "product_gid": product_gid, "variant_gid": variant_gid}
+
+
+def answer_clarification_choice(choice):
+    """Answer the original question for a clicked product or variant - no search, no matching call.
+
+    A clicked product is fetched now and asks for its variant when it has several; a clicked
+    variant is answered from the details captured with the variant question.
+    """
+    product_info = get_clarification_product_details(choice["product_gid"]) or {}
+    original_query = st.session_state.original_query or choice["label"]
+    original_requested_info = st.session_state.original_requested_info
+
+    # Reset state
+    st.session_state.awaiting_clarification = False
+    st.session_state.clarification_type = ""
+    st.session_state.clarification_data = []
+    st.session_state.clarification_details = {}
+    st.session_state.original_query = ""
+    st.session_state.original_requested_info = []
+    st.session_state.original_product = None
+
+    if not product_info:
+        return "That option is no longer available. Please ask about the product again."
+    if choice["variant_gid"] is None:
+        return answer_for_product(product_info, original_requested_info, original_query)
+
+    variant = next(
+        (edge["node"] for edge in product_info.get("variants", {}).get("edges", [])
+         if edge["node"].get("id") == choice["variant_gid"]),
+        None
+    )
+    if variant is None:
+        return "That option is no longer available. Please ask about the product again."
+    return answer_for_variant(product_info, variant, original_requested_info, original_query)
+
+
+def show_clarification_choices():
+    choices = clarification_choices()
+    if not choices:
+        return
+    with st.container():
+        for label, product_gid, variant_gid in choices:
+            st.button(
+                label, key=f"clarify:{variant_gid or product_gid}",
+                on_click=select_clarification_choice, args=(label, product_gid, variant_gid)
+            )
+
+
 # Streamlit UI
 st.title("🛍️ Conversational Shopify Chatbot")
+get_product_count_cache()  # NEW: starts the background product count warm-up once per process
+
+# Display chat
+for role, message in st.session_state.conversation:
+    if role == "bot":
+        st.chat_message(role).text(message)  # Use .text() instead of .write()
+    else:
+        st.chat_message(role).write(message)
+
 user_input = st.chat_input("Ask about a product...")
 
+# NEW: A clicked clarification button answers the original question without a new search
+clarification_choice = st.session_state.clarification_choice
+st.session_state.clarification_choice = None
+if clarification_choice and not user_input:
+    try:
+        st.session_state.conversation.append(("user", clarification_choice["label"]))
+        st.chat_message("user").write(clarification_choice["label"])
+        show_bot_answer(answer_clarification_choice(clarification_choice))
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        show_bot_answer("An error occurred. Please refresh the page and try again.")
+
 if user_input:
     try:
         st.session_state.conversation.append(("user", user_input))
+        st.chat_message("user").write(user_input)
 
         # If awaiting clarification on variant, check the variant details
         if st.session_state.awaiting_clarification and st.session_state.clarification_type == "variant":
@@ -2439,35 +3284,16 @@ if user_input:
                 )
                 product = st.session_state.original_product
                 
-                # Extract cost from inventory item
-                cost = "N/A"
-                if selected_variant.get("inventoryItem") and selected_variant["inventoryItem"].get("unitCost"):
-                    cost = selected_variant["inventoryItem"]["unitCost"]["amount"]
-                
-                # Calculate profit and margin
-                price = selected_variant.get("price", "N/A")
-                profit_margin_data = calculate_profit_and_margin(cost, price)
-                
-                images = product.get("images", {}).get("edges", [])
-                image_url = images[0]["node"]["url"] if images else "N/A"
-                
-                # Prepare enhanced product data
-                enhanced_product_data = {
-                    "title": product.get("title"),
-                    "variant": selected_variant,
-                    "cost": cost,
-                    "profit": profit_margin_data["profit"],
-                    "margin": profit_margin_data["margin"],
-                    "image_url": image_url
-                }
+                # Prepare enhanced product data - numbers come precomputed from the variant's record
+                enhanced_product_data = variant_answer_data(product, selected_variant)
                 
-                answer = generate_ai_response(user_input, enhanced_product_data, result["requested_info"])
-                st.session_state.conversation.append(("bot", answer))
+                answer = generate_ai_response(user_input, enhanced_product_data, result["requested_info"], stream=True)
+                show_bot_answer(answer)
                 st.session_state.awaiting_clarification = False  # Clarification is done
                 st.session_state.clarified_variant = selected_variant  # Store clarified variant
 
             else:
-                st.session_state.conversation.append(("bot", "I couldn't match that to any variant. Please try again."))
+                show_bot_answer("I couldn't match that to any variant. Please try again.")
 
         # Handle first query where no clarification is needed
         else:
@@ -2475,7 +3301,7 @@ if user_input:
             
             # Use the new enhanced handler
             answer = handle_user_input_with_pelican_support(user_input)
-            st.session_state.conversation.append(("bot", answer))
+            show_bot_answer(answer)
 
     except Exception as e:
         # Log the error for debugging (optional - remove in production)
@@ -2483,20 +3309,16 @@ if user_input:
         
         # Display user-friendly error message
         error_message = "An error occurred. Please refresh the page and try again."
-        st.session_state.conversation.append(("bot", error_message))
+        show_bot_answer(error_message)
         
         # Reset session state to prevent cascading errors
         st.session_state.awaiting_clarification = False
         st.session_state.clarification_type = ""
         st.session_state.clarification_data = []
+        st.session_state.clarification_details = {}
         st.session_state.original_query = ""
         st.session_state.original_requested_info = []
         st.session_state.original_product = None
 
-    
-# Display chat
-for role, message in st.session_state.conversation:
-    if role == "bot":
-        st.chat_message(role).text(message)  # Use .text() instead of .write()
-    else:
-        st.chat_message(role).write(message)
+# NEW: Candidate variants of a pending clarification as one-click choices
+show_clarification_choices()
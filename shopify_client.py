@@ -0,0 +1,501 @@
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SHOPIFY_API_VERSION = "2023-07"
+
+# Variant fields shared by the product detail lookup and the catalog sync's extra variant pages
+VARIANT_DETAIL_FIELDS = """
+              id
+              sku
+              title
+              selectedOptions {
+                name
+                value
+              }
+              price
+              inventoryQuantity
+              inventoryItem {
+                id
+                unitCost {
+                  amount
+                  currencyCode
+                }
+                tracked
+                measurement {
+                  weight {
+                    value
+                    unit
+                  }
+                }
+              }
+"""
+
+# Field selection shared by the product detail lookup and the incremental catalog sync
+PRODUCT_DETAIL_FIELDS = f"""
+        id
+        title
+        handle
+        createdAt
+        updatedAt
+        status
+        vendor
+        productType
+        tags
+        onlineStoreUrl
+        metafields(first: 20) {{
+          edges {{
+            node {{
+              namespace
+              key
+              value
+            }}
+          }}
+        }}
+        variants(first: 10) {{
+          edges {{
+            node {{
+{VARIANT_DETAIL_FIELDS}
+            }}
+          }}
+          pageInfo {{
+            hasNextPage
+            endCursor
+          }}
+        }}
+        images(first: 1) {{
+          edges {{
+            node {{
+              url
+              altText
+            }}
+          }}
+        }}
+"""
+
+# Shopify's default bucket for standard plans; refreshed from every response's throttleStatus
+DEFAULT_MAXIMUM_AVAILABLE = 1000.0
+DEFAULT_RESTORE_RATE = 50.0
+MAX_THROTTLE_RETRIES = 5
+
+# Shopify rejects any single query whose requested cost is above this
+SINGLE_QUERY_COST_LIMIT = 1000
+
+SELECTION_PATTERN = re.compile(r'(\w+)\s*(\([^)]*\))?\s*\{|\}')
+FIRST_ARG_PATTERN = re.compile(r'\b(?:first|last)\s*:\s*(\$?\w+)')
+STRING_LITERAL_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"')
+OPERATION_HEADER_PATTERN = re.compile(r'^\s*(?:query|mutation)\b[^{]*')
+
+
+def estimate_query_cost(query, variables=None):
+    """Static estimate of Shopify's requestedQueryCost for a query
+
+    Objects cost 1 and connections cost 2, multiplied by the `first:` size of every enclosing connection.
+    Scalars are free.
+    """
+    variables = variables or {}
+    body = OPERATION_HEADER_PATTERN.sub("", STRING_LITERAL_PATTERN.sub('""', query))
+    multipliers = [1]
+    cost = 0
+
+    for match in SELECTION_PATTERN.finditer(body):
+        if match.group(0) == "}":
+            if len(multipliers) > 1:
+                multipliers.pop()
+            continue
+
+        field, args = match.group(1), match.group(2) or ""
+        if field == "edges":
+            multipliers.append(multipliers[-1])
+            continue
+
+        size_match = FIRST_ARG_PATTERN.search(args)
+        if size_match:
+            size = size_match.group(1)
+            size = variables.get(size[1:], 1) if size.startswith("$") else size
+            cost += 2 * multipliers[-1]
+            multipliers.append(multipliers[-1] * (int(size) if str(size).isdigit() else 1))
+        else:
+            cost += multipliers[-1]
+            multipliers.append(multipliers[-1])
+
+    return max(cost, 1)
+
+
+def normalize_query(query):
+    """Collapse literals and whitespace so queries of the same shape share one cost entry"""
+    return " ".join(STRING_LITERAL_PATTERN.sub('""', query).split())
+
+
+class ShopifyRateLimiter:
+    """Leaky-bucket limiter that mirrors Shopify's GraphQL cost bucket (extensions.cost.throttleStatus)"""
+
+    def __init__(self, maximum_available=DEFAULT_MAXIMUM_AVAILABLE, restore_rate=DEFAULT_RESTORE_RATE):
+        self.maximum_available = maximum_available
+        self.currently_available = maximum_available
+        self.restore_rate = restore_rate
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _restore(self):
+        now = time.monotonic()
+        self.currently_available = min(
+            self.maximum_available,
+            self.currently_available + (now - self.updated_at) * self.restore_rate
+        )
+        self.updated_at = now
+
+    def acquire(self, cost):
+        """Block until the bucket can cover cost, then reserve it. Returns the seconds spent waiting."""
+        cost = min(cost, self.maximum_available)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._restore()
+                if self.currently_available >= cost:
+                    self.currently_available -= cost
+                    return waited
+                delay = (cost - self.currently_available) / self.restore_rate
+            time.sleep(delay)
+            waited += delay
+
+    def update(self, throttle_status):
+        """Resync the local bucket with the state Shopify reported after a query"""
+        if not throttle_status:
+            return
+        with self.lock:
+            self.maximum_available = float(throttle_status.get("maximumAvailable", self.maximum_available))
+            self.currently_available = float(throttle_status.get("currentlyAvailable", self.currently_available))
+            self.restore_rate = float(throttle_status.get("restoreRate", self.restore_rate)) or DEFAULT_RESTORE_RATE
+            self.updated_at = time.monotonic()
+
+
+def is_throttled(result):
+    return any(
+        (error.get("extensions") or {}).get("code") == "THROTTLED"
+        for error in result.get("errors") or []
+        if isinstance(error, dict)
+    )
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls: the first caller runs it, the others wait and share its result"""
+
+    def __init__(self):
+        self.calls = {}  # key -> {"done": Event, "result": ..., "error": ...}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn for key unless an identical call is already in flight. Returns (result, shared)."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["done"].set()
+        return call["result"], False
+
+
+class FanOut:
+    """Bounded thread pool that runs independent calls concurrently.
+
+    run() returns one (result, error) pair per call, in the order the calls were given.
+    A call that raises or misses its deadline only fails its own slot.
+    """
+
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fan-out")
+
+    def run(self, calls, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        futures = [self.executor.submit(fn) for fn in calls]
+        outcomes = []
+        for future in futures:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                outcomes.append((future.result(timeout=remaining), None))
+            except FutureTimeoutError:
+                future.cancel()
+                outcomes.append((None, TimeoutError(f"call did not finish within {timeout}s")))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShopifyClient:
+    """Pooled, keep-alive client for the Shopify Admin GraphQL API"""
+
+    def __init__(self, store_url, access_token, api_version=SHOPIFY_API_VERSION,
+                 connect_timeout=5.0, read_timeout=30.0, pool_size=10, endpoint=None):
+        # endpoint lets us point the client at a local fake server instead of the store
+        self.endpoint = endpoint or f"https://{store_url}/admin/api/{api_version}/graphql.json"
+        self.timeout = (connect_timeout, read_timeout)
+
+        # One session = one connection pool, so TCP+TLS handshakes are reused across calls
+        self.session = requests.Session()
+        self.session.headers.update({
+            "X-Shopify-Access-Token": access_token or "",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.limiter = ShopifyRateLimiter()
+        self.learned_costs = {}  # normalized query -> last requestedQueryCost reported by Shopify
+        self.stats = {}  # calling function -> cost stats
+        self.stats_lock = threading.Lock()
+        self.single_flight = SingleFlight()
+
+    def graphql(self, query, variables=None, label=None):
+        """Run a GraphQL query against the Admin API and return the decoded JSON body
+
+        Requests wait for enough bucket capacity instead of failing, and THROTTLED responses are retried.
+        Identical read queries already in flight are not sent again - callers share the one response,
+        so the returned dict must be treated as read-only.
+        """
+        label = label or sys._getframe(1).f_code.co_name
+        if query.lstrip().startswith("mutation"):
+            return self._execute(query, variables, label)
+
+        flight_key = json.dumps([" ".join(query.split()), variables or {}], sort_keys=True, default=str)
+        result, shared = self.single_flight.do(flight_key, lambda: self._execute(query, variables, label))
+        if shared:
+            self._record(label, {}, 0.0, throttled=False, coalesced=True)
+        return result
+
+    def _execute(self, query, variables, label):
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+
+        query_key = normalize_query(query)
+        estimated_cost = self.learned_costs.get(query_key) or estimate_query_cost(query, variables)
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            waited = self.limiter.acquire(estimated_cost)
+            response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+
+            if response.status_code == 429:
+                retry_after = float(response.headers.get("Retry-After", 1))
+                self._record(label, {}, waited + retry_after, throttled=True)
+                time.sleep(retry_after)
+                continue
+
+            result = response.json()
+            cost = (result.get("extensions") or {}).get("cost") or {}
+            self.limiter.update(cost.get("throttleStatus"))
+            if cost.get("requestedQueryCost"):
+                self.learned_costs[query_key] = cost["requestedQueryCost"]
+
+            throttled = is_throttled(result)
+            self._record(label, cost, waited, throttled)
+            if not throttled:
+                return result
+
+        # Every attempt was throttled (HTTP 429 or THROTTLED) - report it like any other GraphQL error
+        return {"errors": [{
+            "message": f"Throttled: gave up after {MAX_THROTTLE_RETRIES + 1} attempts",
+            "extensions": {"code": "THROTTLED"}
+        }]}
+
+    def _record(self, label, cost, waited, throttled, coalesced=False):
+        with self.stats_lock:
+            entry = self.stats.setdefault(label, {
+                "calls": 0, "requested_cost": 0, "actual_cost": 0, "throttled": 0, "wait_seconds": 0.0,
+                "coalesced": 0
+            })
+            if coalesced:
+                entry["coalesced"] += 1
+                return
+            entry["calls"] += 1
+            entry["requested_cost"] += cost.get("requestedQueryCost") or 0
+            entry["actual_cost"] += cost.get("actualQueryCost") or 0
+            entry["throttled"] += 1 if throttled else 0
+            entry["wait_seconds"] += waited
+
+    def cost_stats(self):
+        """Per calling function: calls, requested/actual query cost, throttled responses, time spent waiting
+        and calls that were coalesced onto an identical in-flight request"""
+        with self.stats_lock:
+            return {label: dict(entry) for label, entry in self.stats.items()}
+
+    def paginate(self, query, variables=None, connection="products", label=None, after=None, raise_on_errors=False):
+        """Yield each page of a cursor-paginated connection; the query must accept an `$after` variable
+
+        With raise_on_errors a top-level `errors` response (e.g. MAX_COST_EXCEEDED) raises RuntimeError
+        instead of ending the iteration as if the connection were empty.
+        """
+        label = label or sys._getframe(1).f_code.co_name
+        variables = dict(variables or {})
+        variables["after"] = after
+
+        while True:
+            result = self.graphql(query, variables, label=label)
+            if raise_on_errors and result.get("errors"):
+                raise RuntimeError(f"Shopify query failed: {result['errors']}")
+            page = result.get("data", {}).get(connection) or {}
+            yield page
+
+            page_info = page.get("pageInfo", {})
+            if not page_info.get("hasNextPage"):
+                break
+            variables["after"] = page_info.get("endCursor")
+
+    def close(self):
+        """Release the pooled connections"""
+        self.session.close()
+
+
+class StaleWhileRevalidateCache:
+    """Serve the last known value immediately and refresh it in the background once it is older than max_age"""
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.entries = {}  # key -> (value, fetched_at)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+
+        # Nothing cached yet - the caller has to wait for the loader
+        if entry is None:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+            return value
+
+        value, fetched_at = entry
+        if time.time() - fetched_at > self.max_age:
+            self.refresh_in_background(key, loader)
+        return value
+
+    def refresh_in_background(self, key, loader):
+        """Start a background refresh for key unless one is already running (also used to pre-warm)"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+        except Exception as e:
+            print(f"Error refreshing cached value for {key}: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+
+def cache_size_default(value):
+    """json.dumps fallback for sizing cached values: records are measured in their GraphQL shape"""
+    to_node = getattr(value, "to_node", None)
+    return to_node() if to_node else str(value)
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache for Shopify responses, bounded by an approximate memory budget
+
+    Entries are grouped by kind (e.g. "search", "product_details") and each kind has its own TTL.
+    """
+
+    def __init__(self, ttls, default_ttl=60.0, max_bytes=32 * 1024 * 1024):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (kind, key) -> (value, expires_at, size)
+        self.total_bytes = 0
+        self.counters = {}  # kind -> {"hits", "misses", "evictions"}
+        self.lock = threading.Lock()
+
+    def _count(self, kind, name):
+        counter = self.counters.setdefault(kind, {"hits": 0, "misses": 0, "evictions": 0})
+        counter[name] += 1
+
+    def _drop(self, entry_key):
+        _, _, size = self.entries.pop(entry_key)
+        self.total_bytes -= size
+
+    def get(self, kind, key):
+        """Return the cached value, or None on a miss or an expired entry"""
+        entry_key = (kind, key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._drop(entry_key)
+                self._count(kind, "misses")
+                return None
+            self.entries.move_to_end(entry_key)
+            self._count(kind, "hits")
+            return entry[0]
+
+    def set(self, kind, key, value):
+        entry_key = (kind, key)
+        size = len(json.dumps(value, default=cache_size_default))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttls.get(kind, self.default_ttl)
+
+        with self.lock:
+            if entry_key in self.entries:
+                self._drop(entry_key)
+            self.entries[entry_key] = (value, expires_at, size)
+            self.total_bytes += size
+
+            # Evict least recently used entries until we are back under the memory budget
+            while self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._drop(oldest_key)
+                self._count(oldest_key[0], "evictions")
+
+    def invalidate(self, kind=None, key=None):
+        """Drop one entry, every entry of a kind, or (with no arguments) everything"""
+        with self.lock:
+            if kind is not None and key is not None:
+                if (kind, key) in self.entries:
+                    self._drop((kind, key))
+                return
+            for entry_key in list(self.entries):
+                if kind is None or entry_key[0] == kind:
+                    self._drop(entry_key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "by_kind": {kind: dict(counter) for kind, counter in self.counters.items()}
+            }
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# shopify_bot builds its clients at import time; point them at throwaway settings
+_scratch = tempfile.mkdtemp(prefix="shopify-bot-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SHOPIFY_STORE_URL", "example.invalid")
+os.environ.setdefault("SHOPIFY_ADMIN_API_TOKEN", "test")
+os.environ.setdefault("CATALOG_DB_PATH", os.path.join(_scratch, "catalog.db"))
+os.environ.setdefault("LLM_CACHE_DB_PATH", os.path.join(_scratch, "llm_cache.db"))
+
+import threading
+import time
+
+import pytest
+
+
+class CountingEvent(threading.Event):
+    """Event that reports how many threads are blocked in wait()"""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+
+    def wait(self, timeout=None):
+        self.waiting += 1
+        return super().wait(timeout)
+
+
+@pytest.fixture
+def parked_followers(monkeypatch):
+    """run(flight, call, started, release): start a leader call, wait until started() reports it blocked upstream,
+    park `followers` identical calls on its flight, then release the leader. Returns every call's outcome."""
+    monkeypatch.setattr(threading, "Event", CountingEvent)
+
+    def run(flight, call, started, release, followers=5):
+        outcomes = []
+
+        def caller():
+            try:
+                outcomes.append(call())
+            except Exception as e:
+                outcomes.append(e)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        while not started():
+            time.sleep(0.001)
+
+        (flight_call,) = flight.calls.values()
+        threads = [threading.Thread(target=caller) for _ in range(followers)]
+        for thread in threads:
+            thread.start()
+        while flight_call["done"].waiting < followers:
+            time.sleep(0.001)
+
+        release.set()
+        for thread in [leader] + threads:
+            thread.join(timeout=5)
+        return outcomes
+
+    return run
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+import catalog_store
+from catalog_store import CatalogStore, run_incremental_sync, sync_from_fixture
+from shopify_client import SINGLE_QUERY_COST_LIMIT, estimate_query_cost
+
+
+def variant_edge(product_number, number):
+    return {"node": {"id": f"gid://shopify/ProductVariant/{product_number}{number:03d}", "sku": f"SKU-{product_number}-{number}",
+                     "title": f"Option {number}", "price": "10.00", "inventoryQuantity": 1, "inventoryItem": {}}}
+
+
+BULK_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "bulk_products.jsonl")
+
+
+def product_node(number, variant_count, page_size=10):
+    edges = [variant_edge(number, n) for n in range(variant_count)]
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Case {number}", "status": "ACTIVE",
+        "updatedAt": "2025-01-02T00:00:00Z", "createdAt": "2024-01-01T00:00:00Z", "tags": [],
+        "metafields": {"edges": []},
+        "variants": {"edges": edges[:page_size],
+                     "pageInfo": {"hasNextPage": variant_count > page_size, "endCursor": str(page_size)}},
+        "images": {"edges": []}
+    }, edges
+
+
+class StubClient:
+    """Replays canned GraphQL responses through the real paginate loop"""
+
+    def __init__(self, products_result, variant_edges=None):
+        self.products_result = products_result
+        self.variant_edges = variant_edges or []
+        self.calls = []
+
+    def graphql(self, query, variables=None, label=None):
+        self.calls.append(variables)
+        if "productVariants" in query:
+            start = int(variables["after"])
+            return {"data": {"product": {"variants": {
+                "edges": self.variant_edges[start:start + 100],
+                "pageInfo": {"hasNextPage": start + 100 < len(self.variant_edges), "endCursor": str(start + 100)}
+            }}}}
+        return self.products_result
+
+    paginate = catalog_store.ShopifyClient.paginate
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CatalogStore(str(tmp_path / "catalog.db"))
+    store.set_state("updated_at_watermark", "2025-01-01T00:00:00Z")
+    store.set_state("last_reconcile", "2999-01-01T00:00:00+00:00")
+    return store
+
+
+def test_incremental_page_fits_the_query_cost_limit():
+    cost = estimate_query_cost(catalog_store.INCREMENTAL_PRODUCTS_QUERY, {"first": catalog_store.INCREMENTAL_PAGE_SIZE})
+    assert cost <= SINGLE_QUERY_COST_LIMIT
+
+
+def test_errors_response_fails_the_sync(store):
+    client = StubClient({"errors": [{"message": "Query cost is 1782, which exceeds the single query max cost limit (1000)",
+                                     "extensions": {"code": "MAX_COST_EXCEEDED"}}]})
+    with pytest.raises(RuntimeError):
+        run_incremental_sync(client, store)
+    assert store.get_state("updated_at_watermark") == "2025-01-01T00:00:00Z"
+
+
+def test_products_with_more_than_ten_variants_keep_every_variant(store):
+    node, edges = product_node(1, 25)
+    client = StubClient({"data": {"products": {"edges": [{"node": node}], "pageInfo": {"hasNextPage": False}}}}, edges)
+    changed, deleted = run_incremental_sync(client, store, reconcile=False)
+    assert (changed, deleted) == (1, 0)
+    assert len([key for key, (product_id, _) in store.sku_index().items() if product_id == node["id"]]) == 25
+
+
+def test_incomplete_variant_page_keeps_existing_rows(store):
+    node, edges = product_node(2, 12)
+    node["variants"] = {"edges": edges, "pageInfo": {"hasNextPage": False}}
+    store.upsert_products([node])
+
+    partial, _ = product_node(2, 12)
+    store.upsert_products([partial])
+    assert len(store.sku_index()) == 12
+
+
+def test_count_products_filters_by_category_and_date(store):
+    tagged, _ = product_node(3, 1)
+    tagged.update(tags=["Rolling"], createdAt="2025-03-04T10:00:00Z")
+    typed, _ = product_node(4, 1)
+    typed.update(productType="rolling", status="DRAFT")
+    store.upsert_products([tagged, typed])
+
+    assert store.count_products() == 2
+    assert store.count_products(category="rolling") == 2
+    assert store.count_products(status="draft", category="rolling") == 1
+    assert store.count_products(date_condition="on", date_value="2025-03-04") == 1
+    assert store.count_products(date_condition="after", date_value="2025-01-01") == 1
+
+
+def test_reconcile_deletions_change_the_mirror_signature(store):
+    kept, _ = product_node(5, 1)
+    removed, _ = product_node(6, 1)
+    store.upsert_products([kept, removed])
+    signature = store.mirror_signature()
+
+    assert store.delete_products_not_in({kept["id"], removed["id"]}) == 0
+    assert store.mirror_signature() == signature
+
+    assert store.delete_products_not_in({kept["id"]}) == 1
+    assert store.mirror_signature() != signature
+    assert removed["id"] not in {product_id for product_id, _ in store.sku_index().values()}
+
+
+def test_bulk_fixture_reassembles_variants_by_parent_id(store):
+    store.upsert_products([product_node(9, 1)[0]])
+
+    assert sync_from_fixture(store, BULK_FIXTURE) == 2
+    assert store.is_populated()
+    assert store.get_state("updated_at_watermark") == "2025-03-01T12:00:00Z"
+    assert [node["id"] for node in store.search_products("Pelican")] == ["gid://shopify/Product/1", "gid://shopify/Product/2"]
+
+    # Product 2's first variant and metafield come before its own line in the stream
+    assert store.sku_index() == {
+        "1510000110": ("gid://shopify/Product/1", "gid://shopify/ProductVariant/1001"),
+        "1510001110": ("gid://shopify/Product/1", "gid://shopify/ProductVariant/1002"),
+        "1520000110": ("gid://shopify/Product/2", "gid://shopify/ProductVariant/2001"),
+        "1520001110": ("gid://shopify/Product/2", "gid://shopify/ProductVariant/2002"),
+    }
+    dimensions = {record["id"]: record["interior_dimensions"] for record in store.dimension_records()}
+    assert dimensions == {"gid://shopify/Product/1": "19.75 x 11.00 x 7.60", "gid://shopify/Product/2": "18.06 x 12.89 x 6.72"}
+
+    variant = store.conn.execute(
+        "SELECT price, inventory_quantity, unit_cost, tracked, weight_value, weight_unit FROM variants WHERE id = ?",
+        ("gid://shopify/ProductVariant/2001",)
+    ).fetchone()
+    assert tuple(variant) == ("329.95", 4, "198.00", 1, 15.2, "POUNDS")
+    assert store.count_products(status="draft") == 1
+    assert store.search_products("carry-on")[0]["tags"] == ["carry-on", "waterproof"]
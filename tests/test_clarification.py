@@ -0,0 +1,92 @@
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+st = shopify_bot.st
+
+
+def product_info(number, variant_count):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Case {number}", "images": {"edges": []},
+        "metafields": {"edges": []},
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{n}", "title": f"Option {n}", "price": "10.00",
+                      "inventoryQuantity": n, "inventoryItem": {}}}
+            for n in range(variant_count)
+        ]}
+    }
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    fetched = []
+    catalog = {info["id"]: info for info in (product_info(1, 3), product_info(2, 1))}
+
+    def fetch(gids):
+        fetched.extend(gids)
+        return {gid: catalog[gid] for gid in gids}
+
+    monkeypatch.setattr(shopify_bot, "fetch_products_details_batch", fetch)
+    monkeypatch.setattr(shopify_bot, "get_response_cache", lambda: shopify_bot.ResponseCache(ttls={}))
+    monkeypatch.setattr(shopify_bot, "generate_ai_response", lambda query, data, info, stream=False: f"answer: {data['variant'].title}")
+    st.session_state.awaiting_clarification = True
+    st.session_state.clarification_type = "color_interior_specs"
+    st.session_state.original_query = "price of case"
+    st.session_state.original_requested_info = ["price"]
+    shopify_bot.remember_clarification_candidates(
+        [{"node": {"id": gid, "title": info["title"]}} for gid, info in catalog.items()]
+    )
+    return fetched
+
+
+def test_product_buttons_need_no_details(fetched):
+    assert shopify_bot.clarification_choices() == [
+        ("Case 1", "gid://shopify/Product/1", None), ("Case 2", "gid://shopify/Product/2", None)
+    ]
+    assert fetched == []
+
+
+def test_clicked_product_fetches_only_itself_and_offers_its_variants(fetched):
+    answer = shopify_bot.answer_clarification_choice(
+        {"label": "Case 1", "product_gid": "gid://shopify/Product/1", "variant_gid": None}
+    )
+    assert "multiple variants" in answer
+    assert fetched == ["gid://shopify/Product/1"]
+
+    choices = shopify_bot.clarification_choices()
+    assert [variant_gid for _, _, variant_gid in choices] == [f"gid://shopify/ProductVariant/1{n}" for n in range(3)]
+    label, product_gid, variant_gid = choices[2]
+    answer = shopify_bot.answer_clarification_choice({"label": label, "product_gid": product_gid, "variant_gid": variant_gid})
+    assert answer == "answer: Option 2"
+    assert fetched == ["gid://shopify/Product/1"]
+
+
+def test_clicked_single_variant_product_is_answered(fetched):
+    answer = shopify_bot.answer_clarification_choice(
+        {"label": "Case 2", "product_gid": "gid://shopify/Product/2", "variant_gid": None}
+    )
+    assert answer == "answer: Option 0"
+
+
+def test_answered_variant_is_remembered_as_records(fetched):
+    shopify_bot.answer_clarification_choice(
+        {"label": "Case 2", "product_gid": "gid://shopify/Product/2", "variant_gid": None}
+    )
+    current = st.session_state.current_product_data
+    assert isinstance(current["product"], shopify_bot.Product)
+    assert isinstance(current["variant"], shopify_bot.Variant)
+    assert shopify_bot.render_field_answer("price of case 2", current, ["price", "inventory"]) == (
+        "Case 2\nPrice: $10.00\nInventory: 0 units"
+    )
+
+
+def test_memory_keeps_only_the_selected_variant(fetched):
+    shopify_bot.answer_clarification_choice(
+        {"label": "Case 1", "product_gid": "gid://shopify/Product/1", "variant_gid": None}
+    )
+    label, product_gid, variant_gid = shopify_bot.clarification_choices()[1]
+    shopify_bot.answer_clarification_choice({"label": label, "product_gid": product_gid, "variant_gid": variant_gid})
+
+    product = st.session_state.current_product_data["product"]
+    assert product.id == "gid://shopify/Product/1"
+    assert [variant.id for variant in product.variants] == ["gid://shopify/ProductVariant/11"]
+    assert "full_product_info" not in st.session_state.current_product_data
@@ -0,0 +1,29 @@
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+
+
+class PagedClient:
+    """Serves `pages` full pages of 250 product ids"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = 0
+
+    def paginate(self, query, variables=None):
+        for number in range(1, self.pages + 1):
+            self.requests += 1
+            yield {"edges": [{"node": {"id": "x"}}] * 250, "pageInfo": {"hasNextPage": number < self.pages}}
+
+
+def test_live_count_stops_at_the_page_cap():
+    client = PagedClient(pages=5)
+    assert shopify_bot.count_products_live(client, max_pages=2) == (500, True)
+    assert client.requests == 2
+    assert shopify_bot.format_product_count(500, True) == "500+"
+
+
+def test_live_count_that_fits_the_cap_is_exact():
+    client = PagedClient(pages=2)
+    assert shopify_bot.count_products_live(client, max_pages=2) == (500, False)
+    assert shopify_bot.format_product_count(500, False) == "500"
@@ -0,0 +1,44 @@
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+
+MATCH = {"id": "gid://shopify/Product/9", "title": "Nanuk 935", "sku": "935-1001", "dimensions": "20 x 11 x 7 in",
+         "distance": 0.4, "tolerance": "close", "fits": True}
+
+
+class StubStore:
+    def __init__(self, equivalents):
+        self.equivalents = equivalents
+
+    def has_equivalents(self, product_id):
+        return product_id in self.equivalents
+
+    def get_equivalents(self, product_id, brands=None):
+        return self.equivalents[product_id]
+
+
+@pytest.fixture
+def searched(monkeypatch):
+    searched = []
+
+    def search(brands, target_dimensions, exclude_id=None):
+        searched.extend(brands)
+        return {brand: [dict(MATCH, title=f"{brand} live")] for brand in brands}
+
+    monkeypatch.setattr(shopify_bot, "search_products_by_brand_and_dimensions", search)
+    return searched
+
+
+def test_brands_missing_from_the_table_use_the_dimension_search(monkeypatch, searched):
+    monkeypatch.setattr(shopify_bot, "get_catalog_store", lambda: StubStore({"gid://shopify/Product/1": {"Nanuk": [MATCH]}}))
+    results = shopify_bot.find_equivalents("gid://shopify/Product/1", ["nanuk", "Peli"], "19 x 11 x 7")
+    assert searched == ["Peli"]
+    assert results["nanuk"] == [MATCH]
+    assert results["Peli"][0]["title"] == "Peli live"
+
+
+def test_products_outside_the_table_use_the_dimension_search(monkeypatch, searched):
+    monkeypatch.setattr(shopify_bot, "get_catalog_store", lambda: StubStore({}))
+    results = shopify_bot.find_equivalents("gid://shopify/Product/2", ["Nanuk", "SKB"], "19 x 11 x 7")
+    assert searched == ["Nanuk", "SKB"]
+    assert set(results) == {"Nanuk", "SKB"}
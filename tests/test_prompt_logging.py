@@ -0,0 +1,75 @@
+import logging
+import threading
+import uuid
+
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+
+
+class StubCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return shopify_bot.ChatCompletion.model_validate({
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": kwargs["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]
+        })
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    completions = StubCompletions()
+    monkeypatch.setattr(shopify_bot.openai_client.chat, "completions", completions)
+    return completions
+
+
+def ask_twice():
+    messages = [{"role": "user", "content": f"price of 1510 {uuid.uuid4()}"}]
+    for _ in range(2):
+        shopify_bot.create_chat_completion(model="gpt-3.5-turbo", messages=messages, temperature=0)
+
+
+def test_prompt_size_is_logged_only_for_upstream_calls(completions, caplog):
+    caplog.set_level(logging.DEBUG, logger=shopify_bot.logger.name)
+    before = shopify_bot.get_prompt_token_stats().get("ask_twice", {}).get("calls", 0)
+
+    ask_twice()
+
+    assert completions.calls == 1
+    assert shopify_bot.get_prompt_token_stats()["ask_twice"]["calls"] == before + 1
+    prompt_logs = [record.getMessage() for record in caplog.records if record.getMessage().startswith("LLM prompt")]
+    assert len(prompt_logs) == 1
+    assert prompt_logs[0].startswith("LLM prompt [ask_twice]")
+
+
+class BlockingCompletions(StubCompletions):
+    """Holds every completion until release is set"""
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+        self.started = 0
+
+    def create(self, **kwargs):
+        self.started += 1
+        self.release.wait()
+        return super().create(**kwargs)
+
+
+def test_concurrent_identical_completions_make_one_call(monkeypatch, parked_followers):
+    release = threading.Event()
+    completions = BlockingCompletions(release)
+    monkeypatch.setattr(shopify_bot.openai_client.chat, "completions", completions)
+    messages = [{"role": "user", "content": f"price of 1510 {uuid.uuid4()}"}]
+
+    outcomes = parked_followers(
+        shopify_bot.get_llm_single_flight(),
+        lambda: shopify_bot.create_chat_completion(model="gpt-3.5-turbo", messages=messages, temperature=0),
+        lambda: completions.started,
+        release
+    )
+    assert completions.calls == 1
+    assert [response.choices[0].message.content for response in outcomes] == ["ok"] * 6
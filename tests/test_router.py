@@ -0,0 +1,81 @@
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+
+
+@pytest.mark.parametrize("query, first, second", [
+    ("1510 vs 1520", "1510", "1520"),
+    ("Pelican 1510 versus Nanuk 935", "Pelican 1510", "Nanuk 935"),
+    ("compare 1510 and 1520", "1510", "1520"),
+])
+def test_comparison_without_info_group(query, first, second):
+    routed = shopify_bot.route_intent(query)
+    assert routed["intent"] == "comparison"
+    assert (routed["product1_name_or_sku"], routed["product2_name_or_sku"]) == (first, second)
+    assert routed["requested_info"] == ["price", "cost", "inventory"]
+
+
+def test_comparison_with_info_group():
+    routed = shopify_bot.route_intent("compare the margin of 1510 and 1520")
+    assert routed["requested_info"] == ["margin"]
+
+
+def test_filtered_count_keeps_status():
+    routed = shopify_bot.route_intent("how many draft products")
+    assert (routed["intent"], routed["status_value"], routed["query_type"]) == ("status_category", "DRAFT", "count")
+
+
+def test_filtered_count_keeps_relative_date():
+    routed = shopify_bot.route_intent("how many products were added this month")
+    assert (routed["intent"], routed["date_condition"], routed["query_type"]) == ("date", "after", "count")
+    assert routed["date_value"].endswith("-01")
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("added today", ("on", "2026-10-14")),
+    ("added yesterday", ("on", "2026-10-13")),
+    ("created this week", ("after", "2026-10-12")),
+    ("added this year", ("after", "2026-01-01")),
+    ("added in the last 30 days", ("after", "2026-09-14")),
+])
+def test_relative_query_date(query, expected):
+    match = shopify_bot.RELATIVE_DATE_QUERY_PATTERN.search(query)
+    assert shopify_bot.relative_query_date(match, today=shopify_bot.datetime(2026, 10, 14).date()) == expected
+
+
+def test_comparison_reports_missing_details(monkeypatch):
+    hits = {
+        "1510": {"data": {"products": {"edges": [{"node": {"id": "gid://shopify/Product/1", "title": "Pelican 1510"}}]}}},
+        "1520": {"data": {"products": {"edges": [{"node": {"id": "gid://shopify/Product/2", "title": "Pelican 1520"}}]}}},
+    }
+    monkeypatch.setattr(shopify_bot, "search_products", hits.get)
+    monkeypatch.setattr(shopify_bot, "fetch_products_details_batch",
+                        lambda gids: {"gid://shopify/Product/1": {"id": "gid://shopify/Product/1"}})
+    answer = shopify_bot.process_comparison("1510", "1520", ["price"], "1510 vs 1520")
+    assert answer == "Could not load details for 'Pelican 1520'. Please try again."
+
+
+@pytest.mark.parametrize("query, requested", [
+    ("is it in stock", "inventory"),
+    ("how much does it cost", "cost"),
+    ("I want to know the stock", "inventory"),
+    ("what is the map price", "price"),
+    ("how many are in stock", "inventory"),
+])
+def test_follow_ups_stay_on_the_current_product(query, requested):
+    routed = shopify_bot.route_intent(query)
+    assert routed["intent"] == "current_product"
+    assert requested in routed["requested_info"]
+
+
+@pytest.mark.parametrize("query", ["what is the price of 1510 and 1520", "price of 1510 vs 1520"])
+def test_two_products_in_a_lookup_become_a_comparison(query):
+    routed = shopify_bot.route_intent(query)
+    assert routed["intent"] == "comparison"
+    assert (routed["product1_name_or_sku"], routed["product2_name_or_sku"]) == ("1510", "1520")
+    assert routed["requested_info"] == ["price"]
+
+
+@pytest.mark.parametrize("query", ["tell me the margin and the price", "price of pelican 1510 with pick and pluck foam"])
+def test_ambiguous_captures_fall_below_the_threshold(query):
+    assert shopify_bot.route_confidently(query) is None
@@ -0,0 +1,60 @@
+import pytest
+
+shopify_bot = pytest.importorskip("shopify_bot")
+
+
+class PopulatedStore:
+    def is_populated(self):
+        return True
+
+
+def hit(number, score):
+    return {"node": {"id": f"gid://shopify/Product/{number}", "title": f"Case {number}"}, "score": score}
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    fetched = []
+
+    def fetch(gids):
+        fetched.append(list(gids))
+        return {gid: {"id": gid} for gid in gids}
+
+    monkeypatch.setattr(shopify_bot, "get_catalog_store", PopulatedStore)
+    monkeypatch.setattr(shopify_bot, "fetch_products_details_batch", fetch)
+    return fetched
+
+
+def test_details_are_fetched_for_the_confident_top_hit_only(monkeypatch, fetched):
+    monkeypatch.setattr(shopify_bot, "search_catalog_mirror", lambda store, query: [hit(1, 0.95), hit(2, 0.5), hit(3, 0.4)])
+    products, details = shopify_bot.search_products_with_details("case 1")
+    assert [p["node"]["id"] for p in products] == ["gid://shopify/Product/1"]
+    assert fetched == [["gid://shopify/Product/1"]]
+    assert list(details) == ["gid://shopify/Product/1"]
+
+
+def test_ambiguous_hits_are_not_prefetched(monkeypatch, fetched):
+    monkeypatch.setattr(shopify_bot, "search_catalog_mirror", lambda store, query: [hit(1, 0.7), hit(2, 0.65)])
+    products, details = shopify_bot.search_products_with_details("case")
+    assert len(products) == 2
+    assert (details, fetched) == ({}, [])
+
+
+def test_shared_detail_response_is_left_untouched(monkeypatch):
+    node = {"id": "gid://shopify/Product/1", "title": "Case 1", "variants": {"edges": [
+        {"node": {"id": "gid://shopify/ProductVariant/11", "title": "Black", "price": "10.00"}}
+    ]}}
+    shared = {"data": {"product": node}}
+
+    class SharedClient:
+        def graphql(self, query, variables=None, label=None):
+            return shared
+
+    monkeypatch.setattr(shopify_bot, "get_shopify_client", SharedClient)
+    monkeypatch.setattr(shopify_bot, "get_response_cache", lambda: shopify_bot.ResponseCache(ttls={}))
+    first = shopify_bot.fetch_product_details_by_gid(node["id"])
+    second = shopify_bot.fetch_product_details_by_gid(node["id"])
+
+    assert shared["data"]["product"] is node
+    assert first["data"]["product"] is not second["data"]["product"]
+    assert first["data"]["product"]["variants"]["edges"][0]["node"]["price"] == "10.00"
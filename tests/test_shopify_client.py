@@ -0,0 +1,106 @@
+import pytest
+
+import shopify_client
+from shopify_client import MAX_THROTTLE_RETRIES, ShopifyClient, is_throttled
+
+
+class StubResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0"}
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+
+class StubSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = 0
+
+    def post(self, endpoint, json=None, timeout=None):
+        self.posts += 1
+        return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+
+THROTTLED_BODY = {"errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(shopify_client.time, "sleep", lambda seconds: None)
+    return ShopifyClient("example.invalid", "token")
+
+
+@pytest.mark.parametrize("response", [StubResponse(429), StubResponse(200, THROTTLED_BODY)])
+def test_exhausted_throttle_retries_return_an_error(client, response):
+    client.session = StubSession([response])
+    result = client.graphql("{ shop { name } }")
+    assert is_throttled(result)
+    assert "gave up" in result["errors"][0]["message"]
+    assert client.session.posts == MAX_THROTTLE_RETRIES + 1
+
+
+def test_throttled_attempt_is_retried(client):
+    client.session = StubSession([StubResponse(429), StubResponse(200, {"data": {"shop": {"name": "Cases"}}})])
+    assert client.graphql("{ shop { name } }") == {"data": {"shop": {"name": "Cases"}}}
+
+
+def run_single_flight(parked_followers, fn):
+    """Six identical SingleFlight calls, five of them parked on the leader's flight"""
+    flight = shopify_client.SingleFlight()
+    release = shopify_client.threading.Event()
+    upstream_calls = []
+
+    def upstream():
+        upstream_calls.append(1)
+        release.wait()
+        return fn()
+
+    outcomes = parked_followers(flight, lambda: flight.do("key", upstream), lambda: upstream_calls, release)
+    return upstream_calls, outcomes
+
+
+def test_single_flight_runs_once_and_shares_the_result(parked_followers):
+    result = {"data": {"shop": {"name": "Cases"}}}
+    upstream_calls, outcomes = run_single_flight(parked_followers, lambda: result)
+    assert len(upstream_calls) == 1
+    assert len(outcomes) == 6
+    assert all(value is result for value, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False] + [True] * 5
+
+
+def test_single_flight_leader_error_reaches_every_follower(parked_followers):
+    error = RuntimeError("upstream failed")
+
+    def fail():
+        raise error
+
+    upstream_calls, outcomes = run_single_flight(parked_followers, fail)
+    assert len(upstream_calls) == 1
+    assert outcomes == [error] * 6
+
+
+class BlockingSession(StubSession):
+    """Holds every post until release is set"""
+
+    def __init__(self, responses, release):
+        super().__init__(responses)
+        self.release = release
+
+    def post(self, endpoint, json=None, timeout=None):
+        response = super().post(endpoint, json=json, timeout=timeout)
+        self.release.wait()
+        return response
+
+
+def test_concurrent_identical_queries_send_one_request(client, parked_followers):
+    release = shopify_client.threading.Event()
+    client.session = BlockingSession([StubResponse(200, {"data": {"shop": {"name": "Cases"}}})], release)
+
+    outcomes = parked_followers(
+        client.single_flight, lambda: client.graphql("{ shop { name } }"), lambda: client.session.posts, release
+    )
+    assert client.session.posts == 1
+    assert outcomes == [{"data": {"shop": {"name": "Cases"}}}] * 6
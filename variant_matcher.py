@@ -0,0 +1,139 @@
+import re
+
+# Canonical color -> spellings and catalog abbreviations (longest phrases are matched first)
+COLOR_ALIASES = {
+    "black": ["black", "blk", "blck"],
+    "yellow": ["yellow", "ylw", "yel"],
+    "orange": ["orange", "org", "orng"],
+    "green": ["od green", "olive drab", "olive", "green", "grn", "odg", "od"],
+    "tan": ["desert tan", "tan"],
+    "clear": ["clear", "clr", "transparent"],
+    "red": ["red"],
+    "blue": ["blue", "blu"],
+    "gray": ["gray", "grey", "gry"],
+    "silver": ["silver", "slv", "slvr"],
+    "white": ["white", "wht"],
+    "purple": ["purple"],
+    "pink": ["pink"],
+}
+
+# Canonical interior option -> spellings and catalog abbreviations
+INTERIOR_ALIASES = {
+    "no foam": ["no foam", "without foam", "wo foam", "w o foam", "nofoam", "empty", "nf"],
+    "foam": ["with foam", "w foam", "pick n pluck", "pick and pluck", "pnp", "foam", "f"],
+    "trekpak": ["trekpak dividers", "trekpak divider", "trek pak", "trekpak", "tp"],
+    "padded divider": ["padded dividers", "padded divider", "padded", "pd"],
+    "divider": ["dividers", "divider", "div"],
+}
+
+# Options that also satisfy a more generic request ("dividers" matches TrekPak and padded dividers)
+IMPLIED_FEATURES = {
+    "interior:trekpak": {"interior:divider"},
+    "interior:padded divider": {"interior:divider"},
+}
+
+STOP_WORDS = {"a", "an", "the", "and", "or", "with", "of", "for", "in", "one", "please", "i", "want", "need", "it",
+              "is", "that", "this", "color", "colour", "interior", "option", "version", "variant", "insert"}
+
+# Below this share of the user's attributes the best candidate is not reported at all
+MIN_MATCH_SCORE = 0.5
+
+
+def _alias_pattern(aliases):
+    phrases = sorted(
+        ((phrase, canonical) for canonical, spellings in aliases.items() for phrase in spellings),
+        key=lambda item: -len(item[0])
+    )
+    lookup = dict(phrases)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(phrase) for phrase, _ in phrases) + r")\b")
+    return pattern, lookup
+
+
+COLOR_PATTERN, COLOR_LOOKUP = _alias_pattern(COLOR_ALIASES)
+INTERIOR_PATTERN, INTERIOR_LOOKUP = _alias_pattern(INTERIOR_ALIASES)
+
+
+def normalize_option_text(text):
+    """Lowercase words with "w/" spelled out and digits split from letters ("1510NF" -> "1510 nf")"""
+    text = (text or "").lower().replace("w/o", "wo ").replace("w/", "w ")
+    text = re.sub(r"(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)", " ", text)
+    return re.sub(r"[^0-9a-z]+", " ", text).strip()
+
+
+def option_features(text):
+    """Color, interior and remaining word features of a title, SKU or user reply.
+
+    Interior phrases are consumed before colors and plain words, so "no foam" never also
+    counts as "foam".
+    """
+    features = set()
+    text = normalize_option_text(text)
+
+    def take(prefix, lookup):
+        def replace(match):
+            features.add(f"{prefix}:{lookup[match.group(0)]}")
+            return " "
+        return replace
+
+    text = INTERIOR_PATTERN.sub(take("interior", INTERIOR_LOOKUP), text)
+    text = COLOR_PATTERN.sub(take("color", COLOR_LOOKUP), text)
+    features.update(f"word:{word}" for word in text.split() if word not in STOP_WORDS)
+    for feature in list(features):
+        features.update(IMPLIED_FEATURES.get(feature, ()))
+    return features
+
+
+def candidate_text(node):
+    """Title plus SKU and selected option values of a product or variant node"""
+    parts = [node.get("title") or "", node.get("sku") or ""]
+    parts.extend(option.get("value") or "" for option in node.get("selectedOptions") or [])
+    return " ".join(parts)
+
+
+def match_option(user_input, nodes):
+    """Score product/variant nodes against a clarification reply such as "black, no foam".
+
+    Every color and interior option the user names must appear in a candidate; plain words
+    only count when they tell the candidates apart. Returns a dict with the best "title",
+    its "score" (share of the user's attributes matched), a "confidence" of high/medium/low
+    and "tied" - the candidate titles an LLM still has to choose between (empty when the
+    local match is decisive).
+    """
+    titles = [node.get("title") for node in nodes]
+    if not titles:
+        return {"title": None, "score": 0.0, "confidence": "low", "tied": []}
+
+    reply = normalize_option_text(user_input)
+    for title in titles:
+        if reply and reply == normalize_option_text(title):
+            return {"title": title, "score": 1.0, "confidence": "high", "tied": []}
+
+    candidate_features = [option_features(candidate_text(node)) for node in nodes]
+    word_counts = {}
+    for features in candidate_features:
+        for feature in features:
+            if feature.startswith("word:"):
+                word_counts[feature] = word_counts.get(feature, 0) + 1
+
+    wanted = {
+        feature for feature in option_features(user_input)
+        if not feature.startswith("word:") or 0 < word_counts.get(feature, 0) < len(nodes)
+    }
+    if not wanted:
+        # Nothing recognisable in the reply - leave the choice to the LLM
+        return {"title": None, "score": 0.0, "confidence": "low", "tied": titles}
+
+    scores = [len(wanted & features) / len(wanted) for features in candidate_features]
+    best = max(scores)
+    if best == 0:
+        return {"title": None, "score": 0.0, "confidence": "low", "tied": []}
+
+    leaders = [title for title, score in zip(titles, scores) if score == best]
+    if len(leaders) > 1:
+        # Only a tie between complete matches is worth an LLM call; partial ties mean no candidate fits
+        return {"title": None, "score": round(best, 3), "confidence": "low", "tied": leaders if best == 1.0 else []}
+
+    if best < MIN_MATCH_SCORE:
+        return {"title": None, "score": round(best, 3), "confidence": "low", "tied": []}
+    confidence = "high" if best == 1.0 else "medium"
+    return {"title": leaders[0], "score": round(best, 3), "confidence": confidence, "tied": []}